@@ -0,0 +1,69 @@
+"""
+One entry point for the pipeline stages:
+
+    python pipeline <command> [options]      (or `python -m pipeline` from the repo root)
+
+    fetch      download prices, compute indicators, upsert daily_prices   (fetch_data.py)
+    intraday   store intraday bars, upsert the current session's row      (fetch_intraday.py)
+    train      train the per-ticker LSTM models                            (train_models.py)
+    convert    convert trained models to TF.js bundles and upload them     (convert_models.py)
+    scalers    convert scaler.pkl files to scaler.json and upload them     (fix_scalers.py)
+    forecast   precompute every ticker's 3-day forecast                    (forecast.py)
+    tune       search per-ticker hyperparameters (successive halving)      (hparam_search.py)
+    schedule   sharded, resumable fetch/train/convert/upload                (scheduler.py)
+
+`python pipeline <command> --help` lists a command's options; every command
+takes --tickers to run on a subset of the universe (universe.csv).
+
+Only the chosen command's module is imported, so `fetch` never loads
+TensorFlow, and the Supabase client is created when first used. The import
+time is the run report's "startup" stage. Keep this file's top level light:
+process pools re-run it (as __mp_main__) in every worker.
+"""
+import os
+import sys
+import time
+import importlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = {
+    "fetch": ("fetch_data", "Download prices, compute indicators, upsert daily_prices"),
+    "intraday": ("fetch_intraday", "Store intraday bars and upsert the current session's daily row"),
+    "train": ("train_models", "Train the per-ticker LSTM models"),
+    "convert": ("convert_models", "Convert trained models to TF.js bundles and upload them"),
+    "scalers": ("fix_scalers", "Convert scaler.pkl files to scaler.json and upload them"),
+    "forecast": ("forecast", "Precompute every ticker's 3-day forecast"),
+    "tune": ("hparam_search", "Search per-ticker hyperparameters (successive halving)"),
+    "schedule": ("scheduler", "Sharded, resumable fetch/train/convert/upload over the universe"),
+}
+
+
+def usage() -> str:
+    lines = ["usage: pipeline <command> [options]", "", "commands:"]
+    lines += [f"  {name:<10} {summary}" for name, (_, summary) in COMMANDS.items()]
+    lines += ["", "Run `pipeline <command> --help` for a command's options."]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"pipeline: unknown command '{command}'\n\n{usage()}", file=sys.stderr)
+        sys.exit(2)
+
+    start = time.perf_counter()
+    module = importlib.import_module(COMMANDS[command][0])
+    from utils import instrumentation
+    instrumentation.record_startup(time.perf_counter() - start)
+
+    sys.argv = [f"pipeline {command}", *rest]   # argparse's prog in usage and errors
+    module.main(rest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import argparse
+from datetime import datetime
+
+import joblib
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import train_models as tm
+from train_models import FEATURES, WINDOW_SIZE, FORECAST_DAYS, VAL_SPLIT
+from forecast import MODELS_DIR, model_version
+from utils.config import add_ticker_argument, selected_tickers
+from utils.keras_compat import load_h5_model
+
+# ─── Walk-Forward Backtest ────────────────────────────────────────────────────
+#
+# Replays a ticker's whole history through its saved model: every window
+# (train_models.window_dataset) is predicted in one predict(), inverse-scaled with
+# the saved scaler and compared with the closes that followed. Metrics are
+# reported per horizon (Day1-Day3):
+#
+#   MAE                   mean |predicted - actual| close
+#   MAPE                  mean |predicted - actual| / actual, in %
+#   directional_accuracy  share of windows where predicted and actual moves
+#                         from the last input close have the same sign
+#
+# for the training holdout (the last VAL_SPLIT of windows, never fitted on)
+# and for each of FOLDS consecutive blocks of forecast origins, so drift over
+# time is visible. Point --models-dir at a candidate retrain to evaluate it
+# before promoting it.
+#
+# Usage:  python pipeline/backtest.py [--models-dir DIR] [--output FILE]
+
+FOLDS = 5
+PREDICT_BATCH_SIZE = 4096
+REPORT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports", "backtest.json")
+
+
+def horizon_metrics(predicted: np.ndarray, actual: np.ndarray, last_close: np.ndarray) -> dict:
+    """Per-horizon metrics for (windows, FORECAST_DAYS) price arrays."""
+    if len(actual) == 0:
+        return {}
+    error = predicted - actual
+    mae = np.abs(error).mean(axis=0)
+    mape = (np.abs(error) / np.abs(actual)).mean(axis=0) * 100
+    direction = (np.sign(predicted - last_close[:, None]) == np.sign(actual - last_close[:, None])).mean(axis=0)
+    return {
+        f"day{h + 1}": {
+            "mae": round(float(mae[h]), 4),
+            "mape": round(float(mape[h]), 3),
+            "directional_accuracy": round(float(direction[h]), 4),
+        }
+        for h in range(actual.shape[1])
+    }
+
+
+def evaluate(model, scaler, df, folds: int = FOLDS) -> dict:
+    """Walk-forward metrics for one model over the feature frame `df` (date index, FEATURES columns)."""
+    rows = scaler.transform(df)
+    _, n = tm.split_windows(len(rows))
+    if n == 0:
+        return {"windows": 0}
+
+    # One inference over every historical window, gathered batch by batch
+    windows = tm.window_dataset(rows, batch_size=PREDICT_BATCH_SIZE, targets=False)
+    scaled = model.predict(windows, verbose=0)
+    # 'close' is the first feature: invert its min/max scaling only
+    predicted = scaled * scaler.data_range_[0] + scaler.data_min_[0]
+
+    close = df["close"].to_numpy(dtype=np.float64)
+    actual = sliding_window_view(close[WINDOW_SIZE:], FORECAST_DAYS)[:n]
+    last_close = close[WINDOW_SIZE - 1:WINDOW_SIZE - 1 + n]
+    # Forecast origin = date of each window's last input bar
+    origins = df.index[WINDOW_SIZE - 1:WINDOW_SIZE - 1 + n]
+
+    split = int((1 - VAL_SPLIT) * n)
+    report = {
+        "windows": n,
+        "from": str(origins[0].date()),
+        "to": str(origins[-1].date()),
+        "overall": horizon_metrics(predicted, actual, last_close),
+        "holdout": horizon_metrics(predicted[split:], actual[split:], last_close[split:]),
+        "folds": [],
+    }
+    for idx in np.array_split(np.arange(n), min(folds, n)):
+        report["folds"].append({
+            "from": str(origins[idx[0]].date()),
+            "to": str(origins[idx[-1]].date()),
+            "windows": len(idx),
+            **horizon_metrics(predicted[idx], actual[idx], last_close[idx]),
+        })
+    return report
+
+
+def backtest(tickers, models_dir: str = MODELS_DIR, folds: int = FOLDS) -> dict:
+    """Backtests every ticker with a saved model in models_dir. Returns the report."""
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "models_dir": models_dir,
+        "window_size": WINDOW_SIZE,
+        "forecast_days": FORECAST_DAYS,
+        "folds": folds,
+        "tickers": {},
+    }
+    frames = tm.price_cache.load_many(tickers)
+    for ticker in tickers:
+        base = os.path.join(models_dir, ticker)
+        if not (os.path.exists(os.path.join(base, "model.h5")) and os.path.exists(os.path.join(base, "scaler.pkl"))):
+            print(f"  [SKIP] {ticker}: no trained model in {models_dir}")
+            continue
+        df = frames[ticker][FEATURES].dropna()
+        start = time.perf_counter()
+        try:
+            model = load_h5_model(os.path.join(base, "model.h5"))
+            scaler = joblib.load(os.path.join(base, "scaler.pkl"))
+            result = evaluate(model, scaler, df, folds)
+        except Exception as e:
+            print(f"  [ERROR] {ticker}: {e}")
+            continue
+        result["model_version"] = model_version(ticker, models_dir)
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        report["tickers"][ticker] = result
+        holdout = result.get("holdout", {})
+        print(f"  [OK] {ticker}: {result['windows']} windows in {result['seconds']:.2f}s — holdout " +
+              " | ".join(f"{h} MAPE {m['mape']:.2f}% dir {m['directional_accuracy']:.0%}" for h, m in holdout.items()))
+
+    # Mean holdout metrics across tickers
+    evaluated = [r["holdout"] for r in report["tickers"].values() if r.get("holdout")]
+    report["summary"] = {
+        f"day{h + 1}": {
+            metric: round(float(np.mean([r[f"day{h + 1}"][metric] for r in evaluated])), 4)
+            for metric in ("mae", "mape", "directional_accuracy")
+        }
+        for h in range(FORECAST_DAYS)
+    } if evaluated else {}
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the saved per-ticker models.")
+    parser.add_argument("--models-dir", default=MODELS_DIR,
+                        help="Directory with <ticker>/model.h5 and scaler.pkl (default: pipeline/models)")
+    parser.add_argument("--folds", type=int, default=FOLDS, help="Rolling-origin blocks per ticker")
+    parser.add_argument("--output", default=REPORT_PATH, help="Where to write the JSON report")
+    parser.add_argument("--offline", action="store_true",
+                        help="Use the local data cache without fetching new rows")
+    add_ticker_argument(parser)
+    args = parser.parse_args()
+
+    tm.price_cache.refresh = not args.offline
+    start = time.perf_counter()
+    report = backtest(selected_tickers(args), args.models_dir, args.folds)
+    report["seconds"] = round(time.perf_counter() - start, 3)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'='*60}")
+    print(f"  Backtest: {len(report['tickers'])} tickers in {report['seconds']:.1f}s -> {args.output}")
+    for horizon, m in report["summary"].items():
+        print(f"  {horizon}: MAE {m['mae']:.3f} | MAPE {m['mape']:.2f}% | direction {m['directional_accuracy']:.1%}")
+    print(f"{'='*60}")
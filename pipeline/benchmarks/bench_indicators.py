@@ -0,0 +1,88 @@
+"""
+Panel NumPy kernel vs the old per-ticker pandas/ta compute_indicators.
+
+    python pipeline/benchmarks/bench_indicators.py [--tickers 10 100 600] [--years 5]
+
+The legacy path needs the `ta` package (no longer a pipeline dependency);
+without it only the new kernel is timed and parity is skipped.
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.indicators import INDICATOR_COLUMNS, compute_indicators, compute_indicators_many
+from benchmarks.synthetic import BARS_PER_YEAR, make_universe
+
+try:
+    import ta
+    TA_AVAILABLE = True
+except ImportError:
+    TA_AVAILABLE = False
+
+RTOL = 1e-7
+
+
+def legacy_compute_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """compute_indicators as it was implemented with `ta` (kept for comparison)."""
+    df = df.copy()
+    df.ffill(inplace=True)
+    df['returns'] = df['Close'].pct_change()
+    df['rsi14'] = ta.momentum.RSIIndicator(close=df['Close'], window=14).rsi()
+    df['macd'] = ta.trend.MACD(close=df['Close']).macd()
+    df['ma20'] = df['Close'].rolling(window=20).mean()
+    df['sma_50'] = df['Close'].rolling(window=50).mean()
+    bollinger = ta.volatility.BollingerBands(close=df['Close'], window=20, window_dev=2)
+    df['bb_upper'] = bollinger.bollinger_hband()
+    df['bb_lower'] = bollinger.bollinger_lband()
+    df['volume_ma5'] = df['Volume'].rolling(window=5).mean()
+    return df
+
+
+def max_rel_error(expected: pd.Series, actual: pd.Series) -> float:
+    a, b = expected.to_numpy(dtype=float), actual.to_numpy(dtype=float)
+    if not np.array_equal(np.isnan(a), np.isnan(b)):
+        return float("inf")
+    ok = ~np.isnan(a)
+    return float(np.max(np.abs(a[ok] - b[ok]) / np.maximum(np.abs(a[ok]), 1.0), initial=0.0))
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - start, out
+
+
+def run(n_tickers: int, years: int) -> dict:
+    frames = make_universe(n_tickers, years * BARS_PER_YEAR)
+    result = {"tickers": n_tickers}
+    result["per_ticker_s"], _ = timed(lambda: {t: compute_indicators(df) for t, df in frames.items()})
+    result["panel_s"], panel = timed(compute_indicators_many, frames)
+    if TA_AVAILABLE:
+        result["ta_s"], legacy = timed(lambda: {t: legacy_compute_indicators(df) for t, df in frames.items()})
+        result["max_rel_error"] = max(
+            max_rel_error(legacy[t][col], panel[t][col]) for t in frames for col in INDICATOR_COLUMNS
+        )
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, nargs="+", default=[10, 100, 600])
+    parser.add_argument("--years", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'tickers':>8} {'ta (s)':>8} {'kernel/ticker (s)':>18} {'panel (s)':>10} {'max rel err':>12}")
+    failed = False
+    for n in args.tickers:
+        r = run(n, args.years)
+        ta_s = f"{r['ta_s']:.3f}" if "ta_s" in r else "n/a"
+        err = f"{r['max_rel_error']:.1e}" if "max_rel_error" in r else "n/a"
+        print(f"{n:>8} {ta_s:>8} {r['per_ticker_s']:>18.3f} {r['panel_s']:>10.3f} {err:>12}")
+        failed |= r.get("max_rel_error", 0.0) > RTOL
+    if failed:
+        sys.exit(1)
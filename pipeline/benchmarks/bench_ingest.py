@@ -0,0 +1,58 @@
+"""
+Offline throughput benchmark for the staged ingestion pipeline.
+
+    python pipeline/benchmarks/bench_ingest.py [--tickers 10 100] [--latency 0.5]
+
+Runs utils.ingest.run_ingestion against SyntheticSource and MemorySink (with
+simulated network latency) twice: once configured like the old serial loop
+(one ticker per request, in-thread compute, one uploader) and once with the
+default pipelined settings.
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import ingest
+from benchmarks.synthetic import SyntheticSource
+
+SERIAL = dict(chunk_size=1, download_workers=1, compute_workers=1, upload_workers=1,
+              compute_queue_depth=1, upload_queue_depth=1)
+PIPELINED = dict(chunk_size=ingest.CHUNK_SIZE, download_workers=ingest.DOWNLOAD_WORKERS,
+                 compute_workers=ingest.COMPUTE_WORKERS, upload_workers=ingest.UPLOAD_WORKERS,
+                 compute_queue_depth=ingest.COMPUTE_QUEUE_DEPTH, upload_queue_depth=ingest.UPLOAD_QUEUE_DEPTH)
+
+
+def run(n_tickers: int, latency: float, options: dict) -> dict:
+    tickers = [f"SYN{i:04d}" for i in range(n_tickers)]
+    source = SyntheticSource(latency=latency, per_ticker_latency=latency / 10)
+    sink = ingest.MemorySink(latency=latency / 2)
+    end = datetime.now()
+    jobs = {t: (end, None) for t in tickers}
+
+    start = time.perf_counter()
+    results = ingest.run_ingestion(jobs, source, sink, end, **options)
+    elapsed = time.perf_counter() - start
+
+    errors = [t for t, r in results.items() if r["error"]]
+    if errors:
+        raise RuntimeError(f"ingestion failed for {errors}")
+    rows = sum(r["rows"] for r in results.values())
+    return {"tickers": n_tickers, "rows": rows, "seconds": elapsed, "rows_per_s": rows / elapsed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--latency", type=float, default=0.5,
+                        help="Simulated seconds per download request (upserts use half)")
+    args = parser.parse_args()
+
+    print(f"{'tickers':>8} {'serial (s)':>11} {'pipelined (s)':>14} {'speedup':>8}")
+    for n in args.tickers:
+        serial = run(n, args.latency, SERIAL)
+        piped = run(n, args.latency, PIPELINED)
+        print(f"{n:>8} {serial['seconds']:>11.2f} {piped['seconds']:>14.2f} {serial['seconds'] / piped['seconds']:>7.1f}x")
@@ -0,0 +1,100 @@
+"""
+Intraday store: append/rollup cost per ticker and disk use under retention.
+
+    python pipeline/benchmarks/bench_intraday.py [--tickers 600] [--days 45] [--retention-days 30]
+
+Simulates the half-hourly runs of fetch_intraday.py for a synthetic universe
+in a temporary store: every session is appended in RUNS_PER_DAY slices (each
+re-sending the previous slice's last bar, as the live runs do) and rolled up
+after each slice. The store is compacted after every session as the
+scheduled runs would. Reports microseconds per ticker-run, bytes per stored
+bar, the store size and peak RSS.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.instrumentation import peak_rss_mb
+from utils.intraday import COMPACT_SLACK_DAYS, RETENTION_DAYS, IntradayStore
+
+BARS_PER_DAY = 17          # 30-minute bars, 08:00-16:30 UTC
+RUNS_PER_DAY = 17
+
+
+def session_frame(day: datetime, rng) -> pd.DataFrame:
+    index = pd.date_range(day + timedelta(hours=8), periods=BARS_PER_DAY, freq="30min")
+    close = 100 + np.cumsum(rng.normal(0, 0.2, BARS_PER_DAY))
+    return pd.DataFrame({"Open": close, "High": close + 0.1, "Low": close - 0.1, "Close": close,
+                         "Volume": rng.integers(1_000, 50_000, BARS_PER_DAY).astype(float)}, index=index)
+
+
+def run(n_tickers: int, days: int, retention_days: int) -> dict:
+    root = tempfile.mkdtemp(prefix="bench_intraday-")
+    rng = np.random.default_rng(0)
+    store = IntradayStore(root)
+    tickers = [f"SYN{i:04d}" for i in range(n_tickers)]
+    sessions = pd.bdate_range("2024-01-01", periods=days).to_pydatetime()
+    runs, seconds, compact_s, max_bytes = 0, 0.0, 0.0, 0
+    try:
+        for day in sessions:
+            day = day.replace(tzinfo=timezone.utc)
+            frames = {ticker: session_frame(day, rng) for ticker in tickers}
+            step = max(1, BARS_PER_DAY // RUNS_PER_DAY)
+            for end in range(step, BARS_PER_DAY + 1, step):
+                start = time.perf_counter()
+                for ticker in tickers:
+                    store.append(ticker, frames[ticker].iloc[max(0, end - step - 1):end])
+                    store.rollup(ticker, day.date())
+                seconds += time.perf_counter() - start
+                runs += len(tickers)
+            start = time.perf_counter()
+            now = day + timedelta(hours=17)
+            for ticker in tickers:
+                cutoff = store.compact_due(ticker, now, retention_days, COMPACT_SLACK_DAYS)
+                if cutoff is not None:
+                    store.compact(ticker, cutoff)
+            compact_s += time.perf_counter() - start
+            max_bytes = max(max_bytes, store.disk_bytes())
+        bars = sum(len(store.read(t)[0]) for t in tickers)
+        final_bytes = store.disk_bytes()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return {
+        "tickers": n_tickers,
+        "days": days,
+        "us_per_ticker_run": 1e6 * seconds / runs,
+        "compact_s": compact_s,
+        "bars": bars,
+        "bytes_per_bar": final_bytes / max(bars, 1),
+        "store_mb": final_bytes / 2**20,
+        "max_store_mb": max_bytes / 2**20,
+        "bound_mb": n_tickers * (retention_days + COMPACT_SLACK_DAYS + 1) * BARS_PER_DAY * 28 / 2**20,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=600)
+    parser.add_argument("--days", type=int, default=45, help="Sessions simulated")
+    parser.add_argument("--retention-days", type=int, default=RETENTION_DAYS)
+    args = parser.parse_args()
+
+    r = run(args.tickers, args.days, args.retention_days)
+    print(f"{r['tickers']} tickers x {r['days']} sessions, {RUNS_PER_DAY} runs a session")
+    print(f"  append + rollup   {r['us_per_ticker_run']:.0f} us per ticker-run")
+    print(f"  compaction        {r['compact_s']:.2f}s total")
+    print(f"  stored bars       {r['bars']:,} ({r['bytes_per_bar']:.1f} bytes/bar incl. metadata)")
+    print(f"  store size        {r['store_mb']:.2f} MB now, {r['max_store_mb']:.2f} MB max "
+          f"(retention bound {r['bound_mb']:.2f} MB of bars)")
+    rss = f"{r['peak_rss_mb']:.0f} MB" if r["peak_rss_mb"] is not None else "n/a"
+    print(f"  peak RSS          {rss}")
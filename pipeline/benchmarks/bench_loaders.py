@@ -0,0 +1,136 @@
+"""
+daily_prices write paths against a local Postgres: REST-style JSON upserts vs
+PostgresSink's binary COPY + merge.
+
+    python pipeline/benchmarks/bench_loaders.py --dsn postgresql://localhost/postgres [--tickers 10 100]
+
+Needs psycopg and any Postgres you can create a table in (nothing else is
+touched; the scratch table is dropped afterwards). PostgREST itself isn't
+run: the REST paths execute the statement it builds for
+upsert(on_conflict="ticker,date") — json_populate_recordset over the
+1000-row JSON body — with the upserted rows returned as JSON and parsed
+(the current default) or not returned at all (returning="minimal").
+
+Each path loads the same synthetic backfill into an empty table, then loads
+it again unchanged; the tables are compared afterwards.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ingest import COPY_BATCH_SIZE, UPSERT_BATCH_SIZE, PostgresSink, prepare_records
+from utils.records import RECORD_COLUMNS
+from benchmarks.synthetic import BARS_PER_YEAR, make_universe
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+TABLE = "bench_daily_prices"
+# Same columns and key as the daily_prices migrations
+SCHEMA = f"""
+create table {{table}} (
+  id bigint generated always as identity primary key,
+  ticker text not null,
+  date date not null,
+  {", ".join(f"{c} {'bigint' if c == 'volume' else 'numeric'}" for c in RECORD_COLUMNS)},
+  created_at timestamp with time zone default timezone('utc'::text, now()) not null,
+  unique (ticker, date)
+)
+"""
+
+
+def rest_statement(table: str, returning: bool) -> str:
+    columns = ", ".join(["ticker", "date", *RECORD_COLUMNS])
+    updates = ", ".join(f"{c} = excluded.{c}" for c in RECORD_COLUMNS)
+    insert = (f"insert into {table} ({columns}) select {columns} from json_populate_recordset(null::{table}, %s) "
+              f"on conflict (ticker, date) do update set {updates}")
+    if returning:
+        return f"with upserted as ({insert} returning *) select coalesce(json_agg(upserted), '[]') from upserted"
+    return insert
+
+
+def load_rest(dsn, table, records, returning):
+    sql = rest_statement(table, returning)
+    with psycopg.connect(dsn) as conn:
+        for i in range(0, len(records), UPSERT_BATCH_SIZE):
+            body = json.dumps(records[i:i + UPSERT_BATCH_SIZE])
+            cur = conn.execute(sql, (body,))
+            if returning:
+                # supabase-py parses the returned representation
+                rows = cur.fetchone()[0]
+                json.loads(rows) if isinstance(rows, str) else rows
+            conn.commit()
+
+
+def load_copy(dsn, table, records):
+    sink = PostgresSink(dsn, table)
+    try:
+        for i in range(0, len(records), COPY_BATCH_SIZE):
+            sink.upsert(records[i:i + COPY_BATCH_SIZE])
+    finally:
+        sink.close()
+
+
+PATHS = {
+    "rest": lambda dsn, table, records: load_rest(dsn, table, records, returning=True),
+    "rest_minimal": lambda dsn, table, records: load_rest(dsn, table, records, returning=False),
+    "copy": load_copy,
+}
+
+
+def table_rows(conn, table):
+    columns = ", ".join(["ticker", "date", *RECORD_COLUMNS])
+    return conn.execute(f"select {columns} from {table} order by ticker, date").fetchall()
+
+
+def run(dsn: str, n_tickers: int, years: int) -> dict:
+    frames = make_universe(n_tickers, years * BARS_PER_YEAR)
+    records = [r for rs in prepare_records(frames, {}).values() for r in rs]
+    result = {"tickers": n_tickers, "rows": len(records)}
+    stored = {}
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        for name, load in PATHS.items():
+            table = f"{TABLE}_{name}"
+            conn.execute(f"drop table if exists {table}")
+            conn.execute(SCHEMA.format(table=table))
+            for phase in ("load", "reload"):
+                start = time.perf_counter()
+                load(dsn, table, records)
+                result[f"{name}_{phase}_s"] = time.perf_counter() - start
+            stored[name] = table_rows(conn, table)
+            conn.execute(f"drop table {table}")
+    result["identical"] = stored["copy"] == stored["rest"] == stored["rest_minimal"]
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL"),
+                        help="Postgres connection string (default: $BENCH_DATABASE_URL)")
+    parser.add_argument("--tickers", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--years", type=int, default=5)
+    args = parser.parse_args()
+
+    if psycopg is None:
+        sys.exit("bench_loaders needs psycopg: pip install 'psycopg[binary]'")
+    if not args.dsn:
+        sys.exit("Pass --dsn or set BENCH_DATABASE_URL.")
+
+    print(f"{'tickers':>8} {'rows':>8} {'path':>13} {'load (s)':>9} {'rows/s':>9} {'reload (s)':>11}")
+    failed = False
+    for n in args.tickers:
+        r = run(args.dsn, n, args.years)
+        for name in PATHS:
+            load_s = r[f"{name}_load_s"]
+            print(f"{n:>8} {r['rows']:>8} {name:>13} {load_s:>9.2f} {r['rows'] / load_s:>9.0f} {r[f'{name}_reload_s']:>11.2f}")
+        print(f"{'':>8} {'':>8} {'copy speedup':>13} {r['rest_load_s'] / r['copy_load_s']:>8.1f}x  "
+              f"tables identical: {r['identical']}")
+        failed |= not r["identical"]
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,69 @@
+"""
+Strided float32 create_sequences vs the old list-append + np.array version.
+
+    python pipeline/benchmarks/bench_sequences.py [--windows 7 30 120] [--rows 20000]
+
+Reports time and peak traced memory for both, and checks that they produce
+the same (X, y) up to float32 rounding.
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.sequences import create_sequences
+
+N_FEATURES = 10
+FORECAST_DAYS = 3
+
+
+def legacy_create_sequences(data: np.ndarray, window_size: int, forecast_days: int):
+    """create_sequences as train_models.py implemented it before (kept for comparison)."""
+    X, y = [], []
+    for i in range(len(data) - window_size - forecast_days + 1):
+        X.append(data[i : i + window_size])
+        y.append(data[i + window_size : i + window_size + forecast_days, 0])
+    return np.array(X), np.array(y)
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    out = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, out
+
+
+def run(window_size: int, rows: int) -> dict:
+    data = np.random.default_rng(window_size).random((rows, N_FEATURES))
+    legacy_s, legacy_peak, (X0, y0) = measure(legacy_create_sequences, data, window_size, FORECAST_DAYS)
+    new_s, new_peak, (X1, y1) = measure(create_sequences, data, window_size, FORECAST_DAYS)
+    if X0.shape != X1.shape or not (np.allclose(X0, X1, rtol=1e-6) and np.allclose(y0, y1, rtol=1e-6)):
+        raise AssertionError(f"create_sequences differs from legacy at window {window_size}")
+    return {
+        "window_size": window_size,
+        "samples": len(X1),
+        "legacy_s": legacy_s,
+        "legacy_peak_mb": legacy_peak / 2**20,
+        "strided_s": new_s,
+        "strided_peak_mb": new_peak / 2**20,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--windows", type=int, nargs="+", default=[7, 30, 120])
+    parser.add_argument("--rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"{'window':>7} {'samples':>8} {'legacy (s)':>11} {'legacy MB':>10} {'strided (s)':>12} {'strided MB':>11}")
+    for w in args.windows:
+        r = run(w, args.rows)
+        print(f"{w:>7} {r['samples']:>8} {r['legacy_s']:>11.4f} {r['legacy_peak_mb']:>10.1f} "
+              f"{r['strided_s']:>12.4f} {r['strided_peak_mb']:>11.2f}")
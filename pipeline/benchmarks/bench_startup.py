@@ -0,0 +1,100 @@
+"""
+Cold-start time of each `pipeline` subcommand.
+
+    python pipeline/benchmarks/bench_startup.py [--only fetch scalers ...] [--repeat 5] [--output FILE]
+
+Runs `python pipeline <command> --help` in a fresh interpreter --repeat times
+and reports the median wall time: interpreter start, the command module's
+imports and argument parsing, but no work and no network. One more run with
+-X importtime shows which heavy libraries the command loaded. No credentials
+are needed (clients are created on first use).
+
+Results go to pipeline/reports/benchmarks/startup-<commit>.json.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import importlib.util
+from datetime import datetime
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPORT_DIR = os.path.join(PIPELINE_DIR, "reports", "benchmarks")   # as run_benchmarks.REPORT_DIR
+
+# pipeline/__main__.py only imports the stdlib at the top level
+_spec = importlib.util.spec_from_file_location("pipeline_cli", os.path.join(PIPELINE_DIR, "__main__.py"))
+cli = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(cli)
+COMMANDS = cli.COMMANDS
+
+REPEAT = 5
+# Top-level packages worth knowing about when a command starts slowly
+HEAVY_MODULES = ["tensorflow", "tensorflowjs", "supabase", "scipy", "sklearn", "pandas", "yfinance", "psycopg"]
+
+
+def git_commit() -> str:
+    # Not run_benchmarks.git_commit: importing that module loads TensorFlow
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=PIPELINE_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def command_line(command: str, *flags) -> list:
+    return [sys.executable, *flags, PIPELINE_DIR, command, "--help"]
+
+
+def cold_start(command: str, repeat: int) -> list:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command_line(command), capture_output=True, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def heavy_imports(command: str) -> dict:
+    """{package: cumulative import seconds} for the HEAVY_MODULES the command loaded."""
+    stderr = subprocess.run(command_line(command, "-X", "importtime"), capture_output=True, text=True).stderr
+    loaded = {}
+    for line in stderr.splitlines():
+        # "import time:      self [us] |   cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) != 3 or not line.startswith("import time:"):
+            continue
+        name = parts[2].strip()
+        if name in HEAVY_MODULES and parts[1].strip().isdigit():
+            loaded[name] = max(loaded.get(name, 0.0), int(parts[1]) / 1e6)
+    return loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=list(COMMANDS), default=list(COMMANDS))
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--output", help="Results file (default: pipeline/reports/benchmarks/startup-<commit>.json)")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = {"commit": commit, "generated_at": datetime.now().isoformat(), "repeat": args.repeat,
+               "python": sys.version.split()[0], "commands": {}}
+
+    print(f"{'command':<10} {'median (s)':>11} {'min (s)':>8}  heavy imports (cumulative s)")
+    for command in args.only:
+        times = cold_start(command, args.repeat)
+        loaded = heavy_imports(command)
+        results["commands"][command] = {"median_s": statistics.median(times), "min_s": min(times),
+                                        "runs_s": times, "heavy_imports_s": loaded}
+        detail = ", ".join(f"{name} {s:.2f}" for name, s in sorted(loaded.items(), key=lambda kv: -kv[1]))
+        print(f"{command:<10} {statistics.median(times):>11.2f} {min(times):>8.2f}  {detail or '-'}")
+
+    label = commit or datetime.now().strftime("%Y%m%d-%H%M%S")
+    output = args.output or os.path.join(REPORT_DIR, f"startup-{label}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults -> {output}")
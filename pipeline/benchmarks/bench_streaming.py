@@ -0,0 +1,72 @@
+"""
+Streaming vs batch indicators: parity check and per-bar update cost.
+
+    python pipeline/benchmarks/bench_streaming.py [--tickers 10] [--years 5]
+
+For each synthetic ticker, streams the first half of its bars, round-trips
+the engine state through JSON, streams the rest, and compares every feature
+with compute_indicators over the full history.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.indicators import compute_indicators, StreamingIndicators
+from benchmarks.synthetic import BARS_PER_YEAR, make_universe
+
+FEATURE_SOURCES = {
+    "close": "Close", "returns": "returns", "volume": "Volume", "rsi14": "rsi14", "macd": "macd",
+    "ma20": "ma20", "sma_50": "sma_50", "bb_upper": "bb_upper", "bb_lower": "bb_lower",
+    "volume_ma5": "volume_ma5",
+}
+RTOL = 1e-7
+
+
+def max_rel_error(batch, streamed) -> float:
+    a, b = batch.to_numpy(dtype=float), streamed.to_numpy(dtype=float)
+    if not np.array_equal(np.isnan(a), np.isnan(b)):
+        return float("inf")
+    ok = ~np.isnan(a)
+    return float(np.max(np.abs(a[ok] - b[ok]) / np.maximum(np.abs(a[ok]), 1.0), initial=0.0))
+
+
+def run(n_tickers: int, years: int) -> dict:
+    universe = make_universe(n_tickers, years * BARS_PER_YEAR)
+    worst = {f: 0.0 for f in FEATURE_SOURCES}
+    updates, stream_s = 0, 0.0
+    for df in universe.values():
+        batch = compute_indicators(df)
+        half = len(df) // 2
+
+        start = time.perf_counter()
+        engine = StreamingIndicators()
+        first = engine.update_frame(df.iloc[:half])
+        engine = StreamingIndicators.from_state(json.loads(json.dumps(engine.to_state())))
+        second = engine.update_frame(df.iloc[half:])
+        stream_s += time.perf_counter() - start
+        updates += len(df)
+
+        streamed = pd.concat([first, second])
+        for feature, col in FEATURE_SOURCES.items():
+            worst[feature] = max(worst[feature], max_rel_error(batch[col], streamed[feature]))
+    return {"tickers": n_tickers, "us_per_update": 1e6 * stream_s / updates, "max_rel_error": worst}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=10)
+    parser.add_argument("--years", type=int, default=5)
+    args = parser.parse_args()
+
+    r = run(args.tickers, args.years)
+    print(f"{r['tickers']} tickers: {r['us_per_update']:.1f} us per bar update")
+    for feature, err in r["max_rel_error"].items():
+        print(f"  {feature:<11} max rel error {err:.2e}  {'OK' if err <= RTOL else 'MISMATCH'}")
+    if any(err > RTOL for err in r["max_rel_error"].values()):
+        sys.exit(1)
@@ -0,0 +1,158 @@
+"""
+Training throughput and time-to-early-stop: train_models' default path vs
+the --fast mode (and its parts).
+
+    python pipeline/benchmarks/bench_training.py [--tickers 3] [--epochs 5] [--jit] [--intra-op-threads N]
+
+Variants, each on the same synthetic tickers (benchmarks/synthetic.py):
+
+    baseline   create_sequences() arrays straight into fit(), batch_size=BATCH_SIZE
+    tf.data    window_dataset(): windows gathered per batch, as train_for_ticker trains
+    fast       tf.data + steps_per_execution + unrolled LSTM (train_for_ticker(fast=True))
+    fast+jit   fast with XLA (only with --jit; compiling it takes a while on CPU)
+
+For each: samples/sec over --epochs epochs after a warm-up epoch (whose time
+is reported as first_epoch_s: tracing and compilation), then a full
+EPOCHS/PATIENCE early-stopped training from scratch: wall time, epochs and
+best val MSE. For the fast variants the val MSE of the saved graph
+(regular_graph) is checked too. Val MSE varies with the shuffle order, so
+equivalence is judged on the median ratio to baseline over the tickers.
+
+oneDNN is read at TensorFlow import: compare runs with TF_ENABLE_ONEDNN_OPTS=0
+and =1. Results go to pipeline/reports/benchmarks/training-<commit>.json.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from datetime import datetime
+
+import tensorflow as tf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sklearn.preprocessing import MinMaxScaler
+
+from benchmarks.run_benchmarks import REPORT_DIR, environment, feature_matrices, git_commit
+from benchmarks.synthetic import BARS_PER_YEAR, make_universe
+from utils.sequences import create_sequences
+import train_models as tm
+
+VARIANTS = ["baseline", "tf.data", "fast", "fast+jit"]
+EQUIVALENCE_TOLERANCE = 1.10   # fast's median val MSE may be at most 10% above baseline's
+
+
+def fit_inputs(variant: str, rows, n_train: int) -> dict:
+    if variant == "baseline":
+        X, y = create_sequences(rows, tm.WINDOW_SIZE, tm.FORECAST_DAYS)
+        return {"x": X[:n_train], "y": y[:n_train], "batch_size": tm.BATCH_SIZE,
+                "validation_data": (X[n_train:], y[n_train:])}
+    return {"x": tm.window_dataset(rows, 0, n_train, shuffle=True), "validation_data": tm.window_dataset(rows, n_train)}
+
+
+def build(variant: str):
+    tf.keras.backend.clear_session()
+    return tm.build_model((tm.WINDOW_SIZE, len(tm.FEATURES)), fast=variant.startswith("fast"),
+                          jit_compile=variant == "fast+jit")
+
+
+def run_variant(variant: str, rows, epochs: int, seed: int) -> dict:
+    n_train, _ = tm.split_windows(len(rows))
+    inputs = fit_inputs(variant, rows, n_train)
+
+    # Throughput: one warm-up epoch (tracing/compilation), then `epochs` timed epochs
+    tf.keras.utils.set_random_seed(seed)
+    model = build(variant)
+    start = time.perf_counter()
+    model.fit(**inputs, epochs=1, verbose=0)
+    first_epoch_s = time.perf_counter() - start
+    start = time.perf_counter()
+    model.fit(**inputs, initial_epoch=1, epochs=1 + epochs, verbose=0)
+    seconds = time.perf_counter() - start
+
+    # Time-to-early-stop, as train_for_ticker trains
+    tf.keras.utils.set_random_seed(seed)
+    model = build(variant)
+    early_stop = tf.keras.callbacks.EarlyStopping(monitor="val_loss", patience=tm.PATIENCE, restore_best_weights=True)
+    start = time.perf_counter()
+    history = model.fit(**inputs, epochs=tm.EPOCHS, callbacks=[early_stop], verbose=0)
+    train_s = time.perf_counter() - start
+    result = {
+        "samples_per_s": n_train * epochs / seconds,
+        "first_epoch_s": first_epoch_s,
+        "time_to_early_stop_s": train_s,
+        "epochs": len(history.history["val_loss"]),
+        "val_loss": float(min(history.history["val_loss"])),
+    }
+    if variant.startswith("fast"):
+        saved = tm.regular_graph(model)
+        result["saved_val_loss"] = float(saved.evaluate(tm.window_dataset(rows, n_train), verbose=0))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=3)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--epochs", type=int, default=5, help="Timed epochs for samples/sec")
+    parser.add_argument("--jit", action="store_true", help="Include the fast+jit variant")
+    parser.add_argument("--intra-op-threads", type=int, default=None)
+    parser.add_argument("--inter-op-threads", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Results file (default: pipeline/reports/benchmarks/training-<commit>.json)")
+    args = parser.parse_args()
+
+    if args.intra_op_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(args.intra_op_threads)
+    if args.inter_op_threads:
+        tf.config.threading.set_inter_op_parallelism_threads(args.inter_op_threads)
+    variants = [v for v in VARIANTS if v != "fast+jit" or args.jit]
+
+    matrices = feature_matrices(make_universe(args.tickers, args.years * BARS_PER_YEAR))
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "generated_at": datetime.now().isoformat(),
+        "environment": {**environment(), "onednn": os.getenv("TF_ENABLE_ONEDNN_OPTS", "default"),
+                        "intra_op_threads": args.intra_op_threads, "inter_op_threads": args.inter_op_threads},
+        "epochs": args.epochs,
+        "tickers": {},
+    }
+
+    print(f"{'ticker':<8} {'variant':<9} {'samples/s':>10} {'1st epoch':>10} {'to stop (s)':>12} {'epochs':>7} {'val MSE':>10}")
+    for ticker, matrix in matrices.items():
+        rows = MinMaxScaler().fit_transform(matrix)
+        results["tickers"][ticker] = {}
+        for variant in variants:
+            r = run_variant(variant, rows, args.epochs, args.seed)
+            results["tickers"][ticker][variant] = r
+            saved = f"  (saved graph {r['saved_val_loss']:.6f})" if "saved_val_loss" in r else ""
+            print(f"{ticker:<8} {variant:<9} {r['samples_per_s']:>10.0f} {r['first_epoch_s']:>10.2f} "
+                  f"{r['time_to_early_stop_s']:>12.2f} {r['epochs']:>7} {r['val_loss']:>10.6f}{saved}")
+
+    summary = {}
+    for variant in variants:
+        runs = [results["tickers"][t][variant] for t in matrices]
+        base = [results["tickers"][t]["baseline"] for t in matrices]
+        summary[variant] = {
+            "samples_per_s": statistics.median(r["samples_per_s"] for r in runs),
+            "throughput_speedup": statistics.median(r["samples_per_s"] / b["samples_per_s"] for r, b in zip(runs, base)),
+            "time_to_early_stop_s": sum(r["time_to_early_stop_s"] for r in runs),
+            "val_loss_ratio": statistics.median(r["val_loss"] / b["val_loss"] for r, b in zip(runs, base)),
+        }
+    results["summary"] = summary
+
+    print(f"\n{'variant':<9} {'samples/s':>10} {'speedup':>8} {'to stop, all (s)':>17} {'val MSE vs baseline':>20}")
+    for variant, s in summary.items():
+        flag = "  ⚠ not equivalent" if s["val_loss_ratio"] > EQUIVALENCE_TOLERANCE else ""
+        print(f"{variant:<9} {s['samples_per_s']:>10.0f} {s['throughput_speedup']:>7.2f}x "
+              f"{s['time_to_early_stop_s']:>17.1f} {s['val_loss_ratio']:>19.3f}x{flag}")
+
+    label = commit or datetime.now().strftime("%Y%m%d-%H%M%S")
+    output = args.output or os.path.join(REPORT_DIR, f"training-{label}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults -> {output}")
@@ -0,0 +1,81 @@
+"""
+Offline benchmark for the artifact uploader.
+
+    python pipeline/benchmarks/bench_uploads.py [--tickers 10 100] [--latency 0.05]
+
+Publishes a TF.js-sized artifact set per ticker (model.json, a weight shard,
+metadata.json, scaler.pkl) to a LocalBucket with simulated request latency:
+first file by file with one worker (the old serial loop), then with the
+default concurrent Uploader, then again unchanged, where every file should
+be skipped by the checksum comparison.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.storage import LocalBucket, Uploader, UPLOAD_WORKERS
+
+FILES = {"model.json": 4_000, "group1-shard1of1.bin": 73_000, "metadata.json": 600, "scaler.pkl": 1_000}
+
+
+class SlowBucket(LocalBucket):
+    """LocalBucket with a fixed round trip added to every request."""
+
+    def __init__(self, root, latency):
+        super().__init__(root)
+        self.latency = latency
+
+    def checksums(self, folder):
+        time.sleep(self.latency)
+        return super().checksums(folder)
+
+    def put(self, path, data, content_type):
+        time.sleep(self.latency)
+        super().put(path, data, content_type)
+
+
+def make_artifacts(root, n_tickers):
+    rng = np.random.default_rng(0)
+    files = []
+    for i in range(n_tickers):
+        ticker = f"SYN{i:04d}"
+        os.makedirs(os.path.join(root, ticker))
+        for name, size in FILES.items():
+            path = os.path.join(root, ticker, name)
+            with open(path, "wb") as f:
+                f.write(rng.bytes(size))
+            files.append((path, f"{ticker}/{name}"))
+    return files
+
+
+def run(files, bucket_dir, latency, workers, force):
+    uploader = Uploader(SlowBucket(bucket_dir, latency), workers=workers)
+    start = time.perf_counter()
+    results = uploader.upload(files, force=force)
+    elapsed = time.perf_counter() - start
+    if any(r["error"] for r in results.values()):
+        raise RuntimeError("uploads failed")
+    return elapsed, sum(r["uploaded"] for r in results.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per request")
+    args = parser.parse_args()
+
+    print(f"{'tickers':>8} {'files':>6} {'serial (s)':>11} {'concurrent (s)':>15} {'speedup':>8} {'unchanged (s)':>14}")
+    for n in args.tickers:
+        with tempfile.TemporaryDirectory() as tmp:
+            files = make_artifacts(os.path.join(tmp, "local"), n)
+            serial, _ = run(files, os.path.join(tmp, "serial"), args.latency, 1, force=True)
+            concurrent, uploaded = run(files, os.path.join(tmp, "bucket"), args.latency, UPLOAD_WORKERS, force=False)
+            unchanged, reuploaded = run(files, os.path.join(tmp, "bucket"), args.latency, UPLOAD_WORKERS, force=False)
+            assert uploaded == len(files) and reuploaded == 0
+            print(f"{n:>8} {len(files):>6} {serial:>11.2f} {concurrent:>15.2f} {serial / concurrent:>7.1f}x {unchanged:>14.2f}")
@@ -0,0 +1,83 @@
+"""
+Peak RSS through model.fit(): dense create_sequences arrays vs
+train_models.window_dataset, which gathers each batch's windows from the
+base rows inside the tf.data pipeline.
+
+    python pipeline/benchmarks/bench_window_memory.py [--window 120] [--rows 20000] [--steps 20]
+
+Each variant runs in a fresh interpreter, so one's high-water mark can't hide
+the other's. Reported per variant: peak RSS after importing TensorFlow and
+building the model (the floor), peak RSS after fit(), and the difference.
+fit() runs one epoch of --steps batches: fit() converts array inputs to a
+dense (samples, window, features) tensor before the first step, so a few
+steps are enough to see the copy.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VARIANTS = ["arrays", "window_dataset"]
+N_FEATURES = 10
+
+
+def child(variant: str, window_size: int, rows: int, steps: int) -> dict:
+    import numpy as np
+    import tensorflow as tf
+    import train_models as tm
+    from utils.instrumentation import peak_rss_mb
+    from utils.sequences import create_sequences
+
+    tf.keras.utils.set_random_seed(0)
+    data = np.random.default_rng(0).random((rows, N_FEATURES)).astype(np.float32)
+    model = tm.build_model((window_size, N_FEATURES), lstm_units=8)
+    floor = peak_rss_mb()
+
+    if variant == "arrays":
+        X, y = create_sequences(data, window_size, tm.FORECAST_DAYS)
+        model.fit(X, y, batch_size=tm.BATCH_SIZE, steps_per_epoch=steps, epochs=1, verbose=0)
+    else:
+        model.fit(tm.window_dataset(data, window_size=window_size, shuffle=True),
+                  steps_per_epoch=steps, epochs=1, verbose=0)
+    peak = peak_rss_mb()
+    windows = rows - window_size - tm.FORECAST_DAYS + 1
+    return {
+        "variant": variant,
+        "windows": windows,
+        "dense_windows_mb": round(windows * window_size * N_FEATURES * 4 / 2**20, 1),
+        "floor_mb": floor,
+        "peak_mb": peak,
+        "fit_mb": round(peak - floor, 1) if peak is not None else None,
+    }
+
+
+def run(variant: str, window_size: int, rows: int, steps: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", variant,
+         "--window", str(window_size), "--rows", str(rows), "--steps", str(steps)],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--window", type=int, default=120)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--steps", type=int, default=20, help="Batches fitted per variant")
+    parser.add_argument("--child", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.window, args.rows, args.steps)))
+        sys.exit(0)
+
+    print(f"window {args.window}, {args.rows} rows x {N_FEATURES} features")
+    print(f"{'variant':<15} {'windows':>8} {'dense MB':>9} {'floor MB':>9} {'peak MB':>9} {'fit MB':>8}")
+    for variant in VARIANTS:
+        r = run(variant, args.window, args.rows, args.steps)
+        print(f"{variant:<15} {r['windows']:>8} {r['dense_windows_mb']:>9.1f} {r['floor_mb']:>9} "
+              f"{r['peak_mb']:>9} {r['fit_mb']:>8}")
@@ -0,0 +1,270 @@
+"""
+Offline benchmark suite for the pipeline hot paths, with JSON results.
+
+    python pipeline/benchmarks/run_benchmarks.py [--tickers 10 100 600] [--only indicators records ...]
+                                                 [--output FILE] [--baseline FILE]
+
+Every benchmark runs on synthetic OHLCV (benchmarks/synthetic.py) at each
+universe size; nothing is downloaded and no Supabase request is made:
+
+    indicators   utils.indicators.compute_indicators, ticker by ticker
+    records      utils.records.frame_to_records (fetch_data's upsert payloads)
+    sequences    create_sequences over each ticker's scaled feature matrix
+    train_epoch  one epoch of build_model training per ticker
+    convert      convert_models.patch_input_layers + normalize_names on one
+                 model JSON holding every ticker's tower
+
+Results go to pipeline/reports/benchmarks/<commit>.json (timings are the
+best of --repeat runs; train_epoch runs once). With --baseline, each timing
+is compared with an earlier results file and the run exits 1 if any (of at
+least MIN_COMPARE_SECONDS) is more than REGRESSION_TOLERANCE slower.
+"""
+import os
+import sys
+import json
+import time
+import copy
+import platform
+import argparse
+import subprocess
+from datetime import datetime
+
+import numpy as np
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PIPELINE_DIR)
+
+# Next to this package, as instrumentation.REPORT_DIR is, wherever the suite is run from
+REPORT_DIR = os.path.join(PIPELINE_DIR, "reports", "benchmarks")
+
+# The Supabase client is only created on first use, so no credentials are
+# needed; MODELS_LOCAL_DIR keeps the models bucket local regardless.
+os.environ.setdefault("MODELS_LOCAL_DIR", os.path.join(REPORT_DIR, "bucket"))
+
+import tensorflow as tf
+from sklearn.preprocessing import MinMaxScaler
+
+from utils.indicators import compute_indicators
+from utils.records import frame_to_records
+from utils.sequences import create_sequences
+from benchmarks.synthetic import BARS_PER_YEAR, make_universe
+import train_models as tm
+from convert_models import patch_input_layers, normalize_names
+
+BENCHMARKS = ["indicators", "records", "sequences", "train_epoch", "convert"]
+REPEAT = 3
+REGRESSION_TOLERANCE = 1.25
+MIN_COMPARE_SECONDS = 0.05   # shorter timings are mostly noise: reported, never flagged
+# compute_indicators output column -> training feature name
+FEATURE_SOURCES = {"Close": "close", "Volume": "volume"}
+
+
+def best_of(fn, repeat: int):
+    """(fastest wall time over `repeat` calls, result of the last call)."""
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def feature_matrices(universe: dict) -> dict:
+    """{ticker: training feature rows in tm.FEATURES order}, as load_training_data returns them."""
+    matrices = {}
+    for ticker, df in universe.items():
+        df = compute_indicators(df).rename(columns=FEATURE_SOURCES)
+        matrices[ticker] = df[tm.FEATURES].dropna().to_numpy(dtype=np.float64)
+    return matrices
+
+
+# ─── Benchmarks ───────────────────────────────────────────────────────────────
+#
+# Each takes the synthetic inputs for one universe size and returns a dict
+# with a "seconds" timing plus whatever sizes make the timing comparable.
+
+def bench_indicators(data: dict, repeat: int) -> dict:
+    universe = data["ohlcv"]
+    seconds, _ = best_of(lambda: [compute_indicators(df) for df in universe.values()], repeat)
+    return {"seconds": seconds, "rows": sum(len(df) for df in universe.values())}
+
+
+def bench_records(data: dict, repeat: int) -> dict:
+    frames = data["indicator_frames"]
+    seconds, records = best_of(lambda: [frame_to_records(df, t) for t, df in frames.items()], repeat)
+    return {"seconds": seconds, "records": sum(len(r) for r in records)}
+
+
+def bench_sequences(data: dict, repeat: int) -> dict:
+    scaled = [MinMaxScaler().fit_transform(m) for m in data["features"].values()]
+
+    def build():
+        # np.array() materializes the windows as model.fit() would
+        return [np.array(create_sequences(s, tm.WINDOW_SIZE, tm.FORECAST_DAYS)[0]) for s in scaled]
+
+    seconds, windows = best_of(build, repeat)
+    return {"seconds": seconds, "samples": sum(len(X) for X in windows)}
+
+
+def bench_train_epoch(data: dict, repeat: int) -> dict:
+    samples, build_s, fit_s = 0, 0.0, 0.0
+    for matrix in data["features"].values():
+        X, y = create_sequences(MinMaxScaler().fit_transform(matrix), tm.WINDOW_SIZE, tm.FORECAST_DAYS)
+        split = int((1 - tm.VAL_SPLIT) * len(X))
+        tf.keras.backend.clear_session()
+
+        start = time.perf_counter()
+        model = tm.build_model((tm.WINDOW_SIZE, len(tm.FEATURES)))
+        build_s += time.perf_counter() - start
+
+        start = time.perf_counter()
+        model.fit(X[:split], y[:split], epochs=1, batch_size=tm.BATCH_SIZE,
+                  validation_data=(X[split:], y[split:]), verbose=0)
+        fit_s += time.perf_counter() - start
+        samples += split
+    return {"seconds": build_s + fit_s, "build_s": build_s, "fit_s": fit_s, "samples": samples}
+
+
+def stacked_topology(n_towers: int) -> dict:
+    """
+    A model.json topology with one build_model tower per ticker, written the
+    way Keras 3 saves it (batch_shape inputs, model-prefixed weight names), so
+    both patches have work to do.
+    """
+    tf.keras.backend.clear_session()
+    tower = json.loads(tm.build_model((tm.WINDOW_SIZE, len(tm.FEATURES))).to_json())
+    layers, inputs, outputs, weights = [], [], [], []
+    for i in range(n_towers):
+        renamed = json.loads(json.dumps(tower["config"]["layers"]).replace('_layer"', f'_layer_{i}"'))
+        for layer in renamed:
+            if layer["class_name"] == "InputLayer":
+                layer["config"]["batch_shape"] = layer["config"].pop("batch_input_shape")
+        layers += renamed
+        inputs.append([f"input_layer_{i}", 0, 0])
+        outputs.append([f"output_layer_{i}", 0, 0])
+        weights += [{"name": f"stock_prediction_model/{name}_{i}/{var}", "shape": [1], "dtype": "float32"}
+                    for name in ("lstm_layer", "output_layer") for var in ("kernel", "bias")]
+    return {
+        "modelTopology": {"class_name": "Functional",
+                          "config": {"name": "stock_prediction_model", "layers": layers,
+                                     "input_layers": inputs, "output_layers": outputs}},
+        "weightsManifest": [{"paths": ["group1-shard1of1.bin"], "weights": weights}],
+    }
+
+
+def bench_convert(data: dict, repeat: int) -> dict:
+    topology = data["topology"]
+    seconds = float("inf")
+    for _ in range(repeat):
+        doc = copy.deepcopy(topology)
+        start = time.perf_counter()
+        patch_input_layers(doc["modelTopology"])
+        normalize_names(doc)
+        seconds = min(seconds, time.perf_counter() - start)
+    return {"seconds": seconds, "json_bytes": len(json.dumps(topology))}
+
+
+def prepare(name: str, n_tickers: int, years: int, data: dict):
+    """Builds (and keeps) the synthetic inputs the named benchmark needs."""
+    n_bars = years * BARS_PER_YEAR
+    if name in ("indicators", "sequences", "train_epoch") and "ohlcv" not in data:
+        data["ohlcv"] = make_universe(n_tickers, n_bars)
+    if name in ("sequences", "train_epoch") and "features" not in data:
+        data["features"] = feature_matrices(data["ohlcv"])
+    if name == "records" and "indicator_frames" not in data:
+        data["indicator_frames"] = make_universe(n_tickers, n_bars, indicators=True)
+    if name == "convert" and "topology" not in data:
+        data["topology"] = stacked_topology(n_tickers)
+
+
+RUNNERS = {
+    "indicators": bench_indicators,
+    "records": bench_records,
+    "sequences": bench_sequences,
+    "train_epoch": bench_train_epoch,
+    "convert": bench_convert,
+}
+
+
+# ─── Results ──────────────────────────────────────────────────────────────────
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "tensorflow": tf.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results: dict, baseline: dict) -> list:
+    """[(benchmark, tickers, baseline s, current s)] for timings over REGRESSION_TOLERANCE slower."""
+    regressions = []
+    for name, sizes in results["benchmarks"].items():
+        for n, r in sizes.items():
+            old = baseline.get("benchmarks", {}).get(name, {}).get(n, {})
+            if "seconds" in r and old.get("seconds"):
+                ratio = r["seconds"] / old["seconds"]
+                print(f"  {name:<12} {n:>5} tickers  {old['seconds']:>9.3f}s -> {r['seconds']:>9.3f}s  {ratio:>5.2f}x")
+                if ratio > REGRESSION_TOLERANCE and r["seconds"] >= MIN_COMPARE_SECONDS:
+                    regressions.append((name, n, old["seconds"], r["seconds"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, nargs="+", default=[10, 100, 600])
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--output", help="Results file (default: pipeline/reports/benchmarks/<commit>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to check for regressions")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "generated_at": datetime.now().isoformat(),
+        "years": args.years,
+        "repeat": args.repeat,
+        "environment": environment(),
+        "benchmarks": {name: {} for name in args.only},
+    }
+
+    print(f"{'benchmark':<12} {'tickers':>8} {'seconds':>10}  detail")
+    for n in args.tickers:
+        data = {}
+        for name in args.only:
+            prepare(name, n, args.years, data)
+            r = RUNNERS[name](data, 1 if name == "train_epoch" else args.repeat)
+            results["benchmarks"][name][str(n)] = r
+            detail = ", ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}"
+                               for k, v in r.items() if k != "seconds")
+            print(f"{name:<12} {n:>8} {r['seconds']:>10.3f}  {detail}")
+
+    label = commit or datetime.now().strftime("%Y%m%d-%H%M%S")
+    output = args.output or os.path.join(REPORT_DIR, f"{label}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults -> {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.baseline} (commit {baseline.get('commit')}):")
+        regressions = compare(results, baseline)
+        for name, n, old, new in regressions:
+            print(f"  ⚠ {name} at {n} tickers: {old:.3f}s -> {new:.3f}s")
+        if regressions:
+            sys.exit(1)
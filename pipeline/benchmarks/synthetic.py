@@ -0,0 +1,75 @@
+"""
+Synthetic OHLCV data for offline benchmarks.
+
+Shapes and dtypes mirror what yf.download returns for a single ticker
+(DatetimeIndex named 'Date'; Open/High/Low/Close as float64, Volume as int64),
+so benchmarks exercise the same code paths as a live run without network access.
+"""
+import numpy as np
+import pandas as pd
+
+BARS_PER_YEAR = 252
+INDICATOR_COLUMNS = [
+    "returns", "rsi14", "macd", "ma20", "sma_50", "bb_upper", "bb_lower", "volume_ma5"
+]
+
+
+def make_ohlcv(n_bars: int = 5 * BARS_PER_YEAR, seed: int = 0, start: str = "2020-01-01") -> pd.DataFrame:
+    """Geometric random-walk daily bars for one ticker."""
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, n_bars)))
+    spread = np.abs(rng.normal(0, 0.01, n_bars)) * close
+    open_ = close * (1 + rng.normal(0, 0.005, n_bars))
+    df = pd.DataFrame(
+        {
+            "Open": open_,
+            "High": np.maximum(open_, close) + spread,
+            "Low": np.minimum(open_, close) - spread,
+            "Close": close,
+            "Volume": rng.integers(100_000, 5_000_000, n_bars).astype(np.int64),
+        },
+        index=pd.bdate_range(start, periods=n_bars, name="Date"),
+    )
+    return df
+
+
+def make_indicator_frame(n_bars: int = 5 * BARS_PER_YEAR, seed: int = 0) -> pd.DataFrame:
+    """
+    A post-compute_indicators, post-reset_index frame without needing `ta`.
+    A few ±inf cells are injected so the null-handling path is exercised.
+    """
+    rng = np.random.default_rng(seed)
+    df = make_ohlcv(n_bars, seed)
+    for col in INDICATOR_COLUMNS:
+        df[col] = rng.normal(0, 1, n_bars) * df["Close"].to_numpy()
+    bad = rng.choice(n_bars, size=max(1, n_bars // 500), replace=False)
+    df.iloc[bad, df.columns.get_loc("returns")] = np.inf
+    return df.reset_index()
+
+
+def make_universe(n_tickers: int, n_bars: int = 5 * BARS_PER_YEAR, indicators: bool = False) -> dict:
+    """{ticker: frame} for `n_tickers` synthetic tickers (deterministic per index)."""
+    make = make_indicator_frame if indicators else make_ohlcv
+    return {f"SYN{i:04d}": make(n_bars, seed=i) for i in range(n_tickers)}
+
+
+class SyntheticSource:
+    """
+    Offline stand-in for utils.ingest.YFinanceSource.
+    Each download call sleeps `latency` seconds (one grouped request) plus
+    `per_ticker_latency` per requested ticker, then returns synthetic bars.
+    """
+
+    def __init__(self, n_bars: int = 5 * BARS_PER_YEAR, latency: float = 0.0, per_ticker_latency: float = 0.0):
+        self.n_bars = n_bars
+        self.latency = latency
+        self.per_ticker_latency = per_ticker_latency
+
+    def download(self, tickers, start, end):
+        import time
+        time.sleep(self.latency + self.per_ticker_latency * len(tickers))
+        frames = {}
+        for ticker in tickers:
+            seed = int.from_bytes(ticker.encode(), "little") % (2 ** 32)
+            frames[ticker] = make_ohlcv(self.n_bars, seed=seed)
+        return frames
@@ -2,29 +2,22 @@ import os
 import sys
 import tempfile
 import json
-from dotenv import load_dotenv
-import supabase
-import tensorflowjs as tfjs
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import h5py
+import joblib
+import numpy as np
 import tensorflow as tf
+from utils import instrumentation
+from utils.config import supabase, add_ticker_argument, selected_tickers
+from utils.manifest import Manifest, combine, hash_file, hash_json, model_version
+from utils.bundle import BUNDLE_NAME, write_bundle
+from utils.keras_compat import keras_version, load_h5_model
+from utils.storage import Uploader, models_bucket, summarize
+import train_models as tm
 
-# Load environment variables
-load_dotenv()
-
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-
-if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
-    print("Error: SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set.")
-    sys.exit(1)
-
-# Initialize Supabase client
-supabase = supabase.create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
-
-# Tickers to process
-TICKERS = [
-    "ASML.AS", "SAP.DE", "NESN.SW", "MC.PA", "NOVO-B.CO",
-    "NOVN.SW", "ROG.SW", "TTE.PA", "SIE.DE", "OR.PA"
-]
 
 def patch_input_layers(obj):
     """
@@ -68,139 +61,300 @@ def normalize_names(obj):
         for item in obj:
             normalize_names(item)
 
-def convert_ticker(ticker: str, tmp_dir: str):
-    print(f"\nConverting {ticker}...")
-    ticker_dir = os.path.join(tmp_dir, ticker)
-    os.makedirs(ticker_dir, exist_ok=True)
-
-    # Load the trained .h5 model from the local pipeline/models directory
-    model_local = os.path.join(os.path.dirname(__file__), "models", ticker, "model.h5")
-    
-    if not os.path.exists(model_local):
-        print(f"  [SKIP] Model file not found: {model_local}")
-        return
-
-    # Convert to TF.js
-    tfjs_path = os.path.join(ticker_dir, "tfjs")
-    os.makedirs(tfjs_path, exist_ok=True)
-    
-    # Standard Keras -> TF.js conversion
+# ─── Conversion ───────────────────────────────────────────────────────────────
+#
+# The .h5 already holds everything TF.js needs: keras_h5_conversion reads the
+# topology and weights straight from it, the browser fixes are applied to the
+# in-memory topology and weight names, and model.json is written once by
+# write_artifacts. No Keras model is built and the artifact is never modified.
+# tensorflowjs is imported where it's used, so importing this module (the
+# benchmarks, `pipeline convert --help`) doesn't load it.
+#
+# Only a file whose config this Keras can't express as-is (Keras 3 metadata)
+# goes through Keras: its config is cleaned in memory, the model is rebuilt
+# with the weights from the untouched file and re-saved to a temp .h5.
+
+def _model_path(ticker: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", ticker, "model.h5")
+
+
+def _resave_with_keras(model_path: str, tmp_path: str):
+    """Rebuilds a Keras 3 .h5 (config cleaned in memory) and saves it as Keras 2 to tmp_path."""
     try:
-        model = tf.keras.models.load_model(model_local, compile=False)
-    except Exception as e:
-        if "Unrecognized keyword arguments" in str(e) or "DTypePolicy" in str(e):
-            print(f"  [!] Metadata conflict detected (Keras 3 -> Keras 2). Patching H5 metadata...")
-            # Fallback for environments with version mismatches (e.g. TF 2.20 vs older tfjs)
-            import h5py
-            import json
-            with h5py.File(model_local, 'a') as f:
-                if 'model_config' in f.attrs:
-                    try:
-                        config_str = f.attrs['model_config']
-                        if hasattr(config_str, 'decode'):
-                            config_str = config_str.decode('utf-8')
-                        config = json.loads(config_str)
-                        
-                        # Recursive stripper for Keras 3 specific keys
-                        def strip_k3_keys(obj):
-                            if isinstance(obj, dict):
-                                # Rename batch_shape to batch_input_shape (legacy)
-                                if "batch_shape" in obj:
-                                    obj["batch_input_shape"] = obj.pop("batch_shape")
-                                
-                                # Remove Keras 3 specific parameters not recognized by Keras 2
-                                k3_keys = [
-                                    "optional", "dtype_policy", "DTypePolicy", 
-                                    "trainable", "dtype", "ragged", "sparse",
-                                    "quantization_config"
-                                ]
-                                for key in k3_keys:
-                                    obj.pop(key, None)
-                                    
-                                for k, v in list(obj.items()):
-                                    # Recursively clean nested dicts or configs
-                                    if k == "config" and isinstance(v, dict):
-                                        strip_k3_keys(v)
-                                    elif isinstance(v, (dict, list)):
-                                        strip_k3_keys(v)
-                            elif isinstance(obj, list):
-                                for item in obj:
-                                    strip_k3_keys(item)
-                        
-                        strip_k3_keys(config)
-                        f.attrs['model_config'] = json.dumps(config).encode('utf-8')
-                        print(f"  [OK] Stripped Keras 3 metadata from {ticker}")
-                    except Exception as patch_err:
-                        print(f"  [WARNING] Failed to patch H5 metadata: {patch_err}")
-            
-            # Try loading again after patch
-            model = tf.keras.models.load_model(model_local, compile=False)
-        else:
-            raise e
-
-    tfjs.converters.save_keras_model(model, tfjs_path)
-    print(f"  [OK] Converted to TF.js format")
-
-    # Patch the model.json for browser compatibility
-    model_json_path = os.path.join(tfjs_path, "model.json")
-    if os.path.exists(model_json_path):
-        with open(model_json_path, 'r') as f:
-            model_json = json.load(f)
-        
-        if patch_input_layers(model_json):
-            print(f"  [OK] Patched InputLayer config")
-        
-        # New normalization step
-        normalize_names(model_json)
-        print(f"  [OK] Normalized weight and layer names")
-
-        with open(model_json_path, 'w') as f:
-            json.dump(model_json, f)
-
-    # List generated files
-    generated_files = os.listdir(tfjs_path)
-    print(f"  [OK] Generated: {generated_files}")
-
-    # Upload TF.js files back to Supabase Storage
-    for fname in generated_files:
-        fpath = os.path.join(tfjs_path, fname)
-        ct = "application/json" if fname.endswith(".json") else "application/octet-stream"
-        print(f"    - Uploading {fname} ({ct})...")
-        with open(fpath, "rb") as f:
-            try:
-                # Upsert="true" is required as a string by the Supabase Python client
-                supabase.storage.from_("models").upload(
-                    path=f"{ticker}/{fname}",
-                    file=f,
-                    file_options={"upsert": "true", "content-type": ct}
-                )
-                print(f"      [OK] Uploaded {fname}")
-            except Exception as e:
-                # Fallback to update if upload fails (e.g. if upsert has issues)
-                if "already exists" in str(e).lower() or "409" in str(e):
-                    with open(fpath, "rb") as f2:
-                        supabase.storage.from_("models").update(
-                            path=f"{ticker}/{fname}",
-                            file=f2,
-                            file_options={"content-type": ct}
-                        )
-                    print(f"      [OK] Updated {fname}")
+        load_h5_model(model_path).save(tmp_path)
+    finally:
+        # One TF runtime per worker process; drop this model's graph state before the next ticker
+        tf.keras.backend.clear_session()
+
+
+def convert_h5(model_path: str, out_dir: str, quantize: str = None):
+    """
+    Writes the browser-ready TF.js model for model_path into out_dir, with
+    weights stored as `quantize` ("float16"/"uint8") if given, else float32.
+    Returns the generated file names.
+    """
+    from tensorflowjs.converters import keras_h5_conversion
+
+    version = keras_version(model_path)
+    source = model_path
+    if not version.startswith("2."):
+        print(f"  [!] Metadata conflict detected (Keras {version or '?'} -> Keras 2). Patching config in memory...")
+        source = os.path.join(out_dir, "_keras2.h5")
+        _resave_with_keras(model_path, source)
+
+    with h5py.File(source, "r") as f:
+        topology, weight_groups = keras_h5_conversion.h5_merged_saved_model_to_tfjs_format(f)
+    if source != model_path:
+        os.remove(source)
+
+    # Same topology the old load(compile=False) -> save_keras_model round trip produced
+    topology.pop("training_config", None)
+    patch_input_layers(topology)
+    normalize_names(topology)
+    normalize_names(weight_groups)  # weight names end up in the model.json weightsManifest
+
+    os.makedirs(out_dir, exist_ok=True)
+    keras_h5_conversion.write_artifacts(topology, weight_groups, out_dir,
+                                        quantization_dtype_map={quantize: "*"} if quantize else None)
+    return sorted(os.listdir(out_dir))
+
+# ─── Quantization ─────────────────────────────────────────────────────────────
+#
+# TF.js dequantizes float16/uint8 weights on load, so smaller shards cost the
+# browser nothing but precision. Before a quantized export is accepted, the
+# float32 model and the same model with quantize->dequantize round-tripped
+# weights (exactly what the browser will compute with) both predict the
+# ticker's validation windows; if any prediction moves by more than the
+# tolerance the ticker is exported as float32 instead.
+
+QUANTIZE_DTYPES = ["float16", "uint8"]
+QUANTIZE_TOLERANCE = 0.005   # max |quantized - float32| prediction, in scaled close units (0.5% of its range)
+
+
+def validation_windows(ticker: str):
+    """
+    The rows behind the ticker's validation windows (last VAL_SPLIT of
+    sequences), scaled with its saved scaler, or None. Their windows are
+    gathered per batch by train_models.window_dataset.
+    """
+    scaler_path = os.path.join(os.path.dirname(_model_path(ticker)), "scaler.pkl")
+    if not os.path.exists(scaler_path):
+        return None
+    df = tm.price_cache.load_frame(ticker)[tm.FEATURES].dropna()
+    rows = joblib.load(scaler_path).transform(df).astype(np.float32)
+    split, n_windows = tm.split_windows(len(rows))
+    return rows[split:] if n_windows > split else None
+
+
+def quantization_error(model_path: str, val_rows: np.ndarray, dtype: str) -> float:
+    """Largest change in any prediction on val_rows' windows when the weights are stored as `dtype`."""
+    from tensorflowjs import quantization
+
+    np_dtype = quantization.QUANTIZATION_OPTION_TO_DTYPES[dtype]
+    try:
+        model = load_h5_model(model_path)
+        windows = tm.window_dataset(val_rows, targets=False)
+        reference = model.predict(windows, verbose=0)
+        model.set_weights([quantization.dequantize_weights(*quantization.quantize_weights(w, np_dtype))
+                           for w in model.get_weights()])
+        return float(np.max(np.abs(model.predict(windows, verbose=0) - reference)))
+    finally:
+        tf.keras.backend.clear_session()
+
+
+def _dir_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def write_ticker_bundle(ticker: str, tfjs_dir: str):
+    """Writes model.bundle (see utils/bundle.py) next to the TF.js files. Returns its size, or None without a scaler."""
+    model_dir = os.path.dirname(_model_path(ticker))
+    scaler_path = os.path.join(model_dir, "scaler.pkl")
+    if not os.path.exists(scaler_path):
+        print(f"  ⚠ {ticker}: no scaler.pkl — skipping {BUNDLE_NAME}")
+        return None
+    metadata_path = os.path.join(model_dir, "metadata.json")
+    metadata = {}
+    if os.path.exists(metadata_path):
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+    metadata.setdefault("features", tm.FEATURES)
+    metadata.setdefault("window_size", tm.WINDOW_SIZE)
+    metadata.setdefault("forecast_days", tm.FORECAST_DAYS)
+    return write_bundle(os.path.join(tfjs_dir, BUNDLE_NAME), tfjs_dir, joblib.load(scaler_path), metadata,
+                        ticker, model_version(model_dir))
+
+
+def _convert_worker(ticker: str, tmp_dir: str, quantize: str = None, val_rows=None,
+                    tolerance: float = QUANTIZE_TOLERANCE):
+    """
+    Converts one ticker in a pool worker, quantized if the validation windows
+    allow it, and writes its bundle.
+    Returns {"files", "seconds", "error", "dtype", "max_error", "bytes", "bundle_bytes"}.
+    """
+    start = time.perf_counter()
+    result = {"files": None, "error": None, "dtype": "float32", "max_error": None, "bytes": 0, "bundle_bytes": None}
+    try:
+        model_path = _model_path(ticker)
+        if quantize:
+            if val_rows is None:
+                print(f"  ⚠ {ticker}: no validation windows to check {quantize} weights — keeping float32")
+            else:
+                with instrumentation.stage("quantize_check", ticker):
+                    result["max_error"] = quantization_error(model_path, val_rows, quantize)
+                if result["max_error"] <= tolerance:
+                    result["dtype"] = quantize
                 else:
-                    print(f"      [ERROR] Upload failed for {fname}: {e}")
-                    raise e
+                    print(f"  ⚠ {ticker}: {quantize} weights move predictions by {result['max_error']:.5f} "
+                          f"(> {tolerance}) — falling back to float32")
+        out_dir = os.path.join(tmp_dir, ticker, "tfjs")
+        with instrumentation.stage("convert", ticker):
+            convert_h5(model_path, out_dir, quantize=None if result["dtype"] == "float32" else result["dtype"])
+        result["bytes"] = _dir_bytes(out_dir)
+        with instrumentation.stage("bundle", ticker):
+            result["bundle_bytes"] = write_ticker_bundle(ticker, out_dir)
+        result["files"] = sorted(os.listdir(out_dir))
+        instrumentation.note("dtype", result["dtype"], ticker)
+        instrumentation.count("tfjs_bytes", result["bytes"], ticker)
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def convert_digest(ticker: str, quantize: str = None, tolerance: float = QUANTIZE_TOLERANCE) -> str:
+    """Digest of a conversion's inputs: model.h5, plus the scaler and metadata the bundle carries, and the export settings."""
+    model_local = _model_path(ticker)
+    digest = combine(*[hash_file(p) for p in (model_local,
+                                             os.path.join(os.path.dirname(model_local), "scaler.pkl"),
+                                             os.path.join(os.path.dirname(model_local), "metadata.json"))
+                       if os.path.exists(p)])
+    if quantize:
+        digest = combine(digest, hash_json({"quantize": quantize, "tolerance": tolerance}))
+    return digest
+
+
+def convert_ticker(ticker: str, tmp_dir: str, force: bool = False, quantize: str = None):
+    """Converts and uploads a single ticker in-process."""
+    print(f"\nConverting {ticker}...")
+    return convert_all([ticker], tmp_dir, workers=1, force=force, quantize=quantize)
+
+
+def convert_all(tickers, tmp_dir: str, workers: int = 1, force: bool = False, quantize: str = None,
+                tolerance: float = QUANTIZE_TOLERANCE, size_budget_kb: float = None):
+    """
+    Converts every ticker whose model.h5 (or export settings) changed across
+    `workers` processes, then uploads the results. Prints per-ticker timings
+    and artifact sizes. Returns the failed tickers.
+    """
+    bucket = models_bucket(supabase)
+    jobs, failed = {}, []
+    for ticker in tickers:
+        model_local = _model_path(ticker)
+        if not os.path.exists(model_local):
+            print(f"  [SKIP] {ticker}: model file not found: {model_local}")
+            continue
+        # Skip if this exact .h5 was already converted and uploaded (manifest is kept in the bucket too)
+        manifest = Manifest(ticker, bucket=bucket)
+        digest = convert_digest(ticker, quantize, tolerance)
+        if not force and manifest.is_current("convert", digest):
+            print(f"  [SKIP] {ticker}: model.h5 unchanged since last conversion (--force to reconvert)")
+            continue
+        jobs[ticker] = (manifest, digest)
+
+    # Validation windows come from the data cache, read once here rather than in every worker
+    val_rows = {}
+    if quantize:
+        with instrumentation.stage("validation_windows"):
+            val_rows = {ticker: validation_windows(ticker) for ticker in jobs}
+
+    results = {}
+    if workers > 1 and len(jobs) > 1:
+        # spawn, not fork: TensorFlow's runtime is not fork-safe
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            futures = {pool.submit(instrumentation.measured, _convert_worker, ticker, tmp_dir, quantize,
+                                   val_rows.get(ticker), tolerance): ticker
+                       for ticker in jobs}
+            for fut in as_completed(futures):
+                results[futures[fut]] = instrumentation.merged(fut.result())
+    else:
+        for ticker in jobs:
+            results[ticker] = _convert_worker(ticker, tmp_dir, quantize, val_rows.get(ticker), tolerance)
+
+    uploads = []
+    for ticker in jobs:
+        r = results[ticker]
+        if r["error"] is not None:
+            print(f"  ✗ Failed {ticker}: {r['error']}")
+            failed.append(ticker)
+            continue
+        print(f"  [OK] {ticker}: converted in {r['seconds']:.2f}s ({r['dtype']}) — {r['files']}")
+        tfjs_path = os.path.join(tmp_dir, ticker, "tfjs")
+        uploads += [(os.path.join(tfjs_path, fname), f"{ticker}/{fname}") for fname in r["files"]]
+
+    # Upload every ticker's TF.js files back to Supabase Storage in one concurrent batch
+    upload_results = Uploader(bucket).upload(uploads, force=force)
+    print(f"\n  Upload: {summarize(upload_results)}")
+    for ticker, (manifest, digest) in jobs.items():
+        r = results[ticker]
+        if r["error"] is not None:
+            continue
+        errors = [upload_results[f"{ticker}/{fname}"]["error"] for fname in r["files"]
+                  if upload_results[f"{ticker}/{fname}"]["error"] is not None]
+        if errors:
+            print(f"  ✗ Failed {ticker}: upload error: {errors[0]}")
+            failed.append(ticker)
+            continue
+        manifest.record("convert", digest, files=r["files"], seconds=round(r["seconds"], 3),
+                        dtype=r["dtype"], bytes=r["bytes"])
+
+    if results:
+        print(f"\n  {'Ticker':<12} {'Convert (s)':>11} {'Weights':>8} {'Max err':>9} {'TF.js (KB)':>10} {'Bundle (KB)':>11}")
+        for ticker in jobs:
+            r = results[ticker]
+            if r["error"] is not None:
+                print(f"  {ticker:<12} {r['seconds']:>11.3f}  FAILED")
+                continue
+            max_error = f"{r['max_error']:.5f}" if r["max_error"] is not None else "-"
+            kb = r["bytes"] / 1024
+            bundle_kb = f"{r['bundle_bytes'] / 1024:.1f}" if r["bundle_bytes"] else "-"
+            over = "  ⚠ over budget" if size_budget_kb and kb > size_budget_kb else ""
+            print(f"  {ticker:<12} {r['seconds']:>11.3f} {r['dtype']:>8} {max_error:>9} {kb:>10.1f} {bundle_kb:>11}{over}")
+        ok = [r for r in results.values() if r["error"] is None]
+        print(f"  {'Total':<12} {sum(r['seconds'] for r in results.values()):>11.3f} {'':>8} {'':>9} "
+              f"{sum(r['bytes'] for r in ok) / 1024:>10.1f} {sum(r['bundle_bytes'] or 0 for r in ok) / 1024:>11.1f}")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert trained .h5 models to TF.js and upload them.")
+    parser.add_argument("--force", action="store_true",
+                        help="Reconvert and re-upload even if model.h5 is unchanged")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Conversion processes (default: min(4, cores))")
+    parser.add_argument("--quantize", choices=QUANTIZE_DTYPES, default=None,
+                        help="Store weights as float16 or uint8 (validated; falls back to float32 per ticker)")
+    parser.add_argument("--tolerance", type=float, default=QUANTIZE_TOLERANCE,
+                        help="Max allowed change of any scaled validation prediction when quantizing")
+    parser.add_argument("--size-budget-kb", type=float, default=None,
+                        help="Flag tickers whose TF.js artifacts exceed this size")
+    add_ticker_argument(parser)
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.start("convert_models", args)
 
-if __name__ == "__main__":
-    has_errors = False
     with tempfile.TemporaryDirectory() as tmp:
-        for ticker in TICKERS:
-            try:
-                convert_ticker(ticker, tmp)
-            except Exception as e:
-                print(f"  ✗ Failed {ticker}: {e}")
-                has_errors = True
-
-    if has_errors:
+        failed = convert_all(selected_tickers(args), tmp, workers=args.workers, force=args.force, quantize=args.quantize,
+                             tolerance=args.tolerance, size_budget_kb=args.size_budget_kb)
+    instrumentation.finish(failed=failed)
+
+    if failed:
         print("\nConversion finished with ERRORS.")
         sys.exit(1)
     else:
         print("\nConversion complete.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,104 +1,125 @@
-import os
-import yfinance as yf
-import pandas as pd
-import numpy as np
+import argparse
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
-from supabase import create_client, Client
-from utils.indicators import compute_indicators
-
-load_dotenv()
-
-# Top 10 STOXX Europe 600 companies by market cap (representative tickers)
-TICKERS = [
-    "ASML.AS",     # ASML
-    "SAP.DE",      # SAP
-    "NESN.SW",     # Nestle
-    "MC.PA",       # LVMH
-    "NOVO-B.CO",   # Novo Nordisk
-    "NOVN.SW",     # Novartis
-    "ROG.SW",      # Roche
-    "TTE.PA",      # TotalEnergies
-    "SIE.DE",      # Siemens
-    "OR.PA"        # L'Oreal
-]
-
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") # Use service role key to bypass RLS for inserts
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("Missing Supabase credentials in environment.")
-    exit(1)
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-def fetch_and_store_data(tickers, lookback_years=5):
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=365 * lookback_years)
-    
-    print(f"Fetching data from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}...")
-    
+from utils import ingest, instrumentation
+from utils.config import SUPABASE_DB_URL, supabase, add_ticker_argument, selected_tickers
+from utils.ingest import YFinanceSource, SupabaseSink, PostgresSink, run_ingestion
+
+# Indicator warm-up for incremental runs. sma_50 is the longest window (50 bars);
+# MACD(26) and RSI(14) are exponential and need extra bars to settle, so we
+# re-download 150 bars before the last stored date and only keep the new ones.
+WARMUP_BARS = 150
+
+
+def plan_jobs(tickers, sink, lookback_years=5, full_backfill=False, end_date=None):
+    """
+    Returns {ticker: (start_date, keep_from)} for run_ingestion.
+
+    Incremental by default: tickers that already have rows download only the
+    bars since the last stored date plus WARMUP_BARS of indicator history, and
+    keep rows from the last stored bar on (it may have been written mid-session
+    and revised since). Tickers with no stored rows, or every ticker when
+    `full_backfill` is set, get the full `lookback_years` window.
+    """
+    end_date = end_date or datetime.now()
+    full_start = end_date - timedelta(days=365 * lookback_years)
+    # Trading bars -> calendar days (5 trading days a week) plus a holiday buffer
+    warmup_padding = timedelta(days=int(WARMUP_BARS * 7 / 5) + 14)
+
+    latest_dates = {} if full_backfill else sink.latest_dates(tickers)
+
+    jobs = {}
     for ticker in tickers:
-        print(f"Processing {ticker}...")
-        try:
-            # Fetch data from yfinance
-            df = yf.download(ticker, start=start_date, end=end_date)
-            
-            if df.empty:
-                print(f"No data returned for {ticker}.")
-                continue
-                
-            # Flatten multi-index columns if returned by yfinance v0.2.x+
-            if isinstance(df.columns, pd.MultiIndex):
-                 df.columns = [c[0] for c in df.columns]
-                
-            # Compute technical indicators (Tier 1 & 2)
-            df = compute_indicators(df)
-            
-            # Drop NaN rows resulting from indicator windows (e.g. SMA_50 needs 50 days)
-            df = df.dropna()
-            
-            # Reset index to make 'Date' a column
-            df = df.reset_index()
-            
-            # Ensure proper typing and replace NaNs/Infs for JSON serialization
-            df = df.replace([np.inf, -np.inf], None)
-            df = df.where(pd.notnull(df), None)
-            
-            records = []
-            for _, row in df.iterrows():
-                # Extract simple scalar values for insert
-                record = {
-                    "ticker": ticker,
-                    "date": row['Date'].strftime('%Y-%m-%d'),
-                    "open": float(row['Open']) if row['Open'] is not None else None,
-                    "high": float(row['High']) if row['High'] is not None else None,
-                    "low": float(row['Low']) if row['Low'] is not None else None,
-                    "close": float(row['Close']) if row['Close'] is not None else None,
-                    "volume": int(row['Volume']) if row['Volume'] is not None else None,
-                    "returns": float(row['returns']) if row['returns'] is not None else None,
-                    "ma20": float(row['ma20']) if row['ma20'] is not None else None,
-                    "sma_50": float(row['sma_50']) if row['sma_50'] is not None else None,
-                    "rsi14": float(row['rsi14']) if row['rsi14'] is not None else None,
-                    "macd": float(row['macd']) if row['macd'] is not None else None,
-                    "bb_upper": float(row['bb_upper']) if row['bb_upper'] is not None else None,
-                    "bb_lower": float(row['bb_lower']) if row['bb_lower'] is not None else None,
-                    "volume_ma5": float(row['volume_ma5']) if row['volume_ma5'] is not None else None
-                }
-                records.append(record)
-            
-            # Upsert into supabase in batches of 1000 to prevent payload too large errors
-            batch_size = 1000
-            inserted = 0
-            for i in range(0, len(records), batch_size):
-                batch = records[i:i+batch_size]
-                res = supabase.table("daily_prices").upsert(batch, on_conflict="ticker,date").execute()
-                inserted += len(batch)
-            
-            print(f"Successfully upserted {inserted} records for {ticker}.")
-        
-        except Exception as e:
-            print(f"Error processing {ticker}: {str(e)}")
+        last_stored = latest_dates.get(ticker)
+        if last_stored is None:
+            jobs[ticker] = (full_start, None)
+        else:
+            # Normalise to midnight so tickers stored up to the same day share a grouped request
+            start = (last_stored - warmup_padding).replace(hour=0, minute=0, second=0, microsecond=0)
+            jobs[ticker] = (start, last_stored)
+            print(f"  {ticker}: last stored bar {last_stored.strftime('%Y-%m-%d')}, downloading from {start.strftime('%Y-%m-%d')}")
+    return jobs
+
+
+def fetch_and_store_data(tickers, lookback_years=5, full_backfill=False, source=None, sink=None, **pipeline_options):
+    """
+    Downloads daily bars, computes indicators and upserts them into daily_prices.
+
+    Download, indicator computation and upserts run as a staged pipeline (see
+    utils/ingest.py); `pipeline_options` are passed through to run_ingestion
+    (worker counts, queue depths, retries). `source`/`sink` default to
+    yfinance and Supabase and can be swapped for local stand-ins.
+    """
+    source = source or YFinanceSource()
+    sink = sink or SupabaseSink(supabase)
+    end_date = datetime.now()
+
+    mode = "full backfill" if full_backfill else "incremental"
+    print(f"Fetching data ({mode}) up to {end_date.strftime('%Y-%m-%d')}...")
+
+    with instrumentation.stage("plan"):
+        jobs = plan_jobs(tickers, sink, lookback_years, full_backfill, end_date)
+    results = run_ingestion(jobs, source, sink, end_date, **pipeline_options)
+
+    for ticker, result in results.items():
+        if result["error"] is None:
+            print(f"Successfully upserted {result['rows']} records for {ticker}.")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch daily prices and indicators into Supabase.")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-download the whole lookback window and upsert every row")
+    parser.add_argument("--lookback-years", type=int, default=5,
+                        help="History to download for full backfills and new tickers (default: 5)")
+    parser.add_argument("--chunk-size", type=int, default=ingest.CHUNK_SIZE,
+                        help="Tickers per grouped download request")
+    parser.add_argument("--download-workers", type=int, default=ingest.DOWNLOAD_WORKERS)
+    parser.add_argument("--compute-workers", type=int, default=ingest.COMPUTE_WORKERS,
+                        help="Indicator worker processes (1 = compute in-thread)")
+    parser.add_argument("--upload-workers", type=int, default=ingest.UPLOAD_WORKERS)
+    parser.add_argument("--compute-queue", type=int, default=ingest.COMPUTE_QUEUE_DEPTH,
+                        help="Max downloaded chunks waiting for compute")
+    parser.add_argument("--upload-queue", type=int, default=ingest.UPLOAD_QUEUE_DEPTH,
+                        help="Max record batches waiting for upload")
+    parser.add_argument("--sink", choices=["rest", "postgres"], default="rest",
+                        help="Write through the REST API, or bulk-load over SUPABASE_DB_URL with COPY "
+                             "(much faster for backfills)")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help=f"Rows per write (default: {ingest.UPSERT_BATCH_SIZE} for rest, "
+                             f"{ingest.COPY_BATCH_SIZE} for postgres)")
+    add_ticker_argument(parser)
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.start("fetch_data", args)
+
+    if args.sink == "postgres":
+        if not SUPABASE_DB_URL:
+            print("--sink postgres needs SUPABASE_DB_URL (the database connection string).")
+            exit(1)
+        sink = PostgresSink(SUPABASE_DB_URL)
+        batch_size = args.batch_size or ingest.COPY_BATCH_SIZE
+    else:
+        sink = SupabaseSink(supabase)
+        batch_size = args.batch_size or ingest.UPSERT_BATCH_SIZE
+
+    results = fetch_and_store_data(
+        selected_tickers(args),
+        sink=sink,
+        lookback_years=args.lookback_years,
+        full_backfill=args.full,
+        chunk_size=args.chunk_size,
+        download_workers=args.download_workers,
+        compute_workers=args.compute_workers,
+        upload_workers=args.upload_workers,
+        compute_queue_depth=args.compute_queue,
+        upload_queue_depth=args.upload_queue,
+        batch_size=batch_size,
+    )
+    if args.sink == "postgres":
+        sink.close()
+    instrumentation.finish(failed=[t for t, r in results.items() if r["error"] is not None])
+
 
 if __name__ == "__main__":
-    fetch_and_store_data(TICKERS)
+    main()
@@ -0,0 +1,271 @@
+import os
+import json
+import argparse
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from utils import ingest, instrumentation
+from utils.config import SUPABASE_DB_URL, supabase, add_ticker_argument, selected_tickers
+from utils.data_loader import PriceCache
+from utils.indicators import INDICATOR_COLUMNS, StreamingIndicators
+from utils.ingest import YFinanceSource, SupabaseSink, PostgresSink, with_retry
+from utils.intraday import (COMPACT_SLACK_DAYS, INTERVAL, RETENTION_DAYS, STORE_DIR, IntradayStore,
+                            day_bounds, timestamp_day)
+from utils.records import frame_to_records
+
+# ─── Intraday Ingestion ───────────────────────────────────────────────────────
+#
+# The half-hourly runs of update_data.yml use this instead of fetch_data.py:
+# 1. download only the bars since each ticker's last stored bar (the last one
+#    again: it may have been partial) and append them to the columnar store
+#    (utils/intraday.py)
+# 2. roll each session's bars up into one daily OHLCV bar: the latest
+#    session running today, and earlier ones if this script wrote their row
+#    while they were still running (a row written by fetch_data.py is never
+#    overwritten)
+# 3. compute each day's indicators with the streaming engine
+#    (utils/indicators.py): its state after the previous day is kept per
+#    ticker in the store and advanced with daily_prices rows read through an
+#    incremental PriceCache, so no daily history is downloaded again
+# 4. upsert those daily_prices rows; the latest is revised every run until
+#    the session closes (fetch_data.py later writes yfinance's own daily bar)
+# 5. compact tickers whose oldest bars are past the retention window
+#
+# Tickers are processed CHUNK_SIZE at a time, so memory stays flat as the
+# universe grows; disk is bounded by --retention-days.
+
+INITIAL_DAYS = 5           # intraday history downloaded for a ticker with nothing stored
+DAILY_COLUMNS = ["close", "volume"]   # the daily bars' inputs to the streaming indicators
+# Its own cache: PriceCache keeps one column set per directory, and training's differs
+DAILY_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "intraday_daily")
+STATE_FILE = "indicators.json"
+SESSION_FILE = "session.json"   # the last row upserted: {"date", "close", "volume"}
+
+
+def plan_starts(tickers, store: IntradayStore, now: datetime) -> dict:
+    """{ticker: download start date}: the day of the last stored bar, or INITIAL_DAYS back."""
+    starts = {}
+    for ticker in tickers:
+        last = store.last_timestamp(ticker)
+        starts[ticker] = timestamp_day(last) if last is not None else (now - timedelta(days=INITIAL_DAYS)).date()
+    return starts
+
+
+def session_features(ticker: str, day, bar: dict, daily: pd.DataFrame, store: IntradayStore) -> dict:
+    """
+    Indicators for `day` with `bar` as its daily bar. The streaming state
+    after the last daily_prices row before `day` is saved next to the
+    ticker's bars; it is rebuilt from all rows if that row has changed since
+    (fetch_data.py replaces rolled-up rows with yfinance's daily bar).
+    """
+    path = os.path.join(store.ticker_dir(ticker), STATE_FILE)
+    daily = daily[daily.index < pd.Timestamp(day)]
+    dates = daily.index.strftime("%Y-%m-%d").tolist()
+    values = daily[DAILY_COLUMNS].to_numpy(dtype=np.float64)
+
+    engine, start = StreamingIndicators(), 0
+    if os.path.exists(path):
+        with open(path) as f:
+            saved = json.load(f)
+        if saved["through"] in dates:
+            i = dates.index(saved["through"])
+            if np.array_equal(values[i], np.array(saved["last"], dtype=np.float64), equal_nan=True):
+                engine, start = StreamingIndicators.from_state(saved["state"]), i + 1
+    for close, volume in values[start:]:
+        engine.update(close, volume)
+    if len(dates) and start < len(dates):
+        with open(path + ".tmp", "w") as f:
+            json.dump({"through": dates[-1], "last": values[-1].tolist(), "state": engine.to_state()}, f)
+        os.replace(path + ".tmp", path)
+
+    # The session bar goes into a copy: it changes until the session closes
+    return StreamingIndicators.from_state(engine.to_state()).update(bar["Close"], bar["Volume"])
+
+
+def session_days(store: IntradayStore, ticker: str, since) -> list:
+    """UTC days with stored bars from `since` on, in order."""
+    ts, _ = store.read(ticker, start=day_bounds(since)[0])
+    return [timestamp_day(int(t)) for t in np.unique(ts // 86400) * 86400]
+
+
+def session_record(ticker: str, day, bar: dict, features: dict) -> dict:
+    row = {"Date": pd.Timestamp(day), **{k: bar[k] for k in ("Open", "High", "Low", "Close", "Volume")}}
+    row.update({c: np.nan if features[c] is None else features[c] for c in INDICATOR_COLUMNS})
+    return frame_to_records(pd.DataFrame([row]), ticker)[0]
+
+
+def _last_session(store: IntradayStore, ticker: str):
+    path = os.path.join(store.ticker_dir(ticker), SESSION_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_session(store: IntradayStore, record: dict):
+    path = os.path.join(store.ticker_dir(record["ticker"]), SESSION_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump({k: record[k] for k in ("date", "close", "volume")}, f)
+    os.replace(path + ".tmp", path)
+
+
+def session_records(ticker: str, store: IntradayStore, daily: pd.DataFrame, since, today) -> list:
+    """
+    daily_prices records for the sessions with bars from `since` on: `today`'s
+    (the running session), and earlier ones whose stored row is still the
+    last one this script upserted (so it was partial). Returns [] without
+    enough history.
+    """
+    days = session_days(store, ticker, since)
+    last = _last_session(store, ticker)
+    daily = daily.copy()
+    records = []
+    for day in days:
+        # A past session's row may be fetch_data.py's daily bar by now, even
+        # when it is the latest with bars (a holiday, or before today's first bar)
+        if day != today:
+            key = pd.Timestamp(day)
+            ours = (last is not None and last["date"] == day.isoformat() and key in daily.index
+                    and [float(v) for v in daily.loc[key, DAILY_COLUMNS]] == [last["close"], last["volume"]])
+            if not ours:
+                continue
+        bar = store.rollup(ticker, day)
+        features = session_features(ticker, day, bar, daily, store)
+        if any(features[c] is None for c in INDICATOR_COLUMNS):
+            print(f"  ⚠ {ticker}: too little daily history for indicators — run `pipeline fetch` first")
+            return []
+        record = session_record(ticker, day, bar, features)
+        records.append(record)
+        # Later sessions' indicators build on this one
+        daily.loc[pd.Timestamp(day), DAILY_COLUMNS] = [record["close"], record["volume"]]
+    return records
+
+
+def ingest_intraday(tickers, store: IntradayStore, source, sink, daily_cache: PriceCache, now: datetime,
+                    chunk_size: int = ingest.CHUNK_SIZE, retries: int = ingest.RETRIES,
+                    backoff: float = ingest.BACKOFF_SECONDS) -> dict:
+    """
+    Appends new bars and upserts each ticker's current session row.
+    Returns {ticker: {"bars": stored, "session": date or None, "error": message or None}}.
+    """
+    results = {ticker: {"bars": 0, "session": None, "error": None} for ticker in tickers}
+    starts = plan_starts(tickers, store, now)
+    end = (now + timedelta(days=1)).date()
+
+    # Tickers with the same start share grouped requests, as in run_ingestion
+    by_start = {}
+    for ticker, start in starts.items():
+        by_start.setdefault(start, []).append(ticker)
+    chunks = [(start, group[i:i + chunk_size])
+              for start, group in sorted(by_start.items()) for i in range(0, len(group), chunk_size)]
+
+    for start, chunk in chunks:
+        try:
+            with instrumentation.stage("download"):
+                frames = with_retry(source.download, chunk, start, end, retries=retries, backoff=backoff)
+            with instrumentation.stage("daily_sync"):
+                daily = daily_cache.load_many(chunk)
+        except Exception as e:
+            for ticker in chunk:
+                results[ticker]["error"] = str(e)
+            print(f"  [ERROR] {', '.join(chunk)}: {e}")
+            continue
+
+        records = []
+        for ticker in chunk:
+            try:
+                df = frames.get(ticker)
+                if df is None or df.empty:
+                    raise ValueError("No data returned")
+                with instrumentation.stage("append", ticker):
+                    results[ticker]["bars"] = store.append(ticker, df)
+                instrumentation.count("bars_stored", results[ticker]["bars"], ticker)
+                with instrumentation.stage("rollup", ticker):
+                    sessions = session_records(ticker, store, daily[ticker], starts[ticker],
+                                               now.astimezone(timezone.utc).date())
+                results[ticker]["session"] = date.fromisoformat(sessions[-1]["date"]) if sessions else None
+                records += sessions
+                if sessions:
+                    print(f"  {ticker}: {results[ticker]['bars']} bars stored, "
+                          f"sessions {', '.join(r['date'] for r in sessions)} (close {sessions[-1]['close']:.2f})")
+            except Exception as e:
+                results[ticker]["error"] = str(e)
+                print(f"  [ERROR] {ticker}: {e}")
+
+        if records:
+            try:
+                with instrumentation.stage("upsert"):
+                    with_retry(sink.upsert, records, retries=retries, backoff=backoff)
+                instrumentation.count("rows_upserted", len(records))
+                for record in records:   # in date order: each ticker ends on its latest session
+                    _save_session(store, record)
+            except Exception as e:
+                for record in records:
+                    results[record["ticker"]]["error"] = str(e)
+                print(f"  [ERROR] upsert failed for {', '.join(r['ticker'] for r in records)}: {e}")
+    return results
+
+
+def compact_store(store: IntradayStore, tickers, now: datetime, retention_days: int = RETENTION_DAYS,
+                  slack_days: int = COMPACT_SLACK_DAYS) -> int:
+    """Applies the retention policy to `tickers`' bars. Returns the number of bars dropped."""
+    dropped = 0
+    for ticker in tickers:
+        cutoff = store.compact_due(ticker, now, retention_days, slack_days)
+        if cutoff is None:
+            continue
+        with instrumentation.stage("compact", ticker):
+            n = store.compact(ticker, cutoff)
+        print(f"  Compacted {ticker}: dropped {n} bars older than {retention_days} days")
+        dropped += n
+    instrumentation.count("bars_compacted", dropped)
+    return dropped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Store intraday bars and upsert the current session's daily row.")
+    parser.add_argument("--interval", default=INTERVAL,
+                        help=f"yfinance bar interval, e.g. 5m, 15m, 30m (default: {INTERVAL})")
+    parser.add_argument("--store-dir", default=STORE_DIR, help=f"Intraday store root (default: {STORE_DIR}/)")
+    parser.add_argument("--retention-days", type=int, default=RETENTION_DAYS,
+                        help=f"Intraday bars kept before compaction drops them (default: {RETENTION_DAYS})")
+    parser.add_argument("--compact", action="store_true",
+                        help="Apply the retention policy now instead of waiting for the weekly slack")
+    parser.add_argument("--chunk-size", type=int, default=ingest.CHUNK_SIZE,
+                        help="Tickers per grouped download request")
+    parser.add_argument("--sink", choices=["rest", "postgres"], default="rest",
+                        help="Write through the REST API, or over SUPABASE_DB_URL with COPY")
+    add_ticker_argument(parser)
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.start("fetch_intraday", args)
+
+    if args.sink == "postgres":
+        if not SUPABASE_DB_URL:
+            print("--sink postgres needs SUPABASE_DB_URL (the database connection string).")
+            exit(1)
+        sink = PostgresSink(SUPABASE_DB_URL)
+    else:
+        sink = SupabaseSink(supabase)
+
+    tickers = selected_tickers(args)
+    store = IntradayStore(args.store_dir, args.interval)
+    now = datetime.now(timezone.utc)
+    print(f"Fetching {args.interval} bars for {len(tickers)} tickers up to {now.strftime('%Y-%m-%d %H:%M')} UTC...")
+    results = ingest_intraday(tickers, store, YFinanceSource(args.interval), sink,
+                              PriceCache(supabase, DAILY_COLUMNS, cache_dir=DAILY_CACHE_DIR), now,
+                              chunk_size=args.chunk_size)
+    compact_store(store, tickers, now, args.retention_days, slack_days=0 if args.compact else COMPACT_SLACK_DAYS)
+    if args.sink == "postgres":
+        sink.close()
+
+    disk_mb = store.disk_bytes() / 2**20
+    instrumentation.note("store_mb", round(disk_mb, 3))
+    print(f"\n  Intraday store: {len(store.tickers())} tickers, {disk_mb:.2f} MB ({store.root}/)")
+    instrumentation.finish(failed=[t for t, r in results.items() if r["error"] is not None])
+
+
+if __name__ == "__main__":
+    main()
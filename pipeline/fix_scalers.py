@@ -1,34 +1,33 @@
 import os
 import json
+import argparse
 import joblib
-from dotenv import load_dotenv
-from supabase import create_client, Client
+from utils import instrumentation
+from utils.config import supabase, add_ticker_argument
+from utils.manifest import Manifest, hash_file
+from utils.storage import Uploader, models_bucket, summarize
 
-load_dotenv()
+# Legacy: convert_models.py (and train_models.py with local TF.js) now publish
+# <ticker>/model.bundle, which carries the scaler min/max itself. scaler.json is
+# only read by the web app's fallback path for tickers without a bundle.
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+bucket = models_bucket(supabase)
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("ERROR: Missing Supabase credentials in .env file.")
-    exit(1)
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-MODELS_DIR = "models"
-if not os.path.exists(MODELS_DIR):
-    print(f"{MODELS_DIR} not found locally. Are we in the right directory?")
-    exit(1)
-
-for ticker in os.listdir(MODELS_DIR):
-    ticker_dir = os.path.join(MODELS_DIR, ticker)
-    if not os.path.isdir(ticker_dir):
-        continue
-    
+def convert_scaler(ticker: str, ticker_dir: str, force: bool = False):
+    """Writes scaler.json next to scaler.pkl. Returns (json_path, manifest, digest), or None if skipped."""
     scaler_path = os.path.join(ticker_dir, "scaler.pkl")
     if not os.path.exists(scaler_path):
         print(f"[{ticker}] No scaler.pkl found.")
-        continue
+        return
+
+    # Skip if this exact scaler.pkl was already converted and uploaded
+    manifest = Manifest(ticker, MODELS_DIR, bucket=bucket)
+    digest = hash_file(scaler_path)
+    if not force and manifest.is_current("scalers", digest):
+        print(f"[{ticker}] scaler.pkl unchanged since last upload, skipping (--force to re-upload).")
+        return
     
     print(f"[{ticker}] Converting scaler.pkl to scaler.json...")
     
@@ -48,14 +47,55 @@ for ticker in os.listdir(MODELS_DIR):
     with open(json_path, 'w') as f:
         json.dump(scaler_data, f, indent=2)
     
-    # Upload to Supabase Storage
-    print(f"[{ticker}] Uploading scaler.json to Supabase...")
-    with open(json_path, 'rb') as f:
-        supabase.storage.from_("models").upload(
-            path=f"{ticker}/scaler.json",
-            file=f,
-            file_options={"upsert": "true", "content-type": "application/json"}
-        )
-    print(f"[{ticker}] Done")
-
-print("\nAll scalers converted and uploaded successfully!")
+    return json_path, manifest, digest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert scaler.pkl files to scaler.json and upload them.")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-upload even if scaler.pkl is unchanged")
+    add_ticker_argument(parser)
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.start("fix_scalers", args)
+
+    if not os.path.exists(MODELS_DIR):
+        print(f"{MODELS_DIR} not found: no models trained locally.")
+        exit(1)
+
+    converted = {}
+    for ticker in os.listdir(MODELS_DIR):
+        ticker_dir = os.path.join(MODELS_DIR, ticker)
+        if not os.path.isdir(ticker_dir) or (args.tickers and ticker not in args.tickers):
+            continue
+        with instrumentation.stage("convert_scaler", ticker):
+            result = convert_scaler(ticker, ticker_dir, force=args.force)
+        if result is not None:
+            converted[ticker] = result
+
+    # Upload all scaler.json files to Supabase Storage in one concurrent batch
+    print(f"\nUploading {len(converted)} scaler.json file(s) to Supabase...")
+    results = Uploader(bucket).upload(
+        [(json_path, f"{ticker}/scaler.json") for ticker, (json_path, _, _) in converted.items()],
+        force=args.force
+    )
+    print(f"  {summarize(results)}")
+
+    failed = []
+    for ticker, (_, manifest, digest) in converted.items():
+        error = results[f"{ticker}/scaler.json"]["error"]
+        if error is not None:
+            print(f"[{ticker}] [ERROR] Upload failed: {error}")
+            failed.append(ticker)
+            continue
+        manifest.record("scalers", digest)
+        print(f"[{ticker}] Done")
+
+    instrumentation.finish(failed=failed)
+    if failed:
+        exit(1)
+    print("\nAll scalers converted and uploaded successfully!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import joblib
+import numpy as np
+import pandas as pd
+
+from train_models import FEATURES, WINDOW_SIZE, FORECAST_DAYS
+from train_stacked import build_stacked_model, set_tower_weights
+from utils.config import supabase, add_ticker_argument, selected_tickers
+from utils.keras_compat import load_h5_model
+from utils import instrumentation, manifest
+
+# ─── Batch Forecasts ──────────────────────────────────────────────────────────
+#
+# Runs after ingestion and precomputes every ticker's 3-day forecast into the
+# `forecasts` table, so the web app reads one row instead of downloading the
+# scaler, model.json and weights and running TF.js in the browser.
+#
+# All models are loaded once and copied into the towers of one stacked graph
+# (train_stacked.build_stacked_model), so the whole universe is a single
+# predict() call. A forecast is keyed by (ticker, as_of, model_version) and
+# records the digest of its input window: intraday runs rewrite the latest
+# daily bar every 30 minutes, so the same as_of is forecast again whenever its
+# window changed. Tickers whose window and model are unchanged are skipped.
+#
+# Usage:  python pipeline/forecast.py [--force] [--tickers ...]   (or: python pipeline forecast)
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+FORECASTS_TABLE = "forecasts"
+PRICES_TABLE = "daily_prices"
+# Latest rows read per ticker: a window is WINDOW_SIZE complete rows, the rest
+# leaves room for incomplete ones (dropped, as in training)
+RECENT_ROWS = 4 * WINDOW_SIZE
+FETCH_WORKERS = 4
+
+
+def model_version(ticker: str, models_dir: str = MODELS_DIR) -> str:
+    """Short content hash of the model and scaler a forecast was made with."""
+    return manifest.model_version(os.path.join(models_dir, ticker))
+
+
+def input_digest(window: pd.DataFrame) -> str:
+    """Short content hash of a forecast's input window (its dates and feature values)."""
+    return manifest.combine(manifest.hash_json(window.index.strftime("%Y-%m-%d").tolist()),
+                            manifest.hash_array(window.to_numpy(dtype=np.float64)))[:16]
+
+
+def recent_rows(ticker: str, rows: int = RECENT_ROWS) -> pd.DataFrame:
+    """The ticker's latest `rows` daily_prices rows (FEATURES columns, ascending dates, NaN for NULL)."""
+    # One small request instead of syncing the whole history: runners start
+    # without the training cache, and forecasts only read the last few rows
+    res = supabase.table(PRICES_TABLE) \
+        .select("date," + ",".join(FEATURES)) \
+        .eq("ticker", ticker) \
+        .order("date", desc=True) \
+        .limit(rows) \
+        .execute()
+    df = pd.DataFrame(res.data[::-1], columns=["date", *FEATURES])
+    return df.set_index(pd.DatetimeIndex(df.pop("date"), name="date")).astype(np.float64)
+
+
+def latest_windows(tickers):
+    """{ticker: (as_of, window frame)} — the last WINDOW_SIZE complete feature rows, in FEATURES order."""
+    windows = {}
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        frames = dict(zip(tickers, pool.map(recent_rows, tickers)))
+    for ticker, df in frames.items():
+        df = df[FEATURES].dropna()
+        if len(df) < WINDOW_SIZE:
+            print(f"  ⚠ Skipping {ticker}: only {len(df)} complete rows (need {WINDOW_SIZE}).")
+            continue
+        windows[ticker] = (df.index[-1].date(), df.iloc[-WINDOW_SIZE:])
+    return windows
+
+
+def existing_forecasts(tickers, since) -> dict:
+    """{(ticker, as_of, model_version): input_digest} for forecasts stored from `since` on."""
+    res = supabase.table(FORECASTS_TABLE) \
+        .select("ticker,as_of,model_version,input_digest") \
+        .in_("ticker", list(tickers)) \
+        .gte("as_of", since.isoformat()) \
+        .execute()
+    return {(r["ticker"], r["as_of"], r["model_version"]): r["input_digest"] for r in res.data}
+
+
+def forecast_dates(as_of, n: int = FORECAST_DAYS):
+    """The next n business days after as_of (weekends skipped, as in the web app)."""
+    return [d.date().isoformat() for d in pd.bdate_range(as_of + pd.Timedelta(days=1), periods=n)]
+
+
+def predict_all(models: dict, inputs: dict) -> dict:
+    """
+    One predict() for every ticker: each model's weights go into one tower of
+    a stacked graph. Models whose architecture differs from build_model's are
+    predicted on their own. Returns {ticker: scaled predictions (FORECAST_DAYS,)}.
+    """
+    tickers = list(models)
+    stacked = build_stacked_model(len(tickers), (WINDOW_SIZE, len(FEATURES)))
+    towers, alone = [], []
+    for i, ticker in enumerate(tickers):
+        model = models[ticker]
+        try:
+            set_tower_weights(stacked, i, [model.get_layer('lstm_layer').get_weights(),
+                                           model.get_layer('output_layer').get_weights()])
+            towers.append(ticker)
+        except ValueError:
+            alone.append(ticker)
+
+    outputs = stacked.predict([inputs[t][np.newaxis] for t in tickers], verbose=0)
+    outputs = outputs if isinstance(outputs, list) else [outputs]
+    predictions = {t: outputs[i][0] for i, t in enumerate(tickers) if t in towers}
+    for ticker in alone:
+        predictions[ticker] = models[ticker].predict(inputs[ticker][np.newaxis], verbose=0)[0]
+    return predictions
+
+
+def run_forecasts(tickers, force: bool = False):
+    """Writes forecasts for every ticker with new data or a new model. Returns the tickers written."""
+    available = [t for t in tickers if os.path.exists(os.path.join(MODELS_DIR, t, "model.h5"))
+                 and os.path.exists(os.path.join(MODELS_DIR, t, "scaler.pkl"))]
+    for ticker in sorted(set(tickers) - set(available)):
+        print(f"  [SKIP] {ticker}: no trained model in {MODELS_DIR}")
+
+    with instrumentation.stage("load_data"):
+        windows = latest_windows(available)
+    if not windows:
+        return []
+    versions = {t: model_version(t) for t in windows}
+    digests = {t: input_digest(window) for t, (_, window) in windows.items()}
+
+    with instrumentation.stage("existing_forecasts"):
+        stored = {} if force else existing_forecasts(windows, min(as_of for as_of, _ in windows.values()))
+    todo = []
+    for ticker, (as_of, _) in windows.items():
+        if stored.get((ticker, as_of.isoformat(), versions[ticker])) == digests[ticker]:
+            print(f"  [SKIP] {ticker}: forecast for {as_of} with model {versions[ticker]} already stored")
+        else:
+            todo.append(ticker)
+    if not todo:
+        return []
+
+    # Load each model and scaler once, scale its window, predict everything together
+    models, scalers, inputs = {}, {}, {}
+    for ticker in todo:
+        base = os.path.join(MODELS_DIR, ticker)
+        with instrumentation.stage("load_model", ticker):
+            models[ticker] = load_h5_model(os.path.join(base, "model.h5"))
+            scalers[ticker] = joblib.load(os.path.join(base, "scaler.pkl"))
+        inputs[ticker] = scalers[ticker].transform(windows[ticker][1]).astype(np.float32)
+
+    print(f"  Predicting {len(todo)} tickers in one batch...")
+    with instrumentation.stage("predict"):
+        predictions = predict_all(models, inputs)
+
+    records = []
+    for ticker in todo:
+        # 'close' is the first feature: invert its min/max scaling only
+        scaler = scalers[ticker]
+        prices = predictions[ticker] * scaler.data_range_[0] + scaler.data_min_[0]
+        as_of = windows[ticker][0]
+        records.append({
+            "ticker": ticker,
+            "as_of": as_of.isoformat(),
+            "model_version": versions[ticker],
+            "input_digest": digests[ticker],
+            "forecast_dates": forecast_dates(as_of),
+            "predicted_close": [round(float(p), 4) for p in prices],
+        })
+        print(f"  [OK] {ticker} as of {as_of}: {', '.join(f'{p:.2f}' for p in prices)}")
+
+    with instrumentation.stage("upsert"):
+        supabase.table(FORECASTS_TABLE).upsert(records, on_conflict="ticker,as_of,model_version").execute()
+    instrumentation.count("forecasts_written", len(records))
+    return todo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute 3-day forecasts for all tickers.")
+    parser.add_argument("--force", action="store_true",
+                        help="Rewrite forecasts even if the data and model are unchanged")
+    add_ticker_argument(parser)
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.start("forecast", args)
+
+    written = run_forecasts(selected_tickers(args), force=args.force)
+    print(f"\nForecasts written: {', '.join(written) if written else 'none'}")
+    instrumentation.finish()
+
+
+if __name__ == "__main__":
+    main()
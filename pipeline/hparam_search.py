@@ -0,0 +1,332 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import itertools
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import tensorflow as tf
+from sklearn.preprocessing import MinMaxScaler
+
+import train_models as tm
+from train_models import FEATURES, WINDOW_SIZE, LSTM_UNITS, DROPOUT, LEARNING_RATE, BATCH_SIZE
+from utils import instrumentation
+from utils.config import add_ticker_argument, selected_tickers
+
+# ─── Hyperparameter Search ────────────────────────────────────────────────────
+#
+# Searches build_model's hyperparameters per ticker with asynchronous
+# successive halving (ASHA). Every candidate trains for MIN_EPOCHS; whenever
+# a rung has a new top-1/ETA result, that trial is promoted and trained on
+# (from its checkpoint, optimizer state included) to the next rung's epochs,
+# up to MAX_EPOCHS. Most candidates stop after a few epochs, and no worker
+# waits for a rung to fill up before starting the next job.
+#
+# Trials run in a spawn process pool shared by every ticker being searched,
+# with TF threads capped per worker as in train_models.train_parallel. The
+# scaled feature rows are prepared once per ticker and each worker loads a
+# ticker's rows once; every trial gathers its windows from them batch by batch
+# in a tf.data pipeline (train_models.window_dataset), whatever its window size.
+#
+# The winner per ticker (the lowest val MSE among trials that reached the
+# highest rung) goes into models/<ticker>/metadata.json under "hparam_search",
+# next to the current defaults' result. Training is not changed: WINDOW_SIZE
+# is shared with forecast.py, backtest.py and the web app, so adopting a
+# result means updating the constants in train_models.py.
+#
+# Usage:  python pipeline/hparam_search.py [--tickers ...] [--trials 27] [--workers N]
+#         (or: python pipeline tune ...)
+
+SEARCH_SPACE = {
+    "window_size": [5, 7, 10, 14, 20],
+    "lstm_units": [16, 32, 64, 128],
+    "dropout": [0.0, 0.1, 0.2, 0.3],
+    "learning_rate": [0.0003, 0.001, 0.003],
+    "batch_size": [16, 32, 64],
+}
+DEFAULTS = {"window_size": WINDOW_SIZE, "lstm_units": LSTM_UNITS, "dropout": DROPOUT,
+            "learning_rate": LEARNING_RATE, "batch_size": BATCH_SIZE}
+TRIALS = 27          # candidates per ticker (the first is always DEFAULTS)
+MIN_EPOCHS = 2       # first rung
+MAX_EPOCHS = 54      # last rung: 2 -> 6 -> 18 -> 54 with ETA = 3
+ETA = 3              # each rung keeps the top 1/ETA of the trials that finished the one below
+LEADERBOARD = 3      # runners-up kept in metadata.json
+SEED = 42
+
+
+def sample_configs(n: int, seed: int = SEED) -> list:
+    """DEFAULTS, then up to n-1 distinct random points of SEARCH_SPACE."""
+    rng = np.random.default_rng(seed)
+    configs, seen = [dict(DEFAULTS)], {tuple(DEFAULTS.values())}
+    space = list(itertools.product(*SEARCH_SPACE.values()))
+    for i in rng.permutation(len(space)):
+        if len(configs) >= n:
+            break
+        if space[i] not in seen:
+            seen.add(space[i])
+            configs.append({k: v.item() if hasattr(v, "item") else v for k, v in zip(SEARCH_SPACE, space[i])})
+    return configs
+
+
+def rung_epochs(min_epochs: int = MIN_EPOCHS, max_epochs: int = MAX_EPOCHS, eta: int = ETA) -> list:
+    """Epoch budget of each rung: min_epochs * eta^k, capped by (and ending at) max_epochs."""
+    rungs = [min_epochs]
+    while rungs[-1] * eta < max_epochs:
+        rungs.append(rungs[-1] * eta)
+    if rungs[-1] < max_epochs:
+        rungs.append(max_epochs)
+    return rungs
+
+
+class SuccessiveHalving:
+    """ASHA bookkeeping for one ticker: which trial to run next, and the results so far."""
+
+    def __init__(self, ticker: str, configs: list, rungs: list, eta: int = ETA):
+        self.ticker = ticker
+        self.configs = configs
+        self.rungs = rungs
+        self.eta = eta
+        self.results = [{} for _ in rungs]     # rung -> {trial: best val loss so far}
+        self.promoted = [set() for _ in rungs]
+        self.started = 0
+        self.epochs_trained = 0
+
+    def next_job(self):
+        """(trial, rung) to run next, or None until a running trial reports."""
+        # Promotions first, from the highest rung down: they are what finishes the search
+        for rung in range(len(self.rungs) - 2, -1, -1):
+            done = self.results[rung]
+            for trial in sorted(done, key=done.get)[:len(done) // self.eta]:
+                if trial not in self.promoted[rung] and np.isfinite(done[trial]):
+                    self.promoted[rung].add(trial)
+                    return trial, rung + 1
+        if self.started < len(self.configs):
+            self.started += 1
+            return self.started - 1, 0
+        return None
+
+    def report(self, trial: int, rung: int, val_loss: float):
+        previous = self.results[rung - 1].get(trial, float("inf")) if rung else float("inf")
+        self.results[rung][trial] = min(previous, val_loss)
+        self.epochs_trained += self.rungs[rung] - (self.rungs[rung - 1] if rung else 0)
+
+    def ranking(self) -> list:
+        """[(trial, rung, val loss)], best first: trials that got further rank above the rest."""
+        reached = {}
+        for rung, done in enumerate(self.results):
+            for trial, loss in done.items():
+                reached[trial] = (rung, loss)
+        return sorted(((t, r, l) for t, (r, l) in reached.items()), key=lambda x: (-x[1], x[2]))
+
+    def summary(self) -> dict:
+        ranking = [(t, r, l) for t, r, l in self.ranking() if np.isfinite(l)]
+        if not ranking:
+            return None
+
+        def entry(trial, rung, loss):
+            return {**self.configs[trial], "val_loss": float(loss), "epochs": self.rungs[rung]}
+
+        best, default = ranking[0], next((x for x in ranking if x[0] == 0), None)
+        return {
+            "best": {k: self.configs[best[0]][k] for k in SEARCH_SPACE},
+            "val_loss": float(best[2]),
+            "epochs": self.rungs[best[1]],
+            "default": entry(*default) if default else None,
+            "leaderboard": [entry(*x) for x in ranking[1:1 + LEADERBOARD]],
+            "trials": self.started,
+            "rungs": self.rungs,
+            "eta": self.eta,
+            "epochs_trained": self.epochs_trained,
+            "epochs_without_pruning": self.started * self.rungs[-1],
+        }
+
+
+# ─── Trials (worker processes) ────────────────────────────────────────────────
+
+_rows = {}   # ticker -> scaled feature rows, per worker process
+
+
+def _rows_for(data_dir: str, ticker: str) -> np.ndarray:
+    if ticker not in _rows:
+        _rows[ticker] = np.load(os.path.join(data_dir, f"{ticker}.npy"))
+    return _rows[ticker]
+
+
+def _trial_worker(data_dir: str, ticker: str, config: dict, initial_epoch: int, epochs: int,
+                  checkpoint: str, seed: int) -> float:
+    """Trains one trial from initial_epoch to epochs (resuming its checkpoint) and returns its best val loss."""
+    tf.keras.backend.clear_session()
+    tf.keras.utils.set_random_seed(seed)
+    rows = _rows_for(data_dir, ticker)
+    n_train, _ = tm.split_windows(len(rows), config["window_size"])
+    windows = {"window_size": config["window_size"], "batch_size": config["batch_size"]}
+    train = tm.window_dataset(rows, 0, n_train, shuffle=True, **windows)
+    val = tm.window_dataset(rows, n_train, **windows)
+    if initial_epoch:
+        model = tf.keras.models.load_model(checkpoint)
+    else:
+        model = tm.build_model((config["window_size"], len(FEATURES)), lstm_units=config["lstm_units"],
+                               dropout=config["dropout"], learning_rate=config["learning_rate"])
+    with instrumentation.stage("trial_fit", ticker):
+        history = model.fit(train, initial_epoch=initial_epoch, epochs=epochs, validation_data=val, verbose=0)
+    instrumentation.count("epochs", epochs - initial_epoch, ticker)
+    model.save(checkpoint)
+    losses = [l for l in history.history["val_loss"] if np.isfinite(l)]
+    return min(losses) if losses else float("inf")
+
+
+# ─── Search ───────────────────────────────────────────────────────────────────
+
+def prepare_data(tickers, data_dir: str) -> dict:
+    """Writes each ticker's MinMax-scaled feature rows to <data_dir>/<ticker>.npy. Returns {ticker: rows}."""
+    rows = {}
+    for ticker in tickers:
+        with instrumentation.stage("load_data", ticker):
+            df = tm.load_training_data(ticker)
+        if df is None:
+            continue
+        # Same scaling as prepare_dataset; it doesn't depend on the window size
+        scaled = MinMaxScaler(feature_range=(0, 1)).fit_transform(df).astype(np.float32)
+        np.save(os.path.join(data_dir, f"{ticker}.npy"), scaled)
+        rows[ticker] = len(df)
+    return rows
+
+
+def search(tickers, work_dir: str, workers: int, threads_per_worker: int = None, trials: int = TRIALS,
+           min_epochs: int = MIN_EPOCHS, max_epochs: int = MAX_EPOCHS, eta: int = ETA, seed: int = SEED) -> dict:
+    """Runs ASHA for every ticker on one process pool. Returns {ticker: summary or None}."""
+    data_dir = os.path.join(work_dir, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    rows = prepare_data(tickers, data_dir)
+    configs, rungs = sample_configs(trials, seed), rung_epochs(min_epochs, max_epochs, eta)
+    searches = {t: SuccessiveHalving(t, configs, rungs, eta) for t in tickers if t in rows}
+    for ticker in searches:
+        os.makedirs(os.path.join(work_dir, "trials", ticker), exist_ok=True)
+
+    threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    print(f"Searching {len(searches)} tickers x {len(configs)} trials, rungs {rungs} epochs, "
+          f"on {workers} workers x {threads} TF threads")
+
+    order = itertools.cycle(list(searches))
+
+    def next_job():
+        # Round-robin over tickers so they all progress and the pool stays full
+        for _ in range(len(searches)):
+            s = searches[next(order)]
+            job = s.next_job()
+            if job is not None:
+                return s, job
+        return None
+
+    running = {}
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=tm._init_worker, initargs=(threads, min(2, threads))) as pool:
+        while True:
+            while len(running) < workers:
+                picked = next_job()
+                if picked is None:
+                    break
+                s, (trial, rung) = picked
+                checkpoint = os.path.join(work_dir, "trials", s.ticker, f"{trial}.h5")
+                fut = pool.submit(instrumentation.measured, _trial_worker, data_dir, s.ticker, configs[trial],
+                                  rungs[rung - 1] if rung else 0, rungs[rung], checkpoint, seed + trial)
+                running[fut] = (s, trial, rung)
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                s, trial, rung = running.pop(fut)
+                try:
+                    val_loss = instrumentation.merged(fut.result())
+                except Exception as e:
+                    print(f"  [ERROR] {s.ticker} trial {trial} failed: {e}")
+                    val_loss = float("inf")
+                s.report(trial, rung, val_loss)
+                instrumentation.count("trial_runs", 1, s.ticker)
+                if rung == len(rungs) - 1:
+                    print(f"  {s.ticker:<10} trial {trial:>3} finished {rungs[rung]} epochs: val MSE {val_loss:.6f}")
+
+    results = {t: None for t in tickers}
+    for ticker, s in searches.items():
+        results[ticker] = s.summary()
+        if results[ticker] is not None:
+            results[ticker]["rows"] = rows[ticker]
+    return results
+
+
+def record(ticker: str, summary: dict):
+    """Writes the search result into models/<ticker>/metadata.json (creating it if the ticker is untrained)."""
+    base_path = os.path.join(tm.MODELS_DIR, ticker)
+    os.makedirs(base_path, exist_ok=True)
+    metadata_path = os.path.join(base_path, "metadata.json")
+    metadata = {"ticker": ticker}
+    if os.path.exists(metadata_path):
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+    metadata["hparam_search"] = {**summary, "searched_at": datetime.now().isoformat()}
+    with open(metadata_path, "w") as f:
+        json.dump(metadata, f, indent=2)
+
+
+# ─── Entry Point ──────────────────────────────────────────────────────────────
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-ticker hyperparameter search with asynchronous successive halving.")
+    parser.add_argument("--trials", type=int, default=TRIALS, help=f"Candidates per ticker (default: {TRIALS})")
+    parser.add_argument("--min-epochs", type=int, default=MIN_EPOCHS, help="Epochs of the first rung")
+    parser.add_argument("--max-epochs", type=int, default=MAX_EPOCHS, help="Epochs of the last rung")
+    parser.add_argument("--eta", type=int, default=ETA, help="Keep the top 1/eta of each rung")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Trial processes (default: one per core)")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="TF intra-op threads per worker (default: cores // workers)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--offline", action="store_true",
+                        help="Search on the local data cache without fetching new rows")
+    parser.add_argument("--dry-run", action="store_true", help="Print the results without writing metadata.json")
+    add_ticker_argument(parser)
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.start("hparam_search", args)
+
+    tm.price_cache.refresh = not args.offline
+    work_dir = tempfile.mkdtemp(prefix="hparam_search-")
+    start = time.perf_counter()
+    try:
+        results = search(selected_tickers(args), work_dir, args.workers, args.threads_per_worker,
+                         trials=args.trials, min_epochs=args.min_epochs, max_epochs=args.max_epochs,
+                         eta=args.eta, seed=args.seed)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    seconds = time.perf_counter() - start
+
+    print(f"\n{'='*60}")
+    print(f"  Hyperparameter Search Complete ({seconds:.0f}s)")
+    print(f"  {'Ticker':<10} {'Best MSE':>10} {'Default (epochs)':>17} {'Epochs run':>11}  Best configuration")
+    failed = []
+    for ticker, summary in results.items():
+        if summary is None:
+            print(f"  {ticker:<10} [ERROR] no completed trials")
+            failed.append(ticker)
+            continue
+        d = summary["default"]
+        default = f"{d['val_loss']:.6f} ({d['epochs']})" if d else "-"
+        budget = f"{summary['epochs_trained']}/{summary['epochs_without_pruning']}"
+        print(f"  {ticker:<10} {summary['val_loss']:>10.6f} {default:>17} {budget:>11}  "
+              + ", ".join(f"{k}={v}" for k, v in summary["best"].items()))
+        if not args.dry_run:
+            record(ticker, summary)
+    print(f"{'='*60}")
+    if not args.dry_run:
+        print(f"  Results written to {tm.MODELS_DIR}/<ticker>/metadata.json (\"hparam_search\").")
+    instrumentation.finish(failed=failed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import subprocess
+import traceback
+from datetime import datetime, timezone
+
+from utils import instrumentation
+from utils.config import UNIVERSE_FILE, add_ticker_argument, load_universe
+
+# ─── Scheduler ────────────────────────────────────────────────────────────────
+#
+# Runs fetch -> train -> convert -> upload for a large ticker universe split
+# into shards, so several workers (CI matrix jobs, or local processes with
+# --local-workers) share the work without coordinating:
+# - the universe comes from universe.csv (utils/config.py), --universe or --tickers
+# - shard_of() assigns each ticker to one of --shards shards by a hash of its
+#   symbol: every worker computes the same split, and adding tickers to the
+#   universe doesn't move the existing ones between shards of the same count
+# - each (ticker, stage) unit's outcome is checkpointed in
+#   <state-dir>/<run>/<ticker>.json as soon as it finishes. Running the same
+#   --run again skips finished units and retries only the failed or
+#   interrupted ones; a unit runs once the earlier stages selected for this
+#   run are done for its ticker
+# - failed units are retried --retries times within a run before moving on
+#
+# Stages reuse the scripts' own code and their content-hash skipping:
+#   fetch    fetch_data.fetch_and_store_data for the shard's pending tickers
+#   train    train_models.train_for_ticker, artifacts saved locally only
+#   convert  convert_models' h5 -> TF.js + bundle into models/<ticker>/tfjs
+#   upload   metadata, scaler and TF.js files to the models bucket, then the
+#            "convert" manifest entry (so `pipeline convert` skips them too)
+#
+# Usage:  python pipeline schedule --shard 0 --shards 4 --run <id>      (one CI job)
+#         python pipeline schedule --local-workers 4 --run <id>         (4 local processes)
+#         python pipeline schedule --status --run <id>
+
+STAGES = ["fetch", "train", "convert", "upload"]
+RETRIES = 1            # extra attempts per failed unit within a run
+RETRY_BACKOFF = 5.0    # seconds before a stage's retry round
+# Runtime directories live next to this file, as every stage's do, wherever the scheduler is run from
+PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_DIR = os.path.join(PIPELINE_DIR, "state")
+LOG_DIR = os.path.join(PIPELINE_DIR, "logs", "schedule")
+MODELS_DIR = os.path.join(PIPELINE_DIR, "models")
+
+
+def shard_of(ticker: str, shards: int) -> int:
+    """The shard a ticker belongs to: stable across processes and machines, unlike hash()."""
+    digest = hashlib.sha256(ticker.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shards
+
+
+def shard_tickers(tickers, shard: int, shards: int) -> list:
+    return [t for t in tickers if shard_of(t, shards) == shard]
+
+
+# ─── Checkpoints ──────────────────────────────────────────────────────────────
+
+class Checkpoints:
+    """
+    Per-ticker stage outcomes for one run, one file per ticker:
+
+        {"ticker": "SAP.DE", "stages": {"fetch": {"status": "done", "attempts": 1, "error": null,
+                                                  "finished_at": "..."}, ...}}
+
+    Each ticker belongs to one shard, so workers never write the same file;
+    files are replaced atomically, so a killed worker leaves the last
+    complete state behind.
+    """
+
+    def __init__(self, state_dir: str, run: str):
+        self.dir = os.path.join(state_dir, run)
+
+    def path(self, ticker: str) -> str:
+        return os.path.join(self.dir, f"{ticker}.json")
+
+    def load(self, ticker: str) -> dict:
+        try:
+            with open(self.path(ticker)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"ticker": ticker, "stages": {}}
+
+    def status(self, ticker: str, stage: str) -> str:
+        return self.load(ticker)["stages"].get(stage, {}).get("status", "pending")
+
+    def mark(self, ticker: str, stage: str, error: str = None):
+        state = self.load(ticker)
+        attempts = state["stages"].get(stage, {}).get("attempts", 0) + 1
+        state["stages"][stage] = {
+            "status": "failed" if error else "done",
+            "attempts": attempts,
+            "error": error,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        }
+        os.makedirs(self.dir, exist_ok=True)
+        tmp = self.path(ticker) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, self.path(ticker))
+
+    def pending(self, tickers, stage: str, stages) -> list:
+        """Tickers whose `stage` isn't done but whose earlier stages among `stages` are."""
+        earlier = stages[:stages.index(stage)]
+        runnable = []
+        for ticker in tickers:
+            done = self.load(ticker)["stages"]
+            if done.get(stage, {}).get("status") == "done":
+                continue
+            if all(done.get(s, {}).get("status") == "done" for s in earlier):
+                runnable.append(ticker)
+        return runnable
+
+
+# ─── Stages ───────────────────────────────────────────────────────────────────
+#
+# Each runner processes a list of tickers and calls report(ticker, error) as
+# each one finishes (error None on success), so an interrupted stage keeps
+# the units it completed. Stage modules are imported when first run: a
+# fetch-only worker never loads TensorFlow.
+
+def run_fetch(tickers, args, report):
+    from fetch_data import fetch_and_store_data
+    results = fetch_and_store_data(tickers)
+    for ticker in tickers:
+        result = results.get(ticker)
+        report(ticker, "no result" if result is None else result["error"])
+
+
+def run_train(tickers, args, report):
+    import train_models as tm
+    tm.price_cache.refresh = not args.offline
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    for ticker in tickers:
+        try:
+            tm.train_for_ticker(ticker, verbose=2, force=args.force, fast=args.fast, publish=False)
+            if os.path.exists(os.path.join(MODELS_DIR, ticker, "model.h5")):
+                report(ticker, None)
+            else:
+                report(ticker, "no model.h5 (too little data?)")
+        except Exception as e:
+            traceback.print_exc()
+            report(ticker, str(e))
+
+
+def _convert_is_current(ticker: str, digest: str, bucket, force: bool) -> bool:
+    from utils.manifest import Manifest
+    return not force and Manifest(ticker, MODELS_DIR, bucket=bucket).is_current("convert", digest)
+
+
+def run_convert(tickers, args, report):
+    import convert_models as cm
+    from utils.config import supabase
+    from utils.storage import models_bucket
+    bucket = models_bucket(supabase)
+    for ticker in tickers:
+        if not os.path.exists(os.path.join(MODELS_DIR, ticker, "model.h5")):
+            report(ticker, "model.h5 not found")
+            continue
+        if _convert_is_current(ticker, cm.convert_digest(ticker), bucket, args.force):
+            print(f"  [SKIP] {ticker}: model.h5 unchanged since last conversion")
+            report(ticker, None)
+            continue
+        shutil.rmtree(os.path.join(MODELS_DIR, ticker, "tfjs"), ignore_errors=True)
+        result = cm._convert_worker(ticker, MODELS_DIR)
+        if result["error"] is None:
+            print(f"  [OK] {ticker}: converted in {result['seconds']:.2f}s — {result['files']}")
+        report(ticker, result["error"])
+
+
+def run_upload(tickers, args, report):
+    import convert_models as cm
+    from utils.config import supabase
+    from utils.manifest import Manifest
+    from utils.storage import Uploader, models_bucket, summarize
+    bucket = models_bucket(supabase)
+
+    jobs, files = {}, []
+    for ticker in tickers:
+        digest = cm.convert_digest(ticker)
+        if _convert_is_current(ticker, digest, bucket, args.force):
+            print(f"  [SKIP] {ticker}: already uploaded")
+            report(ticker, None)
+            continue
+        base_path = os.path.join(MODELS_DIR, ticker)
+        tfjs_path = os.path.join(base_path, "tfjs")
+        if not os.path.isdir(tfjs_path):
+            report(ticker, "no converted TF.js files")
+            continue
+        names = sorted(os.listdir(tfjs_path))
+        jobs[ticker] = (digest, names)
+        files += [(os.path.join(base_path, name), f"{ticker}/{name}") for name in ("metadata.json", "scaler.pkl")]
+        files += [(os.path.join(tfjs_path, name), f"{ticker}/{name}") for name in names]
+
+    # One concurrent batch for the whole shard, as convert_models does
+    results = Uploader(bucket).upload(files, force=args.force)
+    if files:
+        print(f"  Upload: {summarize(results)}")
+    for ticker, (digest, names) in jobs.items():
+        errors = [r["error"] for remote, r in results.items()
+                  if remote.startswith(f"{ticker}/") and r["error"] is not None]
+        if errors:
+            report(ticker, f"upload error: {errors[0]}")
+            continue
+        Manifest(ticker, MODELS_DIR, bucket=bucket).record("convert", digest, files=names, dtype="float32")
+        report(ticker, None)
+
+
+RUNNERS = {"fetch": run_fetch, "train": run_train, "convert": run_convert, "upload": run_upload}
+
+
+# ─── Shard Worker ─────────────────────────────────────────────────────────────
+
+def run_shard(tickers, checkpoints: Checkpoints, stages, args) -> list:
+    """Runs every pending unit of `tickers` stage by stage. Returns the tickers with a failed unit."""
+    for stage in stages:
+        pending = checkpoints.pending(tickers, stage, stages)
+        for attempt in range(1 + args.retries):
+            if not pending:
+                break
+            if attempt:
+                print(f"\n  Retrying {len(pending)} failed {stage} unit(s) in {RETRY_BACKOFF:.0f}s "
+                      f"(retry {attempt}/{args.retries})...")
+                time.sleep(RETRY_BACKOFF)
+            print(f"\n{'='*60}\n  Stage: {stage} ({len(pending)} tickers)\n{'='*60}")
+            failed = []
+
+            def report(ticker, error, stage=stage, failed=failed):
+                checkpoints.mark(ticker, stage, error)
+                instrumentation.count(f"{stage}_failed" if error else f"{stage}_done", ticker=ticker)
+                if error:
+                    print(f"  [ERROR] {stage} {ticker}: {error}")
+                    failed.append(ticker)
+
+            # "schedule_" keeps them apart from the stage modules' own timers (convert_models times "convert")
+            with instrumentation.stage(f"schedule_{stage}"):
+                try:
+                    RUNNERS[stage](pending, args, report)
+                except Exception as e:
+                    # A stage-wide failure (e.g. no credentials): the units it didn't report failed with it
+                    traceback.print_exc()
+                    for ticker in pending:
+                        if ticker not in failed and checkpoints.status(ticker, stage) != "done":
+                            report(ticker, str(e))
+            pending = [t for t in pending if t in failed]
+    return [t for t in tickers if any(checkpoints.status(t, s) == "failed" for s in stages)]
+
+
+def print_status(tickers, checkpoints: Checkpoints, stages, shards: int):
+    print(f"\n  {'Stage':<9} {'done':>6} {'failed':>7} {'pending':>8}")
+    for stage in stages:
+        counts = {"done": 0, "failed": 0, "pending": 0}
+        for ticker in tickers:
+            counts[checkpoints.status(ticker, stage)] += 1
+        print(f"  {stage:<9} {counts['done']:>6} {counts['failed']:>7} {counts['pending']:>8}")
+    for ticker in tickers:
+        state = checkpoints.load(ticker)["stages"]
+        for stage in stages:
+            entry = state.get(stage, {})
+            if entry.get("status") == "failed":
+                print(f"  [ERROR] {ticker} (shard {shard_of(ticker, shards)}) {stage} "
+                      f"after {entry['attempts']} attempt(s): {entry['error']}")
+
+
+# ─── Local Multi-Process Mode ─────────────────────────────────────────────────
+#
+# --local-workers N starts N independent `pipeline schedule --shard k --shards N`
+# processes, exactly as N CI jobs would run, and waits for them. Each worker's
+# output goes to pipeline/logs/schedule/<run>/shard-<k>.log.
+
+def worker_argv(args, shard: int, shards: int) -> list:
+    argv = [sys.executable, PIPELINE_DIR, "schedule", "--shard", str(shard), "--shards", str(shards),
+            "--run", args.run, "--state-dir", args.state_dir, "--universe", args.universe,
+            "--stages", *args.stages, "--retries", str(args.retries),
+            "--report", os.path.join(instrumentation.REPORT_DIR, f"scheduler-{args.run}-shard{shard}of{shards}.json")]
+    argv += [flag for flag, on in (("--force", args.force), ("--fast", args.fast), ("--offline", args.offline)) if on]
+    if args.tickers:
+        argv += ["--tickers", *args.tickers]
+    return argv
+
+
+def run_local_workers(args, workers: int) -> int:
+    log_dir = os.path.join(LOG_DIR, args.run)
+    os.makedirs(log_dir, exist_ok=True)
+    print(f"Starting {workers} local shard workers (logs: {log_dir}/)")
+    procs = []
+    for shard in range(workers):
+        log = open(os.path.join(log_dir, f"shard-{shard}.log"), "w", encoding="utf-8")
+        procs.append((shard, log, subprocess.Popen(worker_argv(args, shard, workers), stdout=log,
+                                                   stderr=subprocess.STDOUT)))
+    failed = []
+    for shard, log, proc in procs:
+        code = proc.wait()
+        log.close()
+        print(f"  {'[OK]' if code == 0 else '[ERROR]'} shard {shard}/{workers} exited with {code} "
+              f"({os.path.join(log_dir, f'shard-{shard}.log')})")
+        if code != 0:
+            failed.append(shard)
+    return len(failed)
+
+
+# ─── Entry Point ──────────────────────────────────────────────────────────────
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded, resumable fetch/train/convert/upload over the universe.")
+    parser.add_argument("--shard", type=int, default=0, help="This worker's shard, 0-based (default: 0)")
+    parser.add_argument("--shards", type=int, default=1, help="Number of shards the universe is split into")
+    parser.add_argument("--local-workers", type=int, default=None,
+                        help="Run every shard as a local process (implies --shards N)")
+    parser.add_argument("--run", default=datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+                        help="Run id; rerunning the same id resumes it (default: today's UTC date)")
+    parser.add_argument("--state-dir", default=STATE_DIR, help=f"Checkpoint directory (default: {STATE_DIR}/)")
+    parser.add_argument("--universe", default=UNIVERSE_FILE, help="Universe CSV (default: pipeline/universe.csv)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES,
+                        help="Stages to run, in pipeline order (default: all)")
+    parser.add_argument("--retries", type=int, default=RETRIES,
+                        help=f"Extra attempts for failed units within this run (default: {RETRIES})")
+    parser.add_argument("--status", action="store_true", help="Print the run's checkpoints and exit")
+    parser.add_argument("--force", action="store_true", help="Retrain/reconvert/re-upload even if unchanged")
+    parser.add_argument("--fast", action="store_true", help="Train with train_models' --fast mode")
+    parser.add_argument("--offline", action="store_true", help="Train on the local data cache")
+    add_ticker_argument(parser)
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    args.stages = [s for s in STAGES if s in args.stages]
+
+    universe = args.tickers or load_universe(args.universe)
+    checkpoints = Checkpoints(args.state_dir, args.run)
+
+    if args.local_workers:
+        failed_shards = run_local_workers(args, args.local_workers)
+        print_status(universe, checkpoints, args.stages, args.local_workers)
+        if failed_shards:
+            sys.exit(1)
+        return
+
+    if not 0 <= args.shard < args.shards:
+        parser.error(f"--shard must be in [0, {args.shards})")
+    tickers = shard_tickers(universe, args.shard, args.shards)
+    if args.status:
+        print(f"Run {args.run}, shard {args.shard}/{args.shards}: {len(tickers)} of {len(universe)} tickers")
+        print_status(tickers, checkpoints, args.stages, args.shards)
+        return
+
+    instrumentation.start("scheduler", args)
+    print(f"Run {args.run}, shard {args.shard}/{args.shards}: {len(tickers)} of {len(universe)} tickers, "
+          f"stages {' -> '.join(args.stages)} (checkpoints: {checkpoints.dir}/)")
+    failed = run_shard(tickers, checkpoints, args.stages, args)
+
+    print(f"\n{'='*60}")
+    print(f"  Shard {args.shard}/{args.shards} Complete")
+    print_status(tickers, checkpoints, args.stages, args.shards)
+    print(f"{'='*60}")
+    instrumentation.finish(failed=failed)
+    if failed:
+        print(f"\n  Rerun with --run {args.run} to retry the failed units.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
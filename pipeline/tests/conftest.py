@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The pipeline's modules import each other as top-level modules (`from utils...`),
+# as they do when run as `python pipeline <stage>`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,139 @@
+import json
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.data_loader import PriceCache
+
+TICKER = "TEST.DE"
+
+
+class FakeTable:
+    """The PostgREST query builder calls PriceCache makes, over a list of row dicts."""
+
+    def __init__(self, rows):
+        self.rows, self.filters, self.limit_n, self.count = rows, [], None, None
+
+    def select(self, columns, count=None):
+        self.columns, self.count = columns.split(","), count
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda r: r[column] == value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda r: r[column] > value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda r: r[column] >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda r: r[column] < value)
+        return self
+
+    def order(self, column):
+        self.order_by = column
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def execute(self):
+        rows = sorted((r for r in self.rows if all(f(r) for f in self.filters)), key=lambda r: r[self.order_by])
+        total = len(rows)
+        rows = [{c: r.get(c) for c in self.columns} for r in rows[:self.limit_n]]
+        return SimpleNamespace(data=rows, count=total if self.count == "exact" else None)
+
+
+class FakeClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.requests = 0
+
+    def table(self, name):
+        self.requests += 1
+        return FakeTable(self.rows)
+
+
+def daily_rows(start, periods, close=100.0):
+    return [{"ticker": TICKER, "date": d.strftime("%Y-%m-%d"), "close": close + i, "volume": 1000 + i}
+            for i, d in enumerate(pd.bdate_range(start, periods=periods))]
+
+
+@pytest.fixture
+def client():
+    return FakeClient(daily_rows("2024-01-01", 30))
+
+
+@pytest.fixture
+def cache(client, tmp_path):
+    return PriceCache(client, ["close", "volume"], cache_dir=str(tmp_path), page_size=7)
+
+
+def assert_matches(cache, client):
+    frame = cache.load_frame(TICKER)
+    assert frame.index.strftime("%Y-%m-%d").tolist() == [r["date"] for r in client.rows]
+    np.testing.assert_array_equal(frame["close"], [r["close"] for r in client.rows])
+
+
+def test_first_sync_downloads_everything(cache, client):
+    assert cache.sync(TICKER) == 30
+    assert_matches(cache, client)
+
+
+def test_incremental_sync_fetches_from_max_date(cache, client):
+    cache.sync(TICKER)
+    client.rows += daily_rows("2024-02-12", 2, close=200.0)
+    assert cache.sync(TICKER) == 3   # the last cached day again, and the two new ones
+    assert_matches(cache, client)
+
+
+def test_rewritten_history_is_downloaded_again(cache, client):
+    cache.sync(TICKER)
+    for row in client.rows:   # `fetch --full` after yfinance re-adjusted every close
+        row["close"] *= 0.98
+    assert cache.sync(TICKER) == 30
+    assert_matches(cache, client)
+
+
+def test_backfilled_history_is_downloaded_again(cache, client):
+    cache.sync(TICKER)
+    client.rows[:0] = daily_rows("2023-11-01", 10, close=50.0)   # a longer --lookback-years
+    assert cache.sync(TICKER) == 40
+    assert_matches(cache, client)
+
+
+def test_removed_rows_are_dropped(cache, client):
+    cache.sync(TICKER)
+    del client.rows[10]
+    assert cache.sync(TICKER) == 29
+    assert_matches(cache, client)
+
+
+def test_partially_written_cache_is_rebuilt(cache, client, tmp_path):
+    cache.sync(TICKER)
+    meta_path = os.path.join(str(tmp_path), TICKER, "meta.json")
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["rows"] += 5   # arrays from an older write than meta.json
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+
+    assert cache.sync(TICKER) == 30
+    assert_matches(cache, client)
+
+
+def test_offline_load_ignores_partial_cache(cache, client, tmp_path):
+    cache.sync(TICKER)
+    with open(os.path.join(str(tmp_path), TICKER, "values.npy"), "r+b") as f:
+        f.truncate(100)
+    cache.refresh = False
+    dates, values = cache.load(TICKER)
+    assert len(dates) == 0 and values.shape == (0, 2)
@@ -0,0 +1,69 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import fetch_intraday as fi
+from utils.intraday import IntradayStore
+
+TICKER = "TEST.DE"
+FRIDAY, MONDAY = date(2024, 3, 1), date(2024, 3, 4)
+
+
+def session_bars(day: date) -> pd.DataFrame:
+    """17 half-hourly bars closing at 102.0 with 17,000 shares traded."""
+    index = pd.date_range(pd.Timestamp(day, tz="UTC") + pd.Timedelta(hours=8), periods=17, freq="30min")
+    close = np.linspace(100.0, 102.0, 17)
+    return pd.DataFrame({"Open": close, "High": close + 0.5, "Low": close - 0.5, "Close": close,
+                         "Volume": np.full(17, 1000.0)}, index=index)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = IntradayStore(str(tmp_path))
+    store.append(TICKER, session_bars(FRIDAY))
+    return store
+
+
+@pytest.fixture
+def history():
+    """daily_prices close/volume before FRIDAY, long enough for every indicator."""
+    index = pd.bdate_range(end=pd.Timestamp(FRIDAY) - pd.Timedelta(days=1), periods=80)
+    close = 100 + np.sin(np.arange(80) / 5)
+    return pd.DataFrame({"close": close, "volume": np.full(80, 15000.0)}, index=index)
+
+
+def with_row(daily: pd.DataFrame, day: date, close: float, volume: float) -> pd.DataFrame:
+    daily = daily.copy()
+    daily.loc[pd.Timestamp(day)] = [close, volume]
+    return daily
+
+
+def test_running_session_is_rolled_up(store, history):
+    records = fi.session_records(TICKER, store, history, FRIDAY, today=FRIDAY)
+    assert [r["date"] for r in records] == ["2024-03-01"]
+    assert records[0]["close"] == pytest.approx(102.0)
+    assert records[0]["volume"] == 17000
+
+
+def test_no_new_session_finalizes_own_row(store, history):
+    fi._save_session(store, fi.session_records(TICKER, store, history, FRIDAY, today=FRIDAY)[0])
+    daily = with_row(history, FRIDAY, 102.0, 17000.0)   # the row upserted mid-session
+
+    records = fi.session_records(TICKER, store, daily, FRIDAY, today=MONDAY)
+    assert [r["date"] for r in records] == ["2024-03-01"]
+
+
+def test_no_new_session_keeps_daily_fetch_row(store, history):
+    fi._save_session(store, fi.session_records(TICKER, store, history, FRIDAY, today=FRIDAY)[0])
+    daily = with_row(history, FRIDAY, 102.5, 20000.0)   # fetch_data.py wrote yfinance's daily bar
+
+    # Monday before its first bar (or an exchange holiday): Friday is the latest day with bars
+    assert fi.session_records(TICKER, store, daily, FRIDAY, today=MONDAY) == []
+
+
+def test_past_session_without_own_row_is_skipped(store, history):
+    """Nothing upserted by this script yet (first run): a past session's row is left to fetch_data.py."""
+    daily = with_row(history, FRIDAY, 102.5, 20000.0)
+    assert fi.session_records(TICKER, store, daily, FRIDAY, today=MONDAY) == []
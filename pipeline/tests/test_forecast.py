@@ -0,0 +1,142 @@
+from datetime import date
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import forecast
+from train_models import FEATURES, FORECAST_DAYS, WINDOW_SIZE
+
+TICKER = "TEST.DE"
+AS_OF = date(2024, 6, 28)
+
+
+def window(last_close: float) -> pd.DataFrame:
+    index = pd.bdate_range(end=pd.Timestamp(AS_OF), periods=WINDOW_SIZE)
+    values = np.tile(np.arange(1.0, len(FEATURES) + 1), (WINDOW_SIZE, 1))
+    values[-1, 0] = last_close
+    return pd.DataFrame(values, index=index, columns=FEATURES)
+
+
+class FakeTable:
+    def __init__(self, stored):
+        self.stored = stored
+
+    def upsert(self, records, on_conflict):
+        for r in records:
+            self.stored[(r["ticker"], r["as_of"], r["model_version"])] = r["input_digest"]
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=[])
+
+
+class IdentityScaler:
+    data_range_, data_min_ = np.ones(len(FEATURES)), np.zeros(len(FEATURES))
+
+    def transform(self, x):
+        return np.asarray(x)
+
+
+@pytest.fixture
+def stored(tmp_path, monkeypatch):
+    """Runs run_forecasts against a fake forecasts table; returns {key: input_digest} it holds."""
+    stored = {}
+    (tmp_path / TICKER).mkdir()
+    (tmp_path / TICKER / "model.h5").write_bytes(b"")
+    (tmp_path / TICKER / "scaler.pkl").write_bytes(b"")
+    monkeypatch.setattr(forecast, "MODELS_DIR", str(tmp_path))
+    monkeypatch.setattr(forecast, "model_version", lambda ticker: "v1")
+    monkeypatch.setattr(forecast, "existing_forecasts", lambda tickers, since: dict(stored))
+    monkeypatch.setattr(forecast, "load_h5_model", lambda path: None)
+    monkeypatch.setattr(forecast.joblib, "load", lambda path: IdentityScaler())
+    monkeypatch.setattr(forecast, "predict_all", lambda models, inputs: {t: np.zeros(FORECAST_DAYS) for t in inputs})
+    monkeypatch.setattr(forecast, "supabase", SimpleNamespace(table=lambda name: FakeTable(stored)))
+    return stored
+
+
+def run(monkeypatch, last_close):
+    monkeypatch.setattr(forecast, "latest_windows", lambda tickers: {TICKER: (AS_OF, window(last_close))})
+    return forecast.run_forecasts([TICKER])
+
+
+def test_unchanged_window_is_skipped(stored, monkeypatch):
+    assert run(monkeypatch, 101.0) == [TICKER]
+    assert run(monkeypatch, 101.0) == []
+
+
+def test_revised_latest_bar_is_forecast_again(stored, monkeypatch):
+    """An intraday run rewrote today's daily row: same as_of and model, new window."""
+    run(monkeypatch, 101.0)
+    first = stored[(TICKER, AS_OF.isoformat(), "v1")]
+    assert run(monkeypatch, 101.5) == [TICKER]
+    assert stored[(TICKER, AS_OF.isoformat(), "v1")] != first
+    assert len(stored) == 1   # upserted in place
+
+
+class PricesQuery:
+    """The select/eq/order/limit query recent_rows makes, over daily_prices rows."""
+
+    def __init__(self, rows, limits):
+        self.rows, self.limits = rows, limits
+
+    def select(self, columns):
+        self.columns = columns.split(",")
+        return self
+
+    def eq(self, column, value):
+        self.ticker = value
+        return self
+
+    def order(self, column, desc=False):
+        assert column == "date" and desc
+        return self
+
+    def limit(self, n):
+        self.limits.append(n)
+        self.n = n
+        return self
+
+    def execute(self):
+        rows = sorted((r for r in self.rows if r["ticker"] == self.ticker), key=lambda r: r["date"], reverse=True)
+        return SimpleNamespace(data=[{c: r.get(c) for c in self.columns} for r in rows[:self.n]])
+
+
+class FakePrices:
+    def __init__(self, rows):
+        self.rows, self.limits = rows, []
+
+    def table(self, name):
+        assert name == "daily_prices"
+        return PricesQuery(self.rows, self.limits)
+
+
+def price_rows(ticker, n_rows, incomplete=()):
+    rows = []
+    for i, d in enumerate(pd.bdate_range(end=pd.Timestamp(AS_OF), periods=n_rows)):
+        rows.append({"ticker": ticker, "date": d.strftime("%Y-%m-%d"),
+                     **{f: None if (i in incomplete and f != "close") else float(i) for f in FEATURES}})
+    return rows
+
+
+def test_latest_windows_reads_only_recent_complete_rows(monkeypatch):
+    # A long history, with the last bar and one inside the window missing indicators
+    prices = FakePrices(price_rows(TICKER, 500, incomplete={496, 499}) + price_rows("SHORT.DE", WINDOW_SIZE - 1))
+    monkeypatch.setattr(forecast, "supabase", prices)
+
+    windows = forecast.latest_windows([TICKER, "SHORT.DE"])
+    assert list(windows) == [TICKER]   # too little history is skipped
+    as_of, frame = windows[TICKER]
+    assert as_of == pd.bdate_range(end=pd.Timestamp(AS_OF), periods=500)[498].date()
+    assert list(frame.columns) == FEATURES and len(frame) == WINDOW_SIZE
+    expected = [i for i in range(500) if i not in (496, 499)][-WINDOW_SIZE:]
+    assert frame["close"].tolist() == [float(i) for i in expected]
+    assert prices.limits == [forecast.RECENT_ROWS] * 2   # one small request per ticker
+
+
+def test_input_digest_covers_dates_and_values():
+    base = window(101.0)
+    assert forecast.input_digest(base) == forecast.input_digest(window(101.0))
+    assert forecast.input_digest(base) != forecast.input_digest(window(101.0 + 1e-9))
+    assert forecast.input_digest(base) != forecast.input_digest(base.set_axis(base.index + pd.Timedelta(days=1)))
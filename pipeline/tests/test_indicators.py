@@ -0,0 +1,232 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.indicators import INDICATOR_COLUMNS, StreamingIndicators, compute_indicators, compute_indicators_many
+
+# Streamed feature -> compute_indicators column
+FEATURE_SOURCES = {"close": "Close", "volume": "Volume", **{c: c for c in INDICATOR_COLUMNS}}
+RTOL = 1e-7
+
+
+def ohlcv(n_bars: int = 300, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, n_bars)))
+    return pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                         "Volume": rng.integers(10_000, 1_000_000, n_bars).astype(float)},
+                        index=pd.bdate_range("2020-01-01", periods=n_bars))
+
+
+def assert_parity(batch: pd.DataFrame, streamed: pd.DataFrame):
+    for feature, column in FEATURE_SOURCES.items():
+        expected, actual = batch[column].to_numpy(dtype=float), streamed[feature].to_numpy(dtype=float)
+        # Warm-up bars: NaN in the batch frame, None (NaN here) from the engine
+        np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected), err_msg=feature)
+        ok = ~np.isnan(expected)
+        np.testing.assert_allclose(actual[ok], expected[ok], rtol=RTOL, atol=RTOL, err_msg=feature)
+
+
+def test_streaming_matches_batch():
+    df = ohlcv()
+    assert_parity(compute_indicators(df), StreamingIndicators().update_frame(df))
+
+
+def test_state_round_trip_resumes_exactly():
+    df = ohlcv()
+    engine = StreamingIndicators()
+    first = engine.update_frame(df.iloc[:137])
+    # Through JSON, as fetch_intraday persists it
+    resumed = StreamingIndicators.from_state(json.loads(json.dumps(engine.to_state())))
+    assert resumed.to_state() == engine.to_state()
+
+    second = resumed.update_frame(df.iloc[137:])
+    uninterrupted = StreamingIndicators().update_frame(df)
+    pd.testing.assert_frame_equal(pd.concat([first, second]), uninterrupted)
+    assert_parity(compute_indicators(df), pd.concat([first, second]))
+
+
+@pytest.mark.parametrize("split", [3, 20, 60])
+def test_state_round_trip_before_and_after_windows_fill(split):
+    df = ohlcv(80)
+    engine = StreamingIndicators()
+    first = engine.update_frame(df.iloc[:split])
+    second = StreamingIndicators.from_state(json.loads(json.dumps(engine.to_state()))).update_frame(df.iloc[split:])
+    pd.testing.assert_frame_equal(pd.concat([first, second]), StreamingIndicators().update_frame(df))
+
+
+def test_nan_volume_is_forward_filled():
+    df = ohlcv()
+    df.iloc[[40, 41, 150], df.columns.get_loc("Volume")] = np.nan
+    streamed = StreamingIndicators().update_frame(df)
+    assert_parity(compute_indicators(df), streamed)
+    assert streamed["volume"].iloc[41] == df["Volume"].iloc[39]
+
+
+def test_nan_close_is_forward_filled():
+    df = ohlcv()
+    df.iloc[[100, 200], df.columns.get_loc("Close")] = np.nan
+    assert_parity(compute_indicators(df), StreamingIndicators().update_frame(df))
+
+
+def test_first_bar_needs_a_close():
+    with pytest.raises(ValueError):
+        StreamingIndicators().update(np.nan, 1000.0)
+
+
+# ─── Frozen `ta` reference ────────────────────────────────────────────────────
+#
+# Generated once with ta 0.11.0 through benchmarks/bench_indicators.py's
+# legacy_compute_indicators (the pre-kernel implementation) on the frames
+# below; `ta` is no longer a pipeline dependency. Per case and column:
+# (first non-NaN bar, {bar: value}). "short" is too short for sma_50; "gaps"
+# has NaN closes at bars 20, 21, 45 and NaN volumes at bars 3, 4, 52.
+REFERENCE_RTOL = 1e-9
+
+
+def reference_frame(n_bars: int, phase: float, gaps: bool = False) -> pd.DataFrame:
+    i = np.arange(n_bars, dtype=float)
+    close = 100 + 8 * np.sin(i / 4 + phase) + 0.25 * i
+    volume = 1e6 + 2e5 * np.cos(i / 3 + phase)
+    df = pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": volume},
+                      index=pd.bdate_range("2024-01-01", periods=n_bars))
+    if gaps:
+        df.iloc[[20, 21, 45], df.columns.get_loc("Close")] = np.nan
+        df.iloc[[3, 4, 52], df.columns.get_loc("Volume")] = np.nan
+    return df
+
+
+REFERENCE_FRAMES = {
+    "long": lambda: reference_frame(60, 0.0),
+    "short": lambda: reference_frame(30, 1.0),
+    "gaps": lambda: reference_frame(60, 2.0, gaps=True),
+}
+
+TA_REFERENCE = {
+    "long": {
+        "returns": (1, {
+            1: 0.022292316740361917, 2: 0.020602450006795392, 30: 0.010272380269042314,
+            59: -0.005615601337683129,
+        }),
+        "rsi14": (13, {
+            13: 41.99438450158423, 14: 36.01713272283327, 30: 79.51954342169594, 59: 75.15606346923516,
+        }),
+        "macd": (25, {
+            25: -0.23633095486513866, 26: 0.3192653759781905, 30: 2.652389232586856, 59: 3.9856031289445326,
+        }),
+        "ma20": (19, {
+            19: 103.70694964892569, 20: 103.57337993906044, 30: 103.3660340757763, 59: 112.00978664409858,
+        }),
+        "sma_50": (49, {
+            49: 106.13170750638814, 50: 106.37109600281195, 59: 108.59446142442894,
+        }),
+        "bb_upper": (19, {
+            19: 112.76869152893086, 20: 112.92389657368987, 30: 114.9354046114906, 59: 126.98511566994058,
+        }),
+        "bb_lower": (19, {
+            19: 94.64520776892051, 20: 94.22286330443102, 30: 91.796663540062, 59: 97.03445761825658,
+        }),
+        "volume_ma5": (4, {
+            4: 1140255.3634505128, 5: 1096426.4215299375, 30: 822278.1270729605, 59: 1176451.677600522,
+        }),
+    },
+    "short": {
+        "returns": (1, {
+            1: 0.010400924658585442, 2: 0.005916838207989716, 15: 0.0007932569047461868,
+            29: -0.0024716757807392575,
+        }),
+        "rsi14": (13, {
+            13: 7.905628899478913, 14: 7.577300119752479, 15: 8.335637652071213, 29: 78.00763828380117,
+        }),
+        "macd": (25, {
+            25: 1.2758079342831365, 26: 1.8625466564396618, 29: 2.9759748131647257,
+        }),
+        "ma20": (19, {
+            19: 101.93089107730911, 20: 101.73253648410639, 29: 104.11282422393302,
+        }),
+        "sma_50": (None, {}),
+        "bb_upper": (19, {
+            19: 111.56396480397291, 20: 111.12232280207213, 29: 118.67945127987096,
+        }),
+        "bb_lower": (19, {
+            19: 92.29781735064532, 20: 92.34275016614065, 29: 89.54619716799508,
+        }),
+        "volume_ma5": (4, {
+            4: 982916.4541943895, 5: 925731.2992311422, 15: 1103833.0356014445, 29: 850252.9712019386,
+        }),
+    },
+    "gaps": {
+        "returns": (1, {
+            1: -0.007455590457540184, 2: -0.011146400954381686, 20: 0.0, 21: 0.0, 22: 0.04294999612554973,
+            30: -0.0160374351144702, 45: 0.0, 46: 0.031207567464983876, 52: -0.009152763699889044,
+            53: -0.011973754656727897, 59: -0.008852338532904347,
+        }),
+        "rsi14": (13, {
+            13: 18.66544553644215, 14: 31.08648637567609, 20: 70.91716533208331, 21: 70.91716533208331,
+            22: 78.73025574442181, 30: 49.575119537309924, 45: 71.8634285994473, 46: 76.82314157403901,
+            52: 70.20841935635622, 53: 64.282512395551, 59: 38.200914430563884,
+        }),
+        "macd": (25, {
+            25: 2.707626134921611, 26: 2.8548220084990135, 30: 2.0193884226589773, 45: 1.6502352989599132,
+            46: 2.2577899475819834, 52: 3.807858782983203, 53: 3.589779101600172, 59: 0.6406789422178747,
+        }),
+        "ma20": (19, {
+            19: 100.56314420110131, 20: 100.61694285988328, 21: 100.71073121064036, 22: 101.09654234370866,
+            30: 106.28762626553404, 45: 106.87175569484134, 46: 107.12387462041261, 52: 110.64043264416054,
+            53: 111.36116088375306, 59: 114.14398013696453,
+        }),
+        "sma_50": (49, {
+            49: 105.93734630821672, 50: 106.19144192880854, 52: 106.70612421082772, 53: 106.9657979990716,
+            59: 108.5180621073912,
+        }),
+        "bb_upper": (19, {
+            19: 109.6039544530698, 20: 109.8280589763127, 21: 110.19272491803603, 22: 111.83655279183907,
+            30: 119.03227847699877, 45: 115.98966085997382, 46: 117.12893931066573, 52: 125.6025435382056,
+            53: 126.04690011444742, 59: 123.29466638513367,
+        }),
+        "bb_lower": (19, {
+            19: 91.52233394913281, 20: 91.40582674345386, 21: 91.22873750324469, 22: 90.35653189557826,
+            30: 93.54297405406932, 45: 97.75385052970886, 46: 97.11880993015949, 52: 95.67832175011549,
+            53: 96.67542165305869, 59: 104.99329388879539,
+        }),
+        "volume_ma5": (4, {
+            4: 849004.6127625543, 5: 831039.0125069906, 20: 974032.9673957129, 21: 917690.0512756411,
+            22: 870408.3170085015, 30: 1059139.427663921, 45: 855308.0622733764, 46: 897455.825062644,
+            52: 1179629.5269730743, 53: 1180590.0915825237, 59: 902248.1082219261,
+        }),
+    },
+}
+
+
+def assert_matches_reference(case: str, out: pd.DataFrame):
+    for column, (first, values) in TA_REFERENCE[case].items():
+        series = out[column].to_numpy(dtype=float)
+        first = len(series) if first is None else first
+        # Warm-up: NaN up to the first valid bar, finite from it on
+        assert np.isnan(series[:first]).all(), f"{case}/{column}: value before bar {first}"
+        assert np.isfinite(series[first:]).all(), f"{case}/{column}: NaN from bar {first}"
+        bars = sorted(values)
+        np.testing.assert_allclose(series[bars], [values[b] for b in bars], rtol=REFERENCE_RTOL,
+                                   atol=REFERENCE_RTOL, err_msg=f"{case}/{column}")
+
+
+@pytest.mark.parametrize("case", list(REFERENCE_FRAMES))
+def test_matches_ta_reference(case):
+    assert_matches_reference(case, compute_indicators(REFERENCE_FRAMES[case]()))
+
+
+def test_mixed_length_panel_matches_ta_reference():
+    frames = {case: make() for case, make in REFERENCE_FRAMES.items()}
+    out = compute_indicators_many(frames)
+    for case, frame in frames.items():
+        assert out[case].index.equals(frame.index)
+        assert_matches_reference(case, out[case])
+
+
+def test_nan_closes_and_volumes_are_forward_filled_in_the_output():
+    df = REFERENCE_FRAMES["gaps"]()
+    out = compute_indicators(df)
+    assert out["Close"].iloc[21] == out["Close"].iloc[20] == df["Close"].iloc[19]
+    assert out["Volume"].iloc[4] == out["Volume"].iloc[3] == df["Volume"].iloc[2]
+    assert out["Volume"].iloc[52] == df["Volume"].iloc[51]
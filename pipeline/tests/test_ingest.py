@@ -0,0 +1,148 @@
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import ingest
+from utils.ingest import MemorySink, run_ingestion
+
+END = datetime(2024, 6, 28)
+TICKERS = ["AAA", "BBB", "CCC", "DDD"]
+
+
+def bars(ticker: str, n_bars: int = 120) -> pd.DataFrame:
+    rng = np.random.default_rng(sum(map(ord, ticker)))
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n_bars)))
+    index = pd.bdate_range(end=END, periods=n_bars, name="Date")
+    return pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                         "Volume": rng.integers(1_000, 100_000, n_bars).astype(float)}, index=index)
+
+
+class StubSource:
+    """Fixed bars per ticker; tickers in `failing` make their whole grouped request raise."""
+
+    def __init__(self, frames, failing=()):
+        self.frames = frames
+        self.failing = set(failing)
+        self.requests = 0
+
+    def download(self, tickers, start, end):
+        self.requests += 1
+        if self.failing & set(tickers):
+            raise ConnectionError("download failed")
+        return {t: self.frames[t][self.frames[t].index >= pd.Timestamp(start)] for t in tickers if t in self.frames}
+
+
+def run(jobs, source, sink, **options):
+    """run_ingestion with fast retries, failing the test instead of hanging."""
+    options = {"retries": 0, "backoff": 0.0, "compute_workers": 1, **options}
+    out = {}
+    thread = threading.Thread(target=lambda: out.update(run_ingestion(jobs, source, sink, END, **options)))
+    thread.start()
+    thread.join(timeout=60)
+    assert not thread.is_alive(), "run_ingestion did not return"
+    return out
+
+
+def full_jobs(tickers=TICKERS):
+    return {t: (datetime(2024, 1, 1), None) for t in tickers}
+
+
+@pytest.fixture
+def frames():
+    return {t: bars(t) for t in TICKERS}
+
+
+def test_happy_path_upserts_every_complete_row(frames):
+    sink = MemorySink()
+    results = run(full_jobs(), StubSource(frames), sink, chunk_size=2, batch_size=25)
+
+    # Warm-up rows (SMA_50 needs 50 bars) are dropped
+    assert {t: r["rows"] for t, r in results.items()} == {t: 120 - 49 for t in TICKERS}
+    assert all(r["error"] is None for r in results.values())
+    assert len(sink.rows) == 4 * 71
+    row = sink.rows[("AAA", "2024-06-28")]
+    assert row["close"] == pytest.approx(frames["AAA"]["Close"].iloc[-1])
+    assert isinstance(row["volume"], int)
+
+
+def test_failing_download_fails_only_its_chunk(frames):
+    sink = MemorySink()
+    results = run(full_jobs(), StubSource(frames, failing={"BBB"}), sink, chunk_size=2)
+
+    assert results["AAA"]["error"] == results["BBB"]["error"] == "download failed"
+    assert results["CCC"]["error"] is None and results["CCC"]["rows"] == 71
+    assert {t for t, _ in sink.rows} == {"CCC", "DDD"}
+
+
+def test_missing_ticker_is_reported(frames):
+    del frames["DDD"]
+    results = run(full_jobs(), StubSource(frames), MemorySink())
+    assert results["DDD"]["error"] == "No data returned"
+    assert results["AAA"]["error"] is None
+
+
+def test_failing_compute_fails_only_its_chunk(frames):
+    frames["CCC"] = frames["CCC"].drop(columns="Close")
+    sink = MemorySink()
+    results = run(full_jobs(), StubSource(frames), sink, chunk_size=2)
+
+    assert results["CCC"]["error"] is not None and results["DDD"]["error"] is not None
+    assert results["AAA"]["error"] is None and results["AAA"]["rows"] == 71
+    assert {t for t, _ in sink.rows} == {"AAA", "BBB"}
+
+
+class BrokenPool:
+    """A process pool whose workers were killed (e.g. by the OOM killer)."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+
+    def shutdown(self, *args, **kwargs):
+        pass
+
+
+def test_broken_process_pool_fails_every_ticker_instead_of_hanging(frames, monkeypatch):
+    monkeypatch.setattr(ingest, "ProcessPoolExecutor", BrokenPool)
+    tickers = [f"T{i:02d}" for i in range(12)]
+    frames = {t: bars(t) for t in tickers}
+    sink = MemorySink()
+    # More chunks than the compute queue holds: the download stage must not block on it
+    results = run(full_jobs(tickers), StubSource(frames), sink, compute_workers=2, chunk_size=1,
+                  compute_queue_depth=1, download_workers=1)
+
+    assert all(r["error"] is not None for r in results.values())
+    assert any("BrokenProcessPool" in r["error"] for r in results.values())
+    assert sink.rows == {}
+
+
+def test_incremental_run_upserts_only_changed_rows(frames):
+    sink = MemorySink()
+    run(full_jobs(), StubSource(frames), sink)
+    assert len(sink.rows) == 4 * 71
+
+    # Keep rows from the last stored bar on (same download start, so EMAs are seeded
+    # identically): unchanged, so nothing is written
+    incremental = {t: (datetime(2024, 1, 1), datetime(2024, 6, 28)) for t in TICKERS}
+    results = run(incremental, StubSource(frames), sink)
+    assert all(r["rows"] == 0 and r["error"] is None for r in results.values())
+
+    # A revised last bar (it was written mid-session) is upserted again
+    frames["AAA"].iloc[-1, frames["AAA"].columns.get_loc("Close")] *= 1.02
+    results = run(incremental, StubSource(frames), sink)
+    assert results["AAA"]["rows"] == 1 and results["BBB"]["rows"] == 0
+    assert sink.rows[("AAA", "2024-06-28")]["close"] == pytest.approx(frames["AAA"]["Close"].iloc[-1])
+
+
+def test_process_pool_matches_in_thread_compute(frames):
+    in_thread, pooled = MemorySink(), MemorySink()
+    run(full_jobs(), StubSource(frames), in_thread, chunk_size=1)
+    results = run(full_jobs(), StubSource(frames), pooled, chunk_size=1, compute_workers=2)
+    assert all(r["error"] is None for r in results.values())
+    assert pooled.rows == in_thread.rows
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_indicator_frame
+from utils.records import RECORD_COLUMNS, frame_to_records
+
+
+def legacy_build_records(df: pd.DataFrame, ticker: str):
+    """The iterrows() serializer fetch_data.py used before utils.records."""
+    df = df.replace([np.inf, -np.inf], None)
+    df = df.where(pd.notnull(df), None)
+
+    records = []
+    for _, row in df.iterrows():
+        records.append({
+            "ticker": ticker,
+            "date": row['Date'].strftime('%Y-%m-%d'),
+            "open": float(row['Open']) if row['Open'] is not None else None,
+            "high": float(row['High']) if row['High'] is not None else None,
+            "low": float(row['Low']) if row['Low'] is not None else None,
+            "close": float(row['Close']) if row['Close'] is not None else None,
+            "volume": int(row['Volume']) if row['Volume'] is not None else None,
+            "returns": float(row['returns']) if row['returns'] is not None else None,
+            "ma20": float(row['ma20']) if row['ma20'] is not None else None,
+            "sma_50": float(row['sma_50']) if row['sma_50'] is not None else None,
+            "rsi14": float(row['rsi14']) if row['rsi14'] is not None else None,
+            "macd": float(row['macd']) if row['macd'] is not None else None,
+            "bb_upper": float(row['bb_upper']) if row['bb_upper'] is not None else None,
+            "bb_lower": float(row['bb_lower']) if row['bb_lower'] is not None else None,
+            "volume_ma5": float(row['volume_ma5']) if row['volume_ma5'] is not None else None
+        })
+    return records
+
+
+def frame(n_bars: int = 4) -> pd.DataFrame:
+    """A small indicator frame with every value finite."""
+    df = make_indicator_frame(n_bars, seed=1)
+    df["returns"] = df["Close"].pct_change().fillna(0.0)
+    return df
+
+
+def assert_same_types(records):
+    for record in records:
+        for key, value in record.items():
+            expected = {"ticker": str, "date": str, "volume": int}.get(key, float)
+            assert value is None or type(value) is expected, (key, value)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_matches_legacy_serializer(seed):
+    df = make_indicator_frame(300, seed=seed)   # with ±inf cells injected
+    records = frame_to_records(df, "SYN")
+    assert records == legacy_build_records(df, "SYN")
+    assert [list(r) for r in records[:1]] == [["ticker", "date"] + RECORD_COLUMNS]
+    assert_same_types(records)
+
+
+@pytest.mark.parametrize("bad", [np.nan, np.inf, -np.inf, None])
+def test_non_finite_values_become_null(bad):
+    df = frame()
+    df["macd"] = df["macd"].astype(object)
+    df.loc[1, "macd"] = bad
+    df.loc[2, "returns"] = np.nan if bad is None else bad
+
+    records = frame_to_records(df, "SYN")
+    assert records[1]["macd"] is None and records[2]["returns"] is None
+    assert records[0]["macd"] == float(df.loc[0, "macd"])
+    assert_same_types(records)
+    if bad is not None and np.isinf(bad):
+        # The legacy serializer only nulled ±inf: where(..., None) leaves NaN in float columns
+        assert records == legacy_build_records(df, "SYN")
+
+
+def test_volume_is_coerced_to_int():
+    df = frame()
+    df["Volume"] = [1_000, 2_500.0, 12.5, 7.9]
+    records = frame_to_records(df, "SYN")
+    # float volumes truncate like int()
+    assert [r["volume"] for r in records] == [1000, 2500, 12, 7]
+    assert records == legacy_build_records(df, "SYN")
+    assert_same_types(records)
+
+
+def test_missing_volume_is_null():
+    # The legacy serializer raised here: where(..., None) leaves NaN in a float column
+    df = frame()
+    df["Volume"] = [1_000.0, np.nan, np.inf, 3.0]
+    assert [r["volume"] for r in frame_to_records(df, "SYN")] == [1000, None, None, 3]
+
+
+def test_int64_volume_stays_int():
+    df = frame()
+    assert df["Volume"].dtype == np.int64
+    volumes = [r["volume"] for r in frame_to_records(df, "SYN")]
+    assert volumes == df["Volume"].tolist() and all(type(v) is int for v in volumes)
+
+
+def test_dates_are_formatted_as_days():
+    df = frame(3)
+    df["Date"] = pd.to_datetime(["2024-01-02 16:00:00", "2024-01-03 00:00:00", "2024-12-31 09:30:15"])
+    records = frame_to_records(df, "SYN")
+    assert [r["date"] for r in records] == ["2024-01-02", "2024-01-03", "2024-12-31"]
+    assert {r["ticker"] for r in records} == {"SYN"}
+
+
+def test_empty_frame():
+    assert frame_to_records(frame().iloc[:0], "SYN") == []
@@ -0,0 +1,154 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+import scheduler
+from scheduler import Checkpoints, shard_of, shard_tickers
+
+UNIVERSE = ["SAP.DE", "SIE.DE", "ALV.DE", "BAS.DE", "BMW.DE", "MBG.DE", "DTE.DE", "AIR.PA", "MC.PA", "ASML.AS"]
+
+
+class StubRunners:
+    """Stands in for scheduler.RUNNERS: records each call and fails the units listed in `fail`."""
+
+    def __init__(self, fail=None, crash=None):
+        self.calls = []
+        self.fail = dict(fail or {})     # (stage, ticker) -> failures left (None: always)
+        self.crash = crash or {}         # stage -> tickers reported before the stage raises
+
+    def runner(self, stage):
+        def run(tickers, args, report):
+            self.calls.append((stage, list(tickers)))
+            if stage in self.crash:
+                for ticker in self.crash[stage]:
+                    report(ticker, None)
+                raise RuntimeError(f"{stage} unavailable")
+            for ticker in tickers:
+                left = self.fail.get((stage, ticker), 0)
+                if left is None or left > 0:
+                    if left:
+                        self.fail[(stage, ticker)] = left - 1
+                    report(ticker, f"{stage} failed")
+                else:
+                    report(ticker, None)
+        return run
+
+
+@pytest.fixture
+def schedule(tmp_path, monkeypatch):
+    """Runs scheduler.main() over stub runners with a tmp --state-dir. Returns its exit code."""
+    monkeypatch.setattr(scheduler, "RETRY_BACKOFF", 0)
+
+    def run(runners, *argv, tickers=UNIVERSE[:3], stages=("fetch", "train")):
+        for stage in scheduler.STAGES:
+            monkeypatch.setitem(scheduler.RUNNERS, stage, runners.runner(stage))
+        try:
+            scheduler.main(["--run", "test", "--state-dir", str(tmp_path), "--stages", *stages,
+                            "--report", str(tmp_path / "report.json"), "--tickers", *tickers, *argv])
+        except SystemExit as e:
+            return e.code
+        return 0
+
+    return run
+
+
+@pytest.fixture
+def checkpoints(tmp_path):
+    return Checkpoints(str(tmp_path), "test")
+
+
+# ─── Sharding ─────────────────────────────────────────────────────────────────
+
+def test_shard_of_is_stable_across_processes():
+    code = "import json, sys; from scheduler import shard_of; print(json.dumps([shard_of(t, 7) for t in sys.argv[1:]]))"
+    pipeline_dir = os.path.dirname(os.path.abspath(scheduler.__file__))
+    runs = []
+    for seed in ("1", "2"):
+        env = {**os.environ, "PYTHONHASHSEED": seed}
+        out = subprocess.run([sys.executable, "-c", code, *UNIVERSE], cwd=pipeline_dir, env=env,
+                             check=True, capture_output=True, text=True)
+        runs.append(json.loads(out.stdout))
+    assert runs[0] == runs[1] == [shard_of(t, 7) for t in UNIVERSE]
+
+
+@pytest.mark.parametrize("shards", [1, 3, 4])
+def test_shards_partition_the_universe(shards):
+    parts = [shard_tickers(UNIVERSE, shard, shards) for shard in range(shards)]
+    assert sorted(t for part in parts for t in part) == sorted(UNIVERSE)
+    assert sum(len(part) for part in parts) == len(UNIVERSE)
+    # Adding tickers doesn't move the existing ones
+    grown = [shard_tickers(UNIVERSE + ["NEW.DE", "NEW.PA"], shard, shards) for shard in range(shards)]
+    assert [[t for t in part if t in UNIVERSE] for part in grown] == parts
+
+
+# ─── Checkpoints ──────────────────────────────────────────────────────────────
+
+def test_pending_and_mark_resume_from_disk(checkpoints, tmp_path):
+    stages = ["fetch", "train", "convert"]
+    a, b, c = UNIVERSE[:3]
+    checkpoints.mark(a, "fetch")
+    checkpoints.mark(b, "fetch", "timeout")
+
+    # A new instance (a rerun) sees the same state
+    resumed = Checkpoints(str(tmp_path), "test")
+    assert resumed.pending([a, b, c], "fetch", stages) == [b, c]
+    assert resumed.pending([a, b, c], "train", stages) == [a]
+    assert resumed.pending([a, b, c], "convert", stages) == []
+    # Only the stages selected for the run gate a unit
+    assert resumed.pending([a, b, c], "convert", ["convert"]) == [a, b, c]
+
+    resumed.mark(b, "fetch")
+    entry = Checkpoints(str(tmp_path), "test").load(b)["stages"]["fetch"]
+    assert entry["status"] == "done" and entry["attempts"] == 2 and entry["error"] is None
+    assert checkpoints.status(c, "fetch") == "pending"
+    assert not any(name.endswith(".tmp") for name in os.listdir(checkpoints.dir))
+
+
+# ─── Shard worker ─────────────────────────────────────────────────────────────
+
+def test_all_units_run_once(schedule, checkpoints):
+    runners = StubRunners()
+    assert schedule(runners) == 0
+    assert runners.calls == [("fetch", UNIVERSE[:3]), ("train", UNIVERSE[:3])]
+    assert all(checkpoints.status(t, s) == "done" for t in UNIVERSE[:3] for s in ("fetch", "train"))
+
+
+def test_retries_only_failed_units(schedule, checkpoints):
+    a, b, c = UNIVERSE[:3]
+    runners = StubRunners(fail={("fetch", b): 1})
+    assert schedule(runners, "--retries", "1") == 0
+    assert runners.calls == [("fetch", [a, b, c]), ("fetch", [b]), ("train", [a, b, c])]
+    assert checkpoints.load(b)["stages"]["fetch"]["attempts"] == 2
+
+
+def test_later_stages_wait_for_earlier_ones_and_rerun_resumes(schedule, checkpoints):
+    a, b, c = UNIVERSE[:3]
+    runners = StubRunners(fail={("fetch", b): None})
+    assert schedule(runners, "--retries", "0") == 1
+    assert runners.calls == [("fetch", [a, b, c]), ("train", [a, c])]
+    assert checkpoints.status(b, "train") == "pending"
+
+    # Rerunning the same --run only runs the failed unit and what it gated
+    runners = StubRunners()
+    assert schedule(runners, "--retries", "0") == 0
+    assert runners.calls == [("fetch", [b]), ("train", [b])]
+
+
+def test_stage_wide_exception_fails_every_unreported_unit(schedule, checkpoints):
+    a, b, c = UNIVERSE[:3]
+    runners = StubRunners(crash={"fetch": [a]})
+    assert schedule(runners, "--retries", "0") == 1
+    assert checkpoints.status(a, "fetch") == "done"
+    for ticker in (b, c):
+        entry = checkpoints.load(ticker)["stages"]["fetch"]
+        assert entry["status"] == "failed" and entry["error"] == "fetch unavailable"
+    assert runners.calls == [("fetch", [a, b, c]), ("train", [a])]
+
+
+def test_shard_only_runs_its_tickers(schedule):
+    runners = StubRunners()
+    assert schedule(runners, "--shard", "1", "--shards", "3", tickers=UNIVERSE, stages=("fetch",)) == 0
+    assert runners.calls == [("fetch", shard_tickers(UNIVERSE, 1, 3))]
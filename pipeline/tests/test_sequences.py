@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from utils.sequences import create_sequences
+
+N_FEATURES = 10
+FORECAST_DAYS = 3
+
+
+def legacy_create_sequences(data: np.ndarray, window_size: int, forecast_days: int):
+    """create_sequences as train_models.py implemented it before the strided version."""
+    X, y = [], []
+    for i in range(len(data) - window_size - forecast_days + 1):
+        X.append(data[i : i + window_size])
+        y.append(data[i + window_size : i + window_size + forecast_days, 0])
+    return np.array(X), np.array(y)
+
+
+@pytest.mark.parametrize("window_size", [1, 7, 30, 120])
+def test_matches_legacy_implementation(window_size):
+    data = np.random.default_rng(window_size).random((500, N_FEATURES))
+    X0, y0 = legacy_create_sequences(data, window_size, FORECAST_DAYS)
+    X1, y1 = create_sequences(data, window_size, FORECAST_DAYS)
+
+    assert X1.shape == X0.shape == (500 - window_size - FORECAST_DAYS + 1, window_size, N_FEATURES)
+    assert y1.shape == y0.shape
+    # Equal up to the float32 cast
+    np.testing.assert_array_equal(X1, X0.astype(np.float32))
+    np.testing.assert_array_equal(y1, y0.astype(np.float32))
+
+
+def test_windows_are_read_only_views():
+    data = np.random.default_rng(0).random((200, N_FEATURES)).astype(np.float32)
+    X, y = create_sequences(data, 30, FORECAST_DAYS)
+    assert not X.flags.writeable and not y.flags.writeable
+    assert np.shares_memory(X, y)   # both over the one float32 copy
+
+
+@pytest.mark.parametrize("rows", [0, 10, 32])
+def test_too_few_rows_gives_empty_arrays(rows):
+    X, y = create_sequences(np.zeros((rows, N_FEATURES)), 30, FORECAST_DAYS)
+    assert X.shape == (0, 30, N_FEATURES) and y.shape == (0, FORECAST_DAYS)
+    assert X.dtype == y.dtype == np.float32
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import train_models as tm
+import train_stacked
+from utils.sequences import create_sequences
+
+N_FEATURES = len(tm.FEATURES)
+
+
+def batches(ds):
+    return [tuple(np.asarray(t) for t in b) if isinstance(b, tuple) else np.asarray(b) for b in ds]
+
+
+@pytest.mark.parametrize("window_size", [7, 120])
+def test_window_dataset_matches_create_sequences(window_size):
+    rows = np.random.default_rng(window_size).random((400, N_FEATURES))
+    X, y = create_sequences(rows, window_size, tm.FORECAST_DAYS)
+    n_train, n_windows = tm.split_windows(len(rows), window_size)
+    assert n_windows == len(X)
+
+    for start, stop in [(0, n_train), (n_train, None)]:
+        got = batches(tm.window_dataset(rows, start, stop, window_size=window_size, batch_size=32))
+        assert all(len(b[0]) <= 32 for b in got)
+        np.testing.assert_array_equal(np.concatenate([b[0] for b in got]), X[start:stop])
+        np.testing.assert_array_equal(np.concatenate([b[1] for b in got]), y[start:stop])
+
+
+def test_window_dataset_shuffles_every_window_once():
+    rows = np.random.default_rng(0).random((200, N_FEATURES))
+    X, y = create_sequences(rows, tm.WINDOW_SIZE, tm.FORECAST_DAYS)
+    got = batches(tm.window_dataset(rows, shuffle=True))
+    Xs, ys = np.concatenate([b[0] for b in got]), np.concatenate([b[1] for b in got])
+    # Same (X, y) pairs in another order; a window is identified by its first value
+    order = np.argsort(Xs[:, 0, 0])
+    expected = np.argsort(X[:, 0, 0])
+    np.testing.assert_array_equal(Xs[order], X[expected])
+    np.testing.assert_array_equal(ys[order], y[expected])
+
+
+def test_window_dataset_without_targets_and_too_few_rows():
+    rows = np.random.default_rng(1).random((50, N_FEATURES))
+    X, _ = create_sequences(rows, tm.WINDOW_SIZE, tm.FORECAST_DAYS)
+    got = batches(tm.window_dataset(rows, batch_size=16, targets=False))
+    np.testing.assert_array_equal(np.concatenate(got), X)
+    assert batches(tm.window_dataset(rows[:5])) == []
+
+
+def test_stacked_padding_lines_up_recent_windows():
+    rng = np.random.default_rng(2)
+    long, short = rng.random((120, N_FEATURES)), rng.random((60, N_FEATURES))
+    towers = [(rows, 0, tm.split_windows(len(rows))[1]) for rows in (long, short)]
+    length = towers[0][2]
+    got = batches(train_stacked.padded_dataset(towers, length))
+    X = [np.concatenate([b[0][k] for b in got]) for k in range(2)]
+    y = [np.concatenate([b[1][k] for b in got]) for k in range(2)]
+    w = [np.concatenate([b[2][k] for b in got]) for k in range(2)]
+
+    for k, (rows, _, n) in enumerate(towers):
+        Xk, yk = create_sequences(rows, tm.WINDOW_SIZE, tm.FORECAST_DAYS)
+        pad = length - n
+        np.testing.assert_array_equal(X[k][pad:], Xk)
+        np.testing.assert_array_equal(y[k][pad:], yk)
+        np.testing.assert_array_equal(w[k], np.r_[np.zeros(pad), np.ones(n)])
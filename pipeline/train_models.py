@@ -1,5 +1,6 @@
 import os
 import json
+import time
 import joblib
 import numpy as np
 import pandas as pd
@@ -9,42 +10,43 @@ from tensorflow.keras.layers import Input, LSTM, Dense, Dropout
 from tensorflow.keras.callbacks import EarlyStopping
 from sklearn.preprocessing import MinMaxScaler
 from datetime import datetime
-from dotenv import load_dotenv
-from supabase import create_client, Client
 import shutil
+import argparse
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils import instrumentation
+from utils.config import supabase, add_ticker_argument, selected_tickers
+from utils.data_loader import PriceCache
+from utils.manifest import Manifest, combine, hash_array, hash_json, model_version
+from utils.bundle import BUNDLE_NAME, write_bundle
+from utils.storage import Uploader, models_bucket, raise_for_errors, summarize
+
+# ─── Config ───────────────────────────────────────────────────────────────────
+#
+# The ticker universe (TICKERS) is read from universe.csv by utils/config.py and
+# shared by every stage; --tickers selects a subset.
 
 # Optional: tensorflowjs only supports Python <= 3.11
-# If available, use it directly; otherwise conversion is handled separately (e.g. GitHub Actions)
-try:
-    import tensorflowjs as tfjs
-    TFJS_AVAILABLE = True
-    print("tensorflowjs found — will convert locally.")
-except ImportError:
-    TFJS_AVAILABLE = False
-    print("tensorflowjs not available — will save .h5 only. Conversion runs via GitHub Actions.")
+# If available, use it directly; otherwise conversion is handled separately (e.g. GitHub Actions).
+# It is probed on first use, not at import: it takes seconds to load and most
+# importers (forecast, backtest, train_stacked, the benchmarks) never convert.
+_tfjs = None
 
-load_dotenv()
 
-# ─── Config ───────────────────────────────────────────────────────────────────
-#
-# Individual models per company because:
-# - Each stock has sector-specific volatility patterns (e.g. ASML = tech cycles, NESN = consumer staples)
-# - A universal model averages out these nuances and underperforms on individual tickers
-# - Separate models can be retrained independently with no cross-contamination
-#
-# To add a new company: simply add its yfinance ticker to this list
-TICKERS = [
-    "ASML.AS",     # ASML            - Tech / Semiconductors
-    "SAP.DE",      # SAP             - Tech / Software
-    "NESN.SW",     # Nestlé          - Consumer Staples
-    "MC.PA",       # LVMH            - Luxury / Consumer Discretionary
-    "NOVO-B.CO",   # Novo Nordisk    - Healthcare / Pharma
-    "NOVN.SW",     # Novartis        - Healthcare / Pharma
-    "ROG.SW",      # Roche           - Healthcare / Pharma
-    "TTE.PA",      # TotalEnergies   - Energy
-    "SIE.DE",      # Siemens         - Industrials
-    "OR.PA",       # L'Oréal         - Consumer Staples / Beauty
-]
+def load_tfjs():
+    """The tensorflowjs module, or None if it isn't installed. Prints which on the first call."""
+    global _tfjs
+    if _tfjs is None:
+        try:
+            import tensorflowjs
+            _tfjs = tensorflowjs
+            print("tensorflowjs found — will convert locally.")
+        except ImportError:
+            _tfjs = False
+            print("tensorflowjs not available — will save .h5 only. Conversion runs via GitHub Actions.")
+    return _tfjs or None
+
 
 # ─── 10 Technical Indicator Features ──────────────────────────────────────────
 #
@@ -77,102 +79,284 @@ DROPOUT = 0.2
 LSTM_UNITS = 64
 VAL_SPLIT = 0.2
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+# ─── Incremental (warm-start) retraining ──────────────────────────────────────
+FINE_TUNE_EPOCHS = 5             # a few passes over the recent windows only
+FINE_TUNE_PATIENCE = 2
+FINE_TUNE_LEARNING_RATE = 0.0001 # small steps: nudge the existing weights, don't relearn them
+FINE_TUNE_WINDOWS = 256          # most recent training windows used for fine-tuning
+DRIFT_TOLERANCE = 1.5            # full retrain once val MSE exceeds 1.5x the last full training's
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("ERROR: Missing Supabase credentials in .env file.")
-    exit(1)
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# ─── Fast (CPU) training mode ─────────────────────────────────────────────────
+#
+# --fast trains the same model on a graph with less per-step overhead, which
+# is most of a step on CPU runners (benchmarks/bench_training.py measures it):
+# - FAST_STEPS_PER_EXECUTION batches run per call into the compiled train step
+# - the LSTM is unrolled over the short window: same math, no symbolic loop.
+#   model.h5 is saved from the regular build_model graph with these weights.
+# --jit adds XLA (jit_compile). It is opt-in: on CPU it made this LSTM much
+# slower to compile and to run. --intra-op-threads/--inter-op-threads size
+# TF's thread pools; oneDNN is switched with TF_ENABLE_ONEDNN_OPTS=0/1, which
+# TensorFlow reads once at import.
+FAST_STEPS_PER_EXECUTION = 16
 
+# Local memory-mapped copy of daily_prices (see utils/data_loader.py)
+price_cache = PriceCache(supabase, FEATURES)
 
-# ─── Helper Functions ─────────────────────────────────────────────────────────
+# Concurrent, checksum-deduplicated uploads to the models bucket (see utils/storage.py)
+uploader = Uploader(models_bucket(supabase))
 
-def create_sequences(data: np.ndarray, window_size: int, forecast_days: int):
-    """
-    Converts a scaled time-series array into (X, y) training pairs.
-    
-    X shape: (samples, window_size, n_features)
-    y shape: (samples, forecast_days)   ← only the close price (index 0) as target
-    
-    Why 3-day multi-output instead of recursive single-step:
-    - Multi-output forces the model to learn the dependency between future days
-    - Recursive predictions compound errors (each step uses a prediction as input)
-    - Loss weights [1.0, 0.8, 0.6] let the model focus on near-term accuracy
-    """
-    X, y = [], []
-    for i in range(len(data) - window_size - forecast_days + 1):
-        X.append(data[i : i + window_size])
-        y.append(data[i + window_size : i + window_size + forecast_days, 0])  # close price only
-    return np.array(X), np.array(y)
 
+# ─── Helper Functions ─────────────────────────────────────────────────────────
 
-def build_model(input_shape: tuple):
+def build_model(input_shape: tuple, lstm_units: int = LSTM_UNITS, dropout: float = DROPOUT,
+                learning_rate: float = LEARNING_RATE, fast: bool = False, jit_compile: bool = False):
     """
     Functional API architecture for maximum cross-version stability.
     This avoids auto-deserialization quirks of Sequential between Keras 2 and 3.
+    The defaults are the hyperparameters above; hparam_search.py varies them.
+    fast=True builds the fast-mode training graph (unrolled LSTM, steps_per_execution).
     """
     inputs = tf.keras.layers.Input(shape=input_shape, name='input_layer')
     
-    x = tf.keras.layers.LSTM(LSTM_UNITS, activation='tanh', name='lstm_layer')(inputs)
-    x = tf.keras.layers.Dropout(DROPOUT, name='dropout_layer')(x)
+    x = tf.keras.layers.LSTM(lstm_units, activation='tanh', name='lstm_layer', unroll=fast)(inputs)
+    x = tf.keras.layers.Dropout(dropout, name='dropout_layer')(x)
     
     outputs = tf.keras.layers.Dense(FORECAST_DAYS, name='output_layer')(x)
     
     model = tf.keras.models.Model(inputs=inputs, outputs=outputs)
 
     model.compile(
-        optimizer=tf.keras.optimizers.Adam(learning_rate=LEARNING_RATE),
-        loss='mse'
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss='mse',
+        steps_per_execution=FAST_STEPS_PER_EXECUTION if fast else 1,
+        jit_compile=jit_compile
     )
     return model
 
 
+def window_dataset(rows: np.ndarray, start: int = 0, stop: int = None, window_size: int = WINDOW_SIZE,
+                   batch_size: int = BATCH_SIZE, shuffle: bool = False, targets: bool = True):
+    """
+    Batches of the windows create_sequences(rows) would give, [start, stop) of
+    them, built inside the tf.data pipeline: each batch gathers its windows from
+    the base rows, so only one batch of windows is ever dense. With
+    targets=False it yields X only (for predict()). shuffle reshuffles the
+    window order every epoch, as fit() does with arrays.
+    """
+    base = tf.constant(np.ascontiguousarray(rows, dtype=np.float32))
+    n_windows = max(0, len(rows) - window_size - FORECAST_DAYS + 1)
+    stop = n_windows if stop is None else min(stop, n_windows)
+    offsets = tf.range(window_size, dtype=tf.int64)
+    horizon = tf.range(window_size, window_size + FORECAST_DAYS, dtype=tf.int64)
+
+    def gather(i):
+        X = tf.gather(base, i[:, None] + offsets)
+        return (X, tf.gather(base[:, 0], i[:, None] + horizon)) if targets else X
+
+    ds = tf.data.Dataset.range(start, max(start, stop))
+    if shuffle:
+        ds = ds.shuffle(max(1, stop - start), reshuffle_each_iteration=True)
+    return ds.batch(batch_size).map(gather, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
+
+def regular_graph(model):
+    """A build_model() model holding `model`'s weights (undoes fast=True's training graph for saving)."""
+    plain = build_model(model.input_shape[1:])
+    plain.set_weights(model.get_weights())
+    return plain
+
+
 # ─── Per-Ticker Training ──────────────────────────────────────────────────────
 
-def train_for_ticker(ticker: str):
-    print(f"\n{'='*60}")
-    print(f"  Training: {ticker}")
-    print(f"{'='*60}")
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
 
-    # 1. Fetch data from Supabase
-    response = supabase.table("daily_prices") \
-        .select(",".join(FEATURES)) \
-        .eq("ticker", ticker) \
-        .order("date") \
-        .execute()
-    
-    data = response.data
-    if len(data) < 100:
-        print(f"  ⚠ Skipping {ticker}: only {len(data)} rows (need ≥ 100).")
-        return
 
-    df = pd.DataFrame(data)[FEATURES].astype(float)
+def hyperparameters() -> dict:
+    """Everything besides the data that determines a trained model."""
+    return {
+        "features": FEATURES,
+        "window_size": WINDOW_SIZE,
+        "forecast_days": FORECAST_DAYS,
+        "batch_size": BATCH_SIZE,
+        "epochs": EPOCHS,
+        "patience": PATIENCE,
+        "learning_rate": LEARNING_RATE,
+        "dropout": DROPOUT,
+        "lstm_units": LSTM_UNITS,
+        "val_split": VAL_SPLIT,
+    }
+
+
+def training_digest(df: pd.DataFrame) -> str:
+    """Content hash of the training inputs (data slice + hyperparameters) for the manifest."""
+    return combine(hash_json(hyperparameters()), hash_array(df.to_numpy(dtype=np.float64)))
+
+
+def is_trained(ticker: str, digest: str) -> bool:
+    """True if model.h5 exists and was trained on exactly these inputs."""
+    model_path = os.path.join(MODELS_DIR, ticker, "model.h5")
+    return os.path.exists(model_path) and Manifest(ticker, MODELS_DIR).is_current("train", digest)
+
+
+def load_training_data(ticker: str):
+    """Feature rows for a ticker in date order, or None if there are too few to train on."""
+    # 1. Fetch data from Supabase (paginated, via the local cache — only new rows are downloaded)
+    df = price_cache.load_frame(ticker)
+    if len(df) < 100:
+        print(f"  ⚠ Skipping {ticker}: only {len(df)} rows (need ≥ 100).")
+        return None
+
+    df = df.reset_index(drop=True)
     df.dropna(inplace=True)
+    return df
+
+
+def split_windows(n_rows: int, window_size: int = WINDOW_SIZE):
+    """(n_train, n_windows): windows over n_rows rows, the last VAL_SPLIT of them for validation."""
+    n_windows = max(0, n_rows - window_size - FORECAST_DAYS + 1)
+    return int((1 - VAL_SPLIT) * n_windows), n_windows
+
 
+def prepare_dataset(ticker: str, df: pd.DataFrame):
+    """
+    Scales features and splits their windows into train/val index ranges.
+    Returns None if there are too few sequences. The windows themselves are
+    built per batch by window_dataset(rows, ...).
+    """
     # 2. Normalize with MinMaxScaler
     # Each feature is independently scaled to [0, 1]
     # The scaler is saved alongside the model so the frontend can invert predictions
     scaler = MinMaxScaler(feature_range=(0, 1))
-    scaled = scaler.fit_transform(df)
+    rows = scaler.fit_transform(df).astype(np.float32)
+
+    # 3. Build sequences, 4. Train / Validation split (80/20, no shuffle — time-series order matters!)
+    n_train, n_windows = split_windows(len(rows))
+    if n_windows < 50:
+        print(f"  ⚠ Skipping {ticker}: insufficient sequences ({n_windows}) after windowing.")
+        return None
+
+    print(f"  Sequences: {n_windows} total | {n_train} train | {n_windows - n_train} val")
+    return {
+        "scaler": scaler,
+        "rows": rows,
+        "n_train": n_train,
+        "n_val": n_windows - n_train,
+    }
 
-    # 3. Build sequences
-    X, y = create_sequences(scaled, WINDOW_SIZE, FORECAST_DAYS)
-    if len(X) < 50:
-        print(f"  ⚠ Skipping {ticker}: insufficient sequences ({len(X)}) after windowing.")
-        return
 
-    # 4. Train / Validation split (80/20, no shuffle — time-series order matters!)
-    split = int((1 - VAL_SPLIT) * len(X))
-    X_train, X_val = X[:split], X[split:]
-    y_train, y_val = y[:split], y[split:]
+def scaler_covers(scaler: MinMaxScaler, df: pd.DataFrame) -> bool:
+    """True if every value in df lies inside the range the scaler was fit on."""
+    values = df.to_numpy(dtype=np.float64)
+    return bool(np.all(values.min(axis=0) >= scaler.data_min_) and np.all(values.max(axis=0) <= scaler.data_max_))
+
 
-    print(f"  Sequences: {len(X)} total | {len(X_train)} train | {len(X_val)} val")
+def fine_tune_for_ticker(ticker: str, df: pd.DataFrame, digest: str, verbose: int = 1,
+                         publish: bool = True) -> bool:
+    """
+    Warm-starts from the saved model.h5 / scaler.pkl and fine-tunes on the most
+    recent windows. Returns False (caller does a full retrain) if there is no
+    compatible previous model or val loss drifted past metadata's drift_threshold.
+    """
+    base_path = os.path.join(MODELS_DIR, ticker)
+    model_path = os.path.join(base_path, "model.h5")
+    scaler_path = os.path.join(base_path, "scaler.pkl")
+    metadata_path = os.path.join(base_path, "metadata.json")
+    if not all(os.path.exists(p) for p in (model_path, scaler_path, metadata_path)):
+        print(f"  -> No previous model for {ticker}.")
+        return False
+
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+    previous = {k: metadata.get(k) for k in ("features", "window_size", "forecast_days", "lstm_units")}
+    if previous != {"features": FEATURES, "window_size": WINDOW_SIZE,
+                    "forecast_days": FORECAST_DAYS, "lstm_units": LSTM_UNITS}:
+        print(f"  -> Previous model for {ticker} was built with different hyperparameters.")
+        return False
+    threshold = metadata.get("drift_threshold")
+    if threshold is None:
+        print(f"  -> Previous metadata for {ticker} has no drift_threshold.")
+        return False
+
+    # Keep the scaler unless new data falls outside its range; partial_fit only widens min/max
+    scaler = joblib.load(scaler_path)
+    if not scaler_covers(scaler, df):
+        print(f"  New data outside the scaler's range — refitting scaler.")
+        scaler.partial_fit(df)
+    rows = scaler.transform(df)
+
+    split, n_windows = split_windows(len(rows))
+    if split < 1 or split == n_windows:
+        return False
+    first = max(0, split - FINE_TUNE_WINDOWS)
+    train = window_dataset(rows, first, split, shuffle=True)
+    val = window_dataset(rows, split)
+
+    model = tf.keras.models.load_model(model_path, compile=False)
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=FINE_TUNE_LEARNING_RATE), loss='mse')
+
+    print(f"  Fine-tuning on {split - first} recent windows | {n_windows - split} val")
+    with instrumentation.stage("fine_tune", ticker):
+        history = model.fit(
+            train,
+            epochs=FINE_TUNE_EPOCHS,
+            validation_data=val,
+            callbacks=[EarlyStopping(monitor='val_loss', patience=FINE_TUNE_PATIENCE, restore_best_weights=True)],
+            verbose=verbose
+        )
+        val_loss = model.evaluate(val, verbose=0)
+    instrumentation.count("epochs", len(history.history['val_loss']), ticker)
+    if val_loss > threshold:
+        print(f"  ⚠ Val MSE {val_loss:.6f} drifted past threshold {threshold:.6f}.")
+        return False
+
+    epochs_ran = len(history.history['val_loss'])
+    instrumentation.note("mode", "incremental", ticker)
+    print(f"\n  [OK] Fine-tuned — val MSE: {val_loss:.6f} (threshold {threshold:.6f}, {epochs_ran} epochs)")
+    # Keep the full training's baseline so drift is always measured against it
+    save_artifacts(ticker, model, scaler, val_loss, epochs_ran, split - first, extra_metadata={
+        "training_mode": "incremental",
+        "baseline_val_loss": metadata.get("baseline_val_loss", metadata.get("val_loss")),
+        "drift_threshold": threshold,
+    }, publish=publish)
+    Manifest(ticker, MODELS_DIR).record("train", digest, rows=len(df), val_loss=float(val_loss),
+                                        training_mode="incremental")
+    return True
+
+
+def train_for_ticker(ticker: str, verbose: int = 1, force: bool = False, incremental: bool = False,
+                     fast: bool = False, jit: bool = False, publish: bool = True):
+    """
+    Trains (or fine-tunes) one ticker and saves its artifacts. With publish=False
+    they are only written locally: no TF.js conversion, no upload (scheduler.py
+    runs those as stages of their own).
+    """
+    print(f"\n{'='*60}")
+    print(f"  Training: {ticker}")
+    print(f"{'='*60}")
+
+    with instrumentation.stage("load_data", ticker):
+        df = load_training_data(ticker)
+    if df is None:
+        return
+    instrumentation.note("rows", len(df), ticker)
+    digest = training_digest(df)
+    if not force and is_trained(ticker, digest):
+        print(f"  [SKIP] {ticker}: data and hyperparameters unchanged since last training (--force to retrain).")
+        return
+    if incremental:
+        if fine_tune_for_ticker(ticker, df, digest, verbose, publish=publish):
+            return
+        print(f"  -> Falling back to a full retrain.")
+    with instrumentation.stage("prepare", ticker):
+        dataset = prepare_dataset(ticker, df)
+    if dataset is None:
+        return
 
     # 5. Build & train
-    model = build_model((WINDOW_SIZE, len(FEATURES)))
-    
+    model = build_model((WINDOW_SIZE, len(FEATURES)), fast=fast, jit_compile=jit)
+    train = window_dataset(dataset["rows"], 0, dataset["n_train"], shuffle=True)
+    val = window_dataset(dataset["rows"], dataset["n_train"])
+
     early_stop = EarlyStopping(
         monitor='val_loss',
         patience=PATIENCE,
@@ -180,21 +364,34 @@ def train_for_ticker(ticker: str):
         verbose=1
     )
 
-    history = model.fit(
-        X_train, y_train,
-        epochs=EPOCHS,
-        batch_size=BATCH_SIZE,
-        validation_data=(X_val, y_val),
-        callbacks=[early_stop],
-        verbose=1
-    )
+    with instrumentation.stage("fit", ticker):
+        history = model.fit(
+            train,
+            validation_data=val,
+            epochs=EPOCHS,
+            callbacks=[early_stop],
+            verbose=verbose
+        )
+    if fast:
+        model = regular_graph(model)
 
     val_loss = min(history.history['val_loss'])
     epochs_ran = len(history.history['val_loss'])
+    instrumentation.count("epochs", epochs_ran, ticker)
+    instrumentation.note("mode", "full-fast" if fast else "full", ticker)
     print(f"\n  [OK] Done — Best val MSE: {val_loss:.6f} (stopped at epoch {epochs_ran})")
 
+    save_artifacts(ticker, model, dataset["scaler"], val_loss, epochs_ran, dataset["n_train"],
+                   publish=publish)
+    Manifest(ticker, MODELS_DIR).record("train", digest, rows=len(df), val_loss=float(val_loss))
+
+
+def save_artifacts(ticker: str, model, scaler, val_loss: float, epochs_ran: int,
+                   training_samples: int, extra_metadata: dict = None, publish: bool = True):
+    """Writes model.h5, scaler.pkl and metadata.json, then (if publish) converts/uploads as configured."""
     # 6. Save artifacts locally
-    base_path = os.path.join("models", ticker)
+    save_start = time.perf_counter()
+    base_path = os.path.join(MODELS_DIR, ticker)
     os.makedirs(base_path, exist_ok=True)
 
     # 6a. Keras model in classic format for stable conversion
@@ -206,6 +403,11 @@ def train_for_ticker(ticker: str):
     joblib.dump(scaler, scaler_path)
 
     # 6c. Metadata (documents what the model was trained with)
+    metadata_path = os.path.join(base_path, "metadata.json")
+    previous = {}
+    if os.path.exists(metadata_path):
+        with open(metadata_path) as f:
+            previous = json.load(f)
     metadata = {
         "ticker": ticker,
         "features": FEATURES,
@@ -215,25 +417,40 @@ def train_for_ticker(ticker: str):
         "dropout": DROPOUT,
         "learning_rate": LEARNING_RATE,
         "val_loss": float(val_loss),
+        # Incremental runs fall back to a full retrain above this val loss (overridden by fine-tuning)
+        "baseline_val_loss": float(val_loss),
+        "drift_threshold": float(val_loss) * DRIFT_TOLERANCE,
         "epochs_ran": epochs_ran,
-        "training_samples": len(X_train),
+        "training_samples": training_samples,
         "last_trained": datetime.now().isoformat(),
         "python_version": "3.11",
         "tensorflow_version": "2.15.0",
     }
-    with open(os.path.join(base_path, "metadata.json"), "w") as f:
+    # Keep the last hyperparameter search's results (written by hparam_search.py) across retrains
+    if "hparam_search" in previous:
+        metadata["hparam_search"] = previous["hparam_search"]
+    metadata.update(extra_metadata or {})
+    with open(metadata_path, "w") as f:
         json.dump(metadata, f, indent=2)
 
     print(f"  [OK] Saved: {model_path}, scaler, metadata")
+    instrumentation.add_time("save", time.perf_counter() - save_start, ticker)
+    if not publish:
+        return
 
     # 7. TF.js Conversion (if library is available locally)
     tfjs_path = os.path.join(base_path, "tfjs")
-    if TFJS_AVAILABLE:
+    tfjs = load_tfjs()
+    if tfjs:
         if os.path.exists(tfjs_path):
             shutil.rmtree(tfjs_path)
         try:
-            tfjs.converters.save_keras_model(model, tfjs_path)
-            print(f"  [OK] Converted to TF.js format locally.")
+            with instrumentation.stage("tfjs_convert", ticker):
+                tfjs.converters.save_keras_model(model, tfjs_path)
+                print(f"  [OK] Converted to TF.js format locally.")
+                # Single-request bundle for the web app (see utils/bundle.py), uploaded with the TF.js files
+                write_bundle(os.path.join(tfjs_path, BUNDLE_NAME), tfjs_path, scaler, metadata, ticker,
+                             model_version(base_path))
             upload_to_supabase(ticker, base_path, tfjs_path)
         except Exception as e:
             print(f"  [WARNING] TF.js conversion failed: {e}")
@@ -247,69 +464,154 @@ def train_for_ticker(ticker: str):
 def upload_artifacts_only(ticker: str, base_path: str):
     """Upload non-TF.js artifacts (metadata.json, scaler.pkl) to Supabase."""
     print(f"  Uploading metadata & scaler for {ticker}...")
-    for fname in ["metadata.json", "scaler.pkl"]:
-        fpath = os.path.join(base_path, fname)
-        ct = "application/json" if fname.endswith(".json") else "application/octet-stream"
-        with open(fpath, "rb") as f:
-            supabase.storage.from_("models").upload(
-                path=f"{ticker}/{fname}",
-                file=f,
-                file_options={"upsert": "true", "content-type": ct}
-            )
-    print(f"  [OK] Metadata uploaded for {ticker}")
+    results = uploader.upload_dir(base_path, ticker, ["metadata.json", "scaler.pkl"])
+    raise_for_errors(results)
+    print(f"  [OK] Metadata uploaded for {ticker} ({summarize(results)})")
 
 
 def upload_to_supabase(ticker: str, base_path: str, tfjs_path: str):
     """Upload all model artifacts (metadata, scaler, TF.js files) to Supabase Storage."""
     print(f"  Uploading all artifacts for {ticker}...")
-    
-    # Upload metadata & scaler
-    for fname in ["metadata.json", "scaler.pkl"]:
-        fpath = os.path.join(base_path, fname)
-        ct = "application/json" if fname.endswith(".json") else "application/octet-stream"
-        with open(fpath, "rb") as f:
-            supabase.storage.from_("models").upload(
-                path=f"{ticker}/{fname}",
-                file=f,
-                file_options={"upsert": "true", "content-type": ct}
-            )
-
-    # Upload TF.js model files
-    for fname in os.listdir(tfjs_path):
-        fpath = os.path.join(tfjs_path, fname)
-        ct = "application/json" if fname.endswith(".json") else "application/octet-stream"
-        with open(fpath, "rb") as f:
-            supabase.storage.from_("models").upload(
-                path=f"{ticker}/{fname}",
-                file=f,
-                file_options={"upsert": "true", "content-type": ct}
-            )
-    
-    print(f"  [OK] All artifacts uploaded for {ticker}")
+    files = [(os.path.join(base_path, fname), f"{ticker}/{fname}") for fname in ["metadata.json", "scaler.pkl"]]
+    files += [(os.path.join(tfjs_path, fname), f"{ticker}/{fname}") for fname in sorted(os.listdir(tfjs_path))]
+    results = uploader.upload(files)
+    raise_for_errors(results)
+    print(f"  [OK] All artifacts uploaded for {ticker} ({summarize(results)})")
 
 
-# ─── Entry Point ──────────────────────────────────────────────────────────────
+# ─── Parallel Training ────────────────────────────────────────────────────────
+#
+# Each 64-unit LSTM barely uses more than one core, so the parallel mode trains
+# several tickers at once in separate processes. TF thread pools are capped per
+# worker (workers x threads ≈ cores) so they don't oversubscribe the machine.
 
-if __name__ == "__main__":
-    os.makedirs("models", exist_ok=True)
-    
-    success, failed = [], []
-    for ticker in TICKERS:
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "train")
+
+
+def _init_worker(intra_op_threads: int, inter_op_threads: int):
+    # Must run before the worker executes its first TF op
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+
+def _train_worker(ticker: str, log_dir: str, offline: bool = False, force: bool = False,
+                  incremental: bool = False, fast: bool = False, jit: bool = False):
+    """Trains one ticker with stdout/stderr captured in <log_dir>/<ticker>.log. Returns an error string or None."""
+    price_cache.refresh = not offline
+    log_path = os.path.join(log_dir, f"{ticker}.log")
+    with open(log_path, "w", encoding="utf-8") as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
         try:
-            train_for_ticker(ticker)
-            success.append(ticker)
+            # verbose=2: one line per epoch instead of progress bars in the log
+            train_for_ticker(ticker, verbose=2, force=force, incremental=incremental, fast=fast, jit=jit)
+            return None
         except Exception as e:
-            print(f"\n  [ERROR] Failed to train {ticker}: {e}")
             import traceback
             traceback.print_exc()
-            failed.append(ticker)
+            return str(e)
+
+
+def train_parallel(tickers, workers: int, threads_per_worker: int = None, log_dir: str = LOG_DIR,
+                   offline: bool = False, force: bool = False, incremental: bool = False,
+                   fast: bool = False, jit: bool = False):
+    """Trains tickers across a process pool. Returns (success, failed) in ticker order."""
+    threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    os.makedirs(log_dir, exist_ok=True)
+    print(f"Training {len(tickers)} tickers on {workers} workers x {threads} TF threads (logs: {log_dir}/)")
+
+    outcome = {}
+    # spawn, not fork: TensorFlow's runtime is not fork-safe
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(threads, min(2, threads))) as pool:
+        # Each worker's stage timings come back with its result (see utils/instrumentation.py)
+        futures = {pool.submit(instrumentation.measured, _train_worker, ticker, log_dir, offline, force, incremental,
+                               fast, jit): ticker
+                   for ticker in tickers}
+        for fut in as_completed(futures):
+            ticker = futures[fut]
+            try:
+                error = instrumentation.merged(fut.result())
+            except Exception as e:
+                error = f"worker crashed: {e}"
+            outcome[ticker] = error
+            log_path = os.path.join(log_dir, f"{ticker}.log")
+            if error is None:
+                print(f"  [OK] {ticker} ({log_path})")
+            else:
+                print(f"  [ERROR] Failed to train {ticker}: {error} ({log_path})")
+
+    success = [t for t in tickers if outcome.get(t, "missing") is None]
+    failed = [t for t in tickers if t not in success]
+    return success, failed
+
+
+# ─── Entry Point ──────────────────────────────────────────────────────────────
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train per-ticker LSTM models.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Train this many tickers in parallel processes (default: 1, serial)")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="TF intra-op threads per worker (default: cores // workers)")
+    parser.add_argument("--offline", action="store_true",
+                        help="Train on the local data cache without fetching new rows")
+    parser.add_argument("--force", action="store_true",
+                        help="Retrain even if the data and hyperparameters are unchanged")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Fine-tune the previous model.h5 on recent data instead of training from scratch "
+                             "(falls back to a full retrain on drift)")
+    parser.add_argument("--fast", action="store_true",
+                        help="Fast CPU training: tf.data input, steps_per_execution batching, unrolled LSTM")
+    parser.add_argument("--jit", action="store_true",
+                        help="Compile the training step with XLA (jit_compile; usually slower on CPU)")
+    parser.add_argument("--intra-op-threads", type=int, default=None,
+                        help="TF intra-op threads for serial runs (default: TF's choice; "
+                             "--threads-per-worker applies with --workers)")
+    parser.add_argument("--inter-op-threads", type=int, default=None,
+                        help="TF inter-op threads for serial runs (default: TF's choice)")
+    add_ticker_argument(parser)
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    instrumentation.start("train_models", args)
+    tickers = selected_tickers(args)
+
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    price_cache.refresh = not args.offline
+    instrumentation.note("onednn", os.getenv("TF_ENABLE_ONEDNN_OPTS", "default"))
+    
+    if args.workers > 1:
+        success, failed = train_parallel(tickers, args.workers, args.threads_per_worker,
+                                         offline=args.offline, force=args.force,
+                                         incremental=args.incremental, fast=args.fast, jit=args.jit)
+    else:
+        if args.intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(args.intra_op_threads)
+        if args.inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(args.inter_op_threads)
+        success, failed = [], []
+        for ticker in tickers:
+            try:
+                train_for_ticker(ticker, force=args.force, incremental=args.incremental,
+                                 fast=args.fast, jit=args.jit)
+                success.append(ticker)
+            except Exception as e:
+                print(f"\n  [ERROR] Failed to train {ticker}: {e}")
+                import traceback
+                traceback.print_exc()
+                failed.append(ticker)
 
     print(f"\n{'='*60}")
     print(f"  Training Complete")
     print(f"  [OK] Success: {', '.join(success) if success else 'none'}")
     print(f"  [ERROR] Failed:  {', '.join(failed) if failed else 'none'}")
     print(f"{'='*60}")
+    instrumentation.finish(failed=failed)
     
-    if not TFJS_AVAILABLE:
+    if not load_tfjs():
         print("\n  NOTE: TF.js conversion will run automatically in GitHub Actions.")
         print("  Push your models/ folder or trigger the workflow manually.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import os
+import argparse
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.callbacks import Callback
+
+import train_models as tm
+from utils.config import add_ticker_argument, selected_tickers
+from train_models import FEATURES, WINDOW_SIZE, FORECAST_DAYS, LSTM_UNITS, DROPOUT, LEARNING_RATE
+
+# ─── Stacked Ensemble Training ────────────────────────────────────────────────
+#
+# Trains every ticker's model in a single Keras graph: one independent
+# Input → LSTM → Dropout → Dense tower per ticker, side by side, with no shared
+# weights. The towers are still separate models (see the note on TICKERS in
+# utils/config.py) — gradients never cross towers, and Adam's per-parameter
+# updates are unaffected by the other towers' losses — but one fit() step now
+# advances all of them, so the per-step Python/Keras overhead is paid once
+# instead of once per ticker.
+#
+# Afterwards each tower's weights are copied into a plain build_model() model
+# and saved with train_models.save_artifacts, so model.h5 / metadata.json and
+# everything downstream (convert_models.py, web inference) are unchanged.
+#
+# Usage (from pipeline/):  python train_stacked.py
+
+
+def build_stacked_model(n_towers: int, input_shape: tuple):
+    """n_towers independent copies of train_models.build_model, in one graph."""
+    inputs, outputs = [], []
+    for i in range(n_towers):
+        inp = tf.keras.layers.Input(shape=input_shape, name=f'input_{i}')
+        x = tf.keras.layers.LSTM(LSTM_UNITS, activation='tanh', name=f'lstm_{i}')(inp)
+        x = tf.keras.layers.Dropout(DROPOUT, name=f'dropout_{i}')(x)
+        outputs.append(tf.keras.layers.Dense(FORECAST_DAYS, name=f'output_{i}')(x))
+        inputs.append(inp)
+
+    model = tf.keras.models.Model(inputs=inputs, outputs=outputs)
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=LEARNING_RATE),
+        loss='mse',
+        weighted_metrics=[]  # padding is masked via sample_weight; no extra metrics
+    )
+    return model
+
+
+def tower_weights(model, i: int):
+    return [model.get_layer(f'lstm_{i}').get_weights(), model.get_layer(f'output_{i}').get_weights()]
+
+
+def set_tower_weights(model, i: int, weights):
+    model.get_layer(f'lstm_{i}').set_weights(weights[0])
+    model.get_layer(f'output_{i}').set_weights(weights[1])
+
+
+class PerTowerEarlyStopping(Callback):
+    """
+    EarlyStopping(monitor=val_loss, restore_best_weights=True) applied to each
+    tower separately. A tower that runs out of patience keeps training with the
+    others, but its best-epoch weights are restored at the end, so the result
+    is the same as stopping it. Training ends once every tower has stopped.
+    """
+
+    def __init__(self, n_towers: int, patience: int):
+        super().__init__()
+        self.n_towers = n_towers
+        self.patience = patience
+
+    def on_train_begin(self, logs=None):
+        self.best = [np.inf] * self.n_towers
+        self.wait = [0] * self.n_towers
+        self.best_weights = [None] * self.n_towers
+        self.stopped_epoch = [None] * self.n_towers
+
+    def on_epoch_end(self, epoch, logs=None):
+        for i in range(self.n_towers):
+            if self.stopped_epoch[i] is not None:
+                continue
+            current = logs[f'val_output_{i}_loss']
+            if current < self.best[i]:
+                self.best[i] = current
+                self.wait[i] = 0
+                self.best_weights[i] = tower_weights(self.model, i)
+            else:
+                self.wait[i] += 1
+                if self.wait[i] >= self.patience:
+                    self.stopped_epoch[i] = epoch + 1
+        if all(e is not None for e in self.stopped_epoch):
+            self.model.stop_training = True
+
+    def on_train_end(self, logs=None):
+        for i, weights in enumerate(self.best_weights):
+            if weights is not None:
+                set_tower_weights(self.model, i, weights)
+
+
+def padded_dataset(towers, length: int, shuffle: bool = False):
+    """
+    One tf.data pipeline over every tower's windows: ((X_0, ...), (y_0, ...),
+    (sample_weight_0, ...)) batches. `towers` is a list of (rows, start, stop)
+    window ranges (see train_models.window_dataset), each padded at the front
+    to `length` windows. Histories differ in length, so the oldest positions of
+    shorter tickers are padding with weight 0 and the most recent windows line
+    up across towers. Windows are gathered per batch from the base rows.
+    """
+    offsets = tf.range(WINDOW_SIZE, dtype=tf.int64)
+    horizon = tf.range(WINDOW_SIZE, WINDOW_SIZE + FORECAST_DAYS, dtype=tf.int64)
+    bases = [(tf.constant(np.ascontiguousarray(rows, dtype=np.float32)), start, stop - length)
+             for rows, start, stop in towers]
+
+    def gather(j):
+        X, y, w = [], [], []
+        for base, start, first in bases:
+            i = j + first
+            clamped = tf.maximum(i, start)[:, None]
+            X.append(tf.gather(base, clamped + offsets))
+            y.append(tf.gather(base[:, 0], clamped + horizon))
+            w.append(tf.cast(i >= start, tf.float32))
+        return tuple(X), tuple(y), tuple(w)
+
+    ds = tf.data.Dataset.range(length)
+    if shuffle:
+        ds = ds.shuffle(max(1, length), reshuffle_each_iteration=True)
+    return ds.batch(tm.BATCH_SIZE).map(gather, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
+
+def train_stacked(tickers, verbose: int = 1, force: bool = False):
+    """Trains all tickers in one stacked model and saves per-ticker artifacts. Returns (success, failed)."""
+    datasets, digests, failed, unchanged = {}, {}, [], []
+    for ticker in tickers:
+        print(f"\n  Loading: {ticker}")
+        try:
+            df = tm.load_training_data(ticker)
+            if df is None:
+                continue
+            digests[ticker] = tm.training_digest(df)
+            if not force and tm.is_trained(ticker, digests[ticker]):
+                print(f"  [SKIP] {ticker}: data and hyperparameters unchanged since last training.")
+                unchanged.append(ticker)
+                continue
+            dataset = tm.prepare_dataset(ticker, df)
+        except Exception as e:
+            print(f"  [ERROR] Failed to load {ticker}: {e}")
+            failed.append(ticker)
+            continue
+        if dataset is not None:
+            datasets[ticker] = dataset
+
+    towers = list(datasets)
+    if not towers:
+        return unchanged, failed
+
+    n_train = max(d["n_train"] for d in datasets.values())
+    n_val = max(d["n_val"] for d in datasets.values())
+    train = padded_dataset([(d["rows"], 0, d["n_train"]) for d in datasets.values()], n_train, shuffle=True)
+    val = padded_dataset([(d["rows"], d["n_train"], d["n_train"] + d["n_val"]) for d in datasets.values()], n_val)
+
+    print(f"\n{'='*60}")
+    print(f"  Stacked training: {len(towers)} towers | {n_train} train | {n_val} val samples per tower")
+    print(f"{'='*60}")
+
+    input_shape = (WINDOW_SIZE, len(FEATURES))
+    stacked = build_stacked_model(len(towers), input_shape)
+    early_stop = PerTowerEarlyStopping(len(towers), tm.PATIENCE)
+    history = stacked.fit(
+        train,
+        epochs=tm.EPOCHS,
+        validation_data=val,
+        callbacks=[early_stop],
+        verbose=verbose
+    )
+    total_epochs = len(history.history['loss'])
+
+    # Split back into standalone per-ticker models
+    success = []
+    for i, ticker in enumerate(towers):
+        try:
+            d = datasets[ticker]
+            model = tm.build_model(input_shape)
+            lstm_weights, output_weights = tower_weights(stacked, i)
+            model.get_layer('lstm_layer').set_weights(lstm_weights)
+            model.get_layer('output_layer').set_weights(output_weights)
+            # Re-evaluate without padding so val_loss means the same as in train_for_ticker
+            val_loss = model.evaluate(tm.window_dataset(d["rows"], d["n_train"]), verbose=0)
+            epochs_ran = early_stop.stopped_epoch[i] or total_epochs
+            print(f"\n  [OK] {ticker} — Best val MSE: {val_loss:.6f} (stopped at epoch {epochs_ran})")
+            tm.save_artifacts(ticker, model, d["scaler"], val_loss, epochs_ran, d["n_train"],
+                              extra_metadata={"training_mode": "stacked"})
+            tm.Manifest(ticker, tm.MODELS_DIR).record("train", digests[ticker], val_loss=float(val_loss),
+                                                      training_mode="stacked")
+            success.append(ticker)
+        except Exception as e:
+            print(f"\n  [ERROR] Failed to save {ticker}: {e}")
+            failed.append(ticker)
+
+    return [t for t in tickers if t in success or t in unchanged], [t for t in tickers if t in failed]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train all per-ticker models together in one stacked graph.")
+    parser.add_argument("--force", action="store_true",
+                        help="Retrain even if the data and hyperparameters are unchanged")
+    add_ticker_argument(parser)
+    args = parser.parse_args()
+
+    os.makedirs(tm.MODELS_DIR, exist_ok=True)
+
+    success, failed = train_stacked(selected_tickers(args), force=args.force)
+
+    print(f"\n{'='*60}")
+    print(f"  Stacked Training Complete")
+    print(f"  [OK] Success: {', '.join(success) if success else 'none'}")
+    print(f"  [ERROR] Failed:  {', '.join(failed) if failed else 'none'}")
+    print(f"{'='*60}")
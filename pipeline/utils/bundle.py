@@ -0,0 +1,87 @@
+"""
+Single-file model bundle: everything the web app needs for one ticker's
+forecast — topology, weights, scaler min/max, feature order and training
+metadata — in one object that is fetched with one request.
+
+Layout (little-endian):
+
+    offset  size  field
+    0       8     magic b"TFBUNDLE"
+    8       4     uint32 format version (BUNDLE_VERSION)
+    12      4     uint32 header length N
+    16      N     UTF-8 JSON header
+    16+N    ...   weight data: the TF.js shards concatenated in weightSpecs order
+
+The header holds "modelTopology" and "weightSpecs" exactly as in the TF.js
+model.json (weights keep any float16/uint8 quantization), so the reader can
+hand them to tf.io.fromMemory unchanged, plus:
+
+    ticker, model_version, features, window_size, forecast_days,
+    scaler {data_min_, data_max_, feature_range}, metadata, weight_data_bytes
+
+It is built from the TF.js output directory at convert (or train) time and
+replaces the scaler.json that fix_scalers.py used to add afterwards.
+"""
+import os
+import json
+import struct
+
+BUNDLE_NAME = "model.bundle"
+BUNDLE_MAGIC = b"TFBUNDLE"
+BUNDLE_VERSION = 1
+_PREAMBLE = struct.Struct("<8sII")
+
+
+def write_bundle(path: str, tfjs_dir: str, scaler, metadata: dict, ticker: str, model_version: str = None):
+    """Writes the bundle for the TF.js model in tfjs_dir (model.json + shards). Returns its size in bytes."""
+    with open(os.path.join(tfjs_dir, "model.json")) as f:
+        model_json = json.load(f)
+
+    weight_specs, chunks = [], []
+    for group in model_json["weightsManifest"]:
+        weight_specs += group["weights"]
+        for shard in group["paths"]:
+            with open(os.path.join(tfjs_dir, shard), "rb") as f:
+                chunks.append(f.read())
+    weight_data = b"".join(chunks)
+
+    header = {
+        "ticker": ticker,
+        "model_version": model_version,
+        "features": metadata.get("features"),
+        "window_size": metadata.get("window_size"),
+        "forecast_days": metadata.get("forecast_days"),
+        "scaler": {
+            "data_min_": scaler.data_min_.tolist(),
+            "data_max_": scaler.data_max_.tolist(),
+            "feature_range": list(scaler.feature_range),
+        },
+        "metadata": metadata,
+        "format": model_json.get("format"),
+        "modelTopology": model_json["modelTopology"],
+        "weightSpecs": weight_specs,
+        "weight_data_bytes": len(weight_data),
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    with open(path + ".tmp", "wb") as f:
+        f.write(_PREAMBLE.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(weight_data)
+    os.replace(path + ".tmp", path)
+    return _PREAMBLE.size + len(header_bytes) + len(weight_data)
+
+
+def read_bundle(data: bytes):
+    """Parses a bundle. Returns (header, weight_data)."""
+    magic, version, header_len = _PREAMBLE.unpack_from(data)
+    if magic != BUNDLE_MAGIC:
+        raise ValueError("not a model bundle")
+    if version > BUNDLE_VERSION:
+        raise ValueError(f"unsupported bundle version {version}")
+    start = _PREAMBLE.size + header_len
+    header = json.loads(data[_PREAMBLE.size:start].decode("utf-8"))
+    weight_data = data[start:start + header["weight_data_bytes"]]
+    if len(weight_data) != header["weight_data_bytes"]:
+        raise ValueError("truncated model bundle")
+    return header, weight_data
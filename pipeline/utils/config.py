@@ -0,0 +1,94 @@
+"""
+Shared pipeline configuration: the ticker universe and the Supabase client.
+
+Importing this is cheap. The client (and the supabase package) is only
+created when something first uses it, so stages that never touch Supabase,
+and `--help`, don't pay for it. Credentials come from the environment or
+pipeline/.env:
+
+    SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY   REST API + Storage (service role bypasses RLS)
+    SUPABASE_DB_URL                           direct Postgres connection (fetch --sink postgres)
+"""
+import os
+import csv
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ─── Ticker Universe ──────────────────────────────────────────────────────────
+#
+# Individual models per company because:
+# - Each stock has sector-specific volatility patterns (e.g. ASML = tech cycles, NESN = consumer staples)
+# - A universal model averages out these nuances and underperforms on individual tickers
+# - Separate models can be retrained independently with no cross-contamination
+#   (train_stacked.py fits the same independent models side by side in one graph)
+#
+# The universe is a data file, pipeline/universe.csv (ticker,name,sector; one
+# yfinance ticker per row), so it can grow toward the full STOXX Europe 600
+# without code changes: add a row and every stage picks it up. PIPELINE_UNIVERSE
+# points at another file. Use --tickers to run a stage on a subset, and
+# scheduler.py to shard a large universe across workers.
+UNIVERSE_FILE = os.getenv("PIPELINE_UNIVERSE",
+                          os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "universe.csv"))
+
+
+def load_universe(path: str = UNIVERSE_FILE) -> list:
+    """Tickers from a universe CSV, in file order. Blank rows and rows starting with '#' are ignored."""
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = csv.DictReader(line for line in f if line.strip() and not line.startswith("#"))
+        tickers = [row["ticker"].strip() for row in rows if row.get("ticker", "").strip()]
+    duplicates = sorted({t for t in tickers if tickers.count(t) > 1})
+    if duplicates:
+        raise ValueError(f"{path}: duplicate tickers {', '.join(duplicates)}")
+    return tickers
+
+
+TICKERS = load_universe()
+
+
+def add_ticker_argument(parser):
+    parser.add_argument("--tickers", nargs="+", metavar="TICKER", default=None,
+                        help="Only process these tickers (default: every ticker in the universe CSV, "
+                             "UNIVERSE_FILE: pipeline/universe.csv, or the file PIPELINE_UNIVERSE names; "
+                             "scheduler.py also takes --universe)")
+
+
+def selected_tickers(args) -> list:
+    """The --tickers subset, or the whole universe."""
+    return list(getattr(args, "tickers", None) or TICKERS)
+
+
+# ─── Supabase ─────────────────────────────────────────────────────────────────
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+SUPABASE_DB_URL = os.getenv("SUPABASE_DB_URL")
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The shared Supabase client, created on first call."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            if not SUPABASE_URL or not SUPABASE_KEY:
+                raise RuntimeError("Missing Supabase credentials: set SUPABASE_URL and "
+                                   "SUPABASE_SERVICE_ROLE_KEY (environment or pipeline/.env).")
+            from supabase import create_client
+            _client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _client
+
+
+class LazyClient:
+    """Stands in for the Supabase client: creates it on first attribute access and forwards to it."""
+
+    def __getattr__(self, name):
+        return getattr(get_client(), name)
+
+
+# Module-level objects (PriceCache, buckets, uploaders) can hold this at import time
+supabase = LazyClient()
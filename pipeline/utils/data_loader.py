@@ -0,0 +1,219 @@
+"""
+Paginated, locally cached reader for the daily_prices table.
+
+A single unpaginated select is silently truncated at PostgREST's row cap and
+re-downloads the whole history as JSON every time. This loader instead:
+
+- pages through a ticker's rows with keyset pagination on (ticker, date)
+  (`date > last_seen ORDER BY date LIMIT page_size`), never OFFSET;
+- splits the first download into yearly date ranges fetched concurrently;
+- stores the result per ticker as memory-mapped .npy arrays plus a small
+  meta.json recording the max date (the cache key);
+- on later runs fetches only rows from the cached max date onwards, and
+  re-downloads the whole series when the table's first row or row count no
+  longer match the cache (a `fetch --full` backfill, or yfinance re-adjusting
+  past closes, rewrites history the incremental fetch never reaches).
+
+A cache whose arrays don't have meta.json's row count (an interrupted write)
+is treated as missing and rebuilt.
+
+Layout (under pipeline/, wherever the stage is run from):
+
+    cache/daily_prices/<ticker>/dates.npy    datetime64[D], ascending
+    cache/daily_prices/<ticker>/values.npy   float64 (rows, columns), NaN for NULL
+    cache/daily_prices/<ticker>/meta.json    {"columns": [...], "max_date": ..., "rows": ...}
+"""
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "daily_prices")
+PAGE_SIZE = 1000          # PostgREST's default max-rows
+FETCH_WORKERS = 4         # concurrent page streams (date partitions / tickers)
+PARTITION_DAYS = 365
+
+
+def _to_float(v):
+    return np.nan if v is None else float(v)
+
+
+class PriceCache:
+    """Reads `columns` of daily_prices per ticker through a local memory-mapped cache."""
+
+    def __init__(self, client, columns, table="daily_prices", cache_dir=CACHE_DIR,
+                 page_size=PAGE_SIZE, workers=FETCH_WORKERS, refresh=True):
+        self.client = client
+        self.columns = list(columns)
+        self.table = table
+        self.cache_dir = cache_dir
+        self.page_size = page_size
+        self.workers = workers
+        # refresh=False reads whatever is cached without touching the network
+        self.refresh = refresh
+
+    # ─── Remote ───────────────────────────────────────────────────────────────
+
+    def _fetch_range(self, ticker, start=None, end=None):
+        """All rows with start <= date < end (either bound optional), one keyset page at a time."""
+        rows, last = [], None
+        select = "date," + ",".join(self.columns)
+        while True:
+            q = self.client.table(self.table).select(select).eq("ticker", ticker)
+            if last is not None:
+                q = q.gt("date", last)
+            elif start is not None:
+                q = q.gte("date", start)
+            if end is not None:
+                q = q.lt("date", end)
+            page = q.order("date").limit(self.page_size).execute().data
+            rows.extend(page)
+            if len(page) < self.page_size:
+                return rows
+            last = page[-1]["date"]
+
+    def _first_date(self, ticker):
+        res = self.client.table(self.table).select("date").eq("ticker", ticker) \
+            .order("date").limit(1).execute()
+        return res.data[0]["date"] if res.data else None
+
+    def _head(self, ticker):
+        """(first row or None, total row count) for a ticker, in one request."""
+        res = self.client.table(self.table).select("date," + ",".join(self.columns), count="exact") \
+            .eq("ticker", ticker).order("date").limit(1).execute()
+        return (res.data[0] if res.data else None), res.count
+
+    def _fetch_since(self, ticker, since=None):
+        """Rows from `since` (inclusive) on; a full history is split into concurrent yearly ranges."""
+        if since is not None:
+            return self._fetch_range(ticker, start=since)
+
+        first = self._first_date(ticker)
+        if first is None:
+            return []
+        bounds = []
+        cursor = date.fromisoformat(first)
+        tomorrow = date.today() + timedelta(days=1)
+        while cursor < tomorrow:
+            bounds.append(cursor.isoformat())
+            cursor += timedelta(days=PARTITION_DAYS)
+        ranges = list(zip(bounds, bounds[1:] + [None]))
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            parts = pool.map(lambda r: self._fetch_range(ticker, *r), ranges)
+            return [row for part in parts for row in part]
+
+    # ─── Local ────────────────────────────────────────────────────────────────
+
+    def _paths(self, ticker):
+        base = os.path.join(self.cache_dir, ticker)
+        return base, os.path.join(base, "dates.npy"), os.path.join(base, "values.npy"), os.path.join(base, "meta.json")
+
+    def _read_meta(self, ticker):
+        _, _, _, meta_path = self._paths(ticker)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return meta if meta.get("columns") == self.columns else None
+
+    def _write(self, ticker, dates: np.ndarray, values: np.ndarray):
+        base, dates_path, values_path, meta_path = self._paths(ticker)
+        os.makedirs(base, exist_ok=True)
+        # Write-then-rename so readers (and memmaps of the old files) never see a partial cache
+        for path, arr in ((dates_path, dates), (values_path, values)):
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, arr)
+            os.replace(path + ".tmp", path)
+        meta = {
+            "ticker": ticker,
+            "columns": self.columns,
+            "max_date": str(dates[-1]) if len(dates) else None,
+            "rows": int(len(dates)),
+        }
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def _read(self, ticker, meta):
+        """The cached (dates, values), or None if missing or not the `meta` they were written with."""
+        _, dates_path, values_path, _ = self._paths(ticker)
+        if not (os.path.exists(dates_path) and os.path.exists(values_path)):
+            return None
+        try:
+            dates, values = np.load(dates_path, mmap_mode="r"), np.load(values_path, mmap_mode="r")
+        except ValueError:   # truncated .npy
+            return None
+        if len(dates) != meta["rows"] or values.shape != (meta["rows"], len(self.columns)):
+            return None
+        return dates, values
+
+    def _rows_to_arrays(self, rows):
+        dates = np.array([r["date"] for r in rows], dtype="datetime64[D]")
+        values = np.array([[_to_float(r.get(c)) for c in self.columns] for r in rows], dtype=np.float64)
+        return dates, values.reshape(len(rows), len(self.columns))
+
+    # ─── Public ───────────────────────────────────────────────────────────────
+
+    def cache_key(self, ticker):
+        """'<ticker>@<max_date>' for the cached slice, or None if nothing is cached."""
+        meta = self._read_meta(ticker)
+        return f"{ticker}@{meta['max_date']}" if meta and meta["max_date"] else None
+
+    def _download(self, ticker):
+        rows = self._fetch_since(ticker)
+        dates, values = self._rows_to_arrays(rows)
+        self._write(ticker, dates, values)
+        return len(rows)
+
+    def sync(self, ticker):
+        """Brings the local cache up to date; returns the number of rows fetched."""
+        meta = self._read_meta(ticker)
+        cached = self._read(ticker, meta) if meta else None
+        if cached is None or meta["max_date"] is None:
+            return self._download(ticker)
+
+        first, count = self._head(ticker)
+        # Re-fetch the last cached day too: it may have been written mid-session
+        rows = self._fetch_since(ticker, since=meta["max_date"])
+        new_dates, new_values = self._rows_to_arrays(rows)
+        old_dates, old_values = cached
+        kept = int(np.searchsorted(old_dates, new_dates[0])) if rows else len(old_dates)
+
+        # Rows before the cached max date were rewritten, added or removed since the cache was built
+        head_dates, head_values = (old_dates, old_values) if kept else (new_dates, new_values)
+        if first is None or count != kept + len(rows) or first["date"] != str(head_dates[0]) or \
+                not np.array_equal(self._rows_to_arrays([first])[1][0], head_values[0], equal_nan=True):
+            del cached, old_dates, old_values, head_dates, head_values
+            return self._download(ticker)
+        if not rows:
+            return 0
+        dates = np.concatenate([old_dates[:kept], new_dates])
+        values = np.concatenate([old_values[:kept], new_values])
+        # Release the memmaps before replacing their files (required on Windows)
+        del cached, old_dates, old_values, head_dates, head_values
+        self._write(ticker, dates, values)
+        return len(rows)
+
+    def load(self, ticker):
+        """(dates, values) memory-mapped from the cache, synced first unless refresh=False."""
+        if self.refresh:
+            self.sync(ticker)
+        meta = self._read_meta(ticker)
+        cached = self._read(ticker, meta) if meta else None
+        if cached is None:
+            return np.empty(0, dtype="datetime64[D]"), np.empty((0, len(self.columns)))
+        return cached
+
+    def load_frame(self, ticker) -> pd.DataFrame:
+        """load() as a DataFrame with `columns`, indexed by date."""
+        dates, values = self.load(ticker)
+        return pd.DataFrame(np.asarray(values), index=pd.DatetimeIndex(dates, name="date"), columns=self.columns)
+
+    def load_many(self, tickers) -> dict:
+        """load_frame for several tickers, syncing them concurrently."""
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            return dict(zip(tickers, pool.map(self.load_frame, tickers)))
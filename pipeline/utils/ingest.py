@@ -0,0 +1,518 @@
+"""
+Staged multi-ticker ingestion: download -> compute indicators -> upsert.
+
+The three stages run concurrently and are connected by bounded queues, so
+yfinance requests, indicator computation and Supabase upserts overlap instead
+of running strictly one ticker after another:
+
+    download pool (grouped requests) -> compute queue -> compute workers
+        -> upload queue -> uploader threads (retry with backoff)
+
+Sources and sinks are plain objects, so the live yfinance/Supabase pair can be
+swapped for local stand-ins (see MemorySink and benchmarks/synthetic.py):
+
+    source.download(tickers, start, end) -> {ticker: OHLCV frame}
+    sink.latest_dates(tickers)           -> {ticker: datetime}
+    sink.filter_changed(ticker, records) -> records not already stored as-is
+    sink.upsert(records)
+
+SupabaseSink writes through the REST API; PostgresSink bulk-loads over a
+direct database connection (binary COPY + one merge statement per batch).
+"""
+import math
+import time
+import multiprocessing
+import importlib.util
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+
+import pandas as pd
+
+# Optional: only PostgresSink needs a direct database driver (imported on first connection)
+PSYCOPG_AVAILABLE = importlib.util.find_spec("psycopg") is not None
+
+from utils import instrumentation
+from utils.indicators import compute_indicators_many
+from utils.records import INT_COLUMNS, RECORD_COLUMNS, frame_to_records
+
+# ─── Defaults ─────────────────────────────────────────────────────────────────
+CHUNK_SIZE = 10            # tickers per grouped yfinance request
+DOWNLOAD_WORKERS = 2       # concurrent download requests
+COMPUTE_WORKERS = 2        # indicator processes (<= 1 computes in-thread)
+UPLOAD_WORKERS = 4         # concurrent upsert requests
+COMPUTE_QUEUE_DEPTH = 4    # downloaded chunks waiting for compute
+UPLOAD_QUEUE_DEPTH = 32    # record batches waiting for upload
+UPSERT_BATCH_SIZE = 1000   # rows per upsert (keeps payloads under the API limit)
+COPY_BATCH_SIZE = 50_000   # rows per COPY + merge transaction (PostgresSink)
+RETRIES = 3
+BACKOFF_SECONDS = 1.0
+
+_DONE = object()
+
+
+def with_retry(fn, *args, retries=RETRIES, backoff=BACKOFF_SECONDS, **kwargs):
+    """Calls fn, retrying failures with exponential backoff (backoff, 2x, 4x, ...)."""
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            print(f"  [retry] {e} — attempt {attempt + 2}/{retries + 1} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def _same_value(a, b):
+    if a is None or b is None:
+        return a is None and b is None
+    return math.isclose(float(a), float(b), rel_tol=1e-9, abs_tol=1e-12)
+
+
+def records_differ(record: dict, stored: dict) -> bool:
+    return not all(_same_value(record[c], stored.get(c)) for c in RECORD_COLUMNS)
+
+
+# ─── Sources ──────────────────────────────────────────────────────────────────
+
+class YFinanceSource:
+    """
+    Downloads bars for several tickers in one grouped yfinance request: daily
+    by default, or intraday with e.g. interval="30m" (yfinance serves those
+    for the last 60 days only).
+    """
+
+    def __init__(self, interval="1d"):
+        self.interval = interval
+
+    def download(self, tickers, start, end):
+        import yfinance as yf
+
+        df = yf.download(list(tickers), start=start, end=end, interval=self.interval, group_by="ticker",
+                         progress=False)
+        frames = {}
+        if df.empty:
+            return frames
+
+        for ticker in tickers:
+            if isinstance(df.columns, pd.MultiIndex):
+                if ticker in df.columns.get_level_values(0):
+                    tdf = df[ticker]
+                elif ticker in df.columns.get_level_values(1):
+                    tdf = df.xs(ticker, axis=1, level=1)
+                else:
+                    continue
+            else:
+                tdf = df
+            # Grouped frames share one calendar; drop the other exchanges' trading days
+            tdf = tdf.dropna(how="all")
+            if not tdf.empty:
+                tdf = tdf.copy()
+                tdf.index.name = "Date"
+                frames[ticker] = tdf
+        return frames
+
+
+# ─── Sinks ────────────────────────────────────────────────────────────────────
+
+class SupabaseSink:
+    """
+    Writes records to the daily_prices table through the Supabase REST API.
+    Upserts ask for returning="minimal" by default: nothing reads the
+    upserted rows, so PostgREST needn't serialize them and send them back.
+    """
+
+    def __init__(self, client, table="daily_prices", returning="minimal"):
+        self.client = client
+        self.table = table
+        self.returning = returning
+
+    def latest_dates(self, tickers):
+        latest = {}
+        for ticker in tickers:
+            res = self.client.table(self.table) \
+                .select("date") \
+                .eq("ticker", ticker) \
+                .order("date", desc=True) \
+                .limit(1) \
+                .execute()
+            if res.data:
+                latest[ticker] = datetime.strptime(res.data[0]["date"], "%Y-%m-%d")
+        return latest
+
+    def filter_changed(self, ticker, records):
+        if not records:
+            return records
+        dates = [r["date"] for r in records]
+        res = self.client.table(self.table) \
+            .select("date," + ",".join(RECORD_COLUMNS)) \
+            .eq("ticker", ticker) \
+            .gte("date", min(dates)) \
+            .lte("date", max(dates)) \
+            .execute()
+        stored = {row["date"]: row for row in res.data}
+        return [r for r in records if r["date"] not in stored or records_differ(r, stored[r["date"]])]
+
+    def upsert(self, records):
+        self.client.table(self.table).upsert(records, on_conflict="ticker,date", returning=self.returning).execute()
+
+
+class PostgresSink:
+    """
+    Writes records to daily_prices over a direct Postgres connection
+    (e.g. Supabase's SUPABASE_DB_URL) instead of REST JSON batches.
+
+    Each upsert() streams its batch with binary COPY into a temporary staging
+    table and merges it with a single INSERT ... ON CONFLICT (ticker, date)
+    DO UPDATE, in one transaction. The merge leaves rows whose values are
+    unchanged untouched, so filter_changed() returns records as they are
+    instead of reading them back first. Staged floats go through float8 ->
+    text -> numeric, which keeps the shortest round-trip digits, i.e. the
+    same values the REST path stores from JSON.
+
+    Each upload thread gets its own connection; call close() when done.
+    """
+
+    STAGING_COLUMNS = {
+        "ticker": "text", "date": "date",
+        **{c: "int8" if c in INT_COLUMNS else "float8" for c in RECORD_COLUMNS},
+    }
+
+    def __init__(self, dsn, table="daily_prices"):
+        if not PSYCOPG_AVAILABLE:
+            raise RuntimeError("PostgresSink needs psycopg 3: pip install 'psycopg[binary]'")
+        self.dsn = dsn
+        self.table = table
+        self.staging = f"{table}_staging"
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+        columns = ", ".join(self.STAGING_COLUMNS)
+        values = ", ".join(f"{c}::text::numeric" if t == "float8" else c for c, t in self.STAGING_COLUMNS.items())
+        updates = ", ".join(f"{c} = excluded.{c}" for c in RECORD_COLUMNS)
+        stored = ", ".join(f"{table}.{c}" for c in RECORD_COLUMNS)
+        incoming = ", ".join(f"excluded.{c}" for c in RECORD_COLUMNS)
+        self._copy_sql = f"copy {self.staging} ({columns}) from stdin (format binary)"
+        self._merge_sql = (
+            f"insert into {table} ({columns}) select {values} from {self.staging} "
+            f"on conflict (ticker, date) do update set {updates} "
+            f"where ({stored}) is distinct from ({incoming})"
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn.closed:
+            import psycopg
+            conn = psycopg.connect(self.dsn)
+            columns = ", ".join(f"{c} {t}" for c, t in self.STAGING_COLUMNS.items())
+            conn.execute(f"create temporary table if not exists {self.staging} ({columns}) on commit delete rows")
+            conn.commit()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def latest_dates(self, tickers):
+        conn = self._connection()
+        rows = conn.execute(f"select ticker, max(date) from {self.table} where ticker = any(%s) group by ticker",
+                            (list(tickers),)).fetchall()
+        conn.commit()
+        return {ticker: datetime.combine(day, datetime.min.time()) for ticker, day in rows}
+
+    def filter_changed(self, ticker, records):
+        # The merge skips unchanged rows itself
+        return records
+
+    def upsert(self, records):
+        conn = self._connection()
+        try:
+            with conn.cursor() as cur:
+                with cur.copy(self._copy_sql) as copy:
+                    copy.set_types(list(self.STAGING_COLUMNS.values()))
+                    for r in records:
+                        copy.write_row((r["ticker"], date.fromisoformat(r["date"]), *(r[c] for c in RECORD_COLUMNS)))
+                cur.execute(self._merge_sql)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+class MemorySink:
+    """
+    In-process stand-in for daily_prices, keyed by (ticker, date).
+    `latency` (seconds) is added to every call to mimic a network round trip.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.rows = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _roundtrip(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def latest_dates(self, tickers):
+        self._roundtrip()
+        latest = {}
+        with self._lock:
+            for (ticker, date) in self.rows:
+                if ticker in tickers and (ticker not in latest or date > latest[ticker]):
+                    latest[ticker] = date
+        return {t: datetime.strptime(d, "%Y-%m-%d") for t, d in latest.items()}
+
+    def filter_changed(self, ticker, records):
+        self._roundtrip()
+        with self._lock:
+            return [r for r in records
+                    if (ticker, r["date"]) not in self.rows
+                    or records_differ(r, self.rows[(ticker, r["date"])])]
+
+    def upsert(self, records):
+        self._roundtrip()
+        with self._lock:
+            for r in records:
+                self.rows[(r["ticker"], r["date"])] = dict(r)
+
+
+# ─── Pipeline ─────────────────────────────────────────────────────────────────
+
+def prepare_records(frames: dict, keep_from: dict):
+    """
+    Indicators + serialization for one downloaded chunk (runs in a compute
+    worker). All tickers in the chunk go through a single panel-kernel call.
+    Returns {ticker: records}.
+    """
+    records = {}
+    with instrumentation.stage("indicators"):
+        computed = compute_indicators_many(frames)
+    for ticker, df in computed.items():
+        with instrumentation.stage("serialize", ticker):
+            # Drop NaN rows resulting from indicator windows (e.g. SMA_50 needs 50 days)
+            df = df.dropna()
+            df = df.reset_index()
+            # Warm-up rows are only there to seed the indicators
+            if keep_from.get(ticker) is not None:
+                df = df[df['Date'] >= keep_from[ticker]]
+            records[ticker] = frame_to_records(df, ticker)
+    return records
+
+
+def run_ingestion(
+    jobs,
+    source,
+    sink,
+    end_date,
+    chunk_size=CHUNK_SIZE,
+    download_workers=DOWNLOAD_WORKERS,
+    compute_workers=COMPUTE_WORKERS,
+    upload_workers=UPLOAD_WORKERS,
+    compute_queue_depth=COMPUTE_QUEUE_DEPTH,
+    upload_queue_depth=UPLOAD_QUEUE_DEPTH,
+    batch_size=UPSERT_BATCH_SIZE,
+    retries=RETRIES,
+    backoff=BACKOFF_SECONDS,
+):
+    """
+    Runs the download/compute/upload pipeline.
+
+    jobs: {ticker: (start_date, keep_from)}. `keep_from` is None for a full
+    backfill; otherwise rows before it are dropped and the rest are checked
+    against the sink so only new or changed rows are upserted.
+
+    Returns {ticker: {"rows": upserted_count, "error": message or None}}.
+    If the compute stage itself fails (e.g. a killed worker process), every
+    ticker not yet handed to the uploaders is marked failed and the run still
+    returns.
+    """
+    upload_workers = max(1, upload_workers)
+    results = {ticker: {"rows": 0, "error": None} for ticker in jobs}
+    results_lock = threading.Lock()
+    compute_q = queue.Queue(maxsize=compute_queue_depth)
+    upload_q = queue.Queue(maxsize=upload_queue_depth)
+    # Set when the compute stage dies: downloads stop, and no stage waits on
+    # another that is gone (a full compute_q would otherwise block forever)
+    stopped = threading.Event()
+    stop_reason = []
+
+    def fail(ticker, err):
+        with results_lock:
+            results[ticker]["error"] = str(err)
+        print(f"Error processing {ticker}: {err}")
+
+    # Tickers with the same start date share grouped requests
+    by_start = {}
+    for ticker, (start, _) in jobs.items():
+        by_start.setdefault(start, []).append(ticker)
+    chunks = [
+        (start, tickers[i:i + chunk_size])
+        for start, tickers in by_start.items()
+        for i in range(0, len(tickers), chunk_size)
+    ]
+
+    def download(chunk, start):
+        with instrumentation.stage("download"):
+            return with_retry(source.download, chunk, start, end_date, retries=retries, backoff=backoff)
+
+    def put_compute(item) -> bool:
+        """compute_q.put that gives up (returns False) once the compute stage has stopped."""
+        while not stopped.is_set():
+            try:
+                compute_q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def stopped_error():
+        return f"ingestion stopped: {stop_reason[0] if stop_reason else 'compute stage failed'}"
+
+    def download_stage():
+        unhandled = [ticker for _, chunk in chunks for ticker in chunk]
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, download_workers)) as pool:
+                futures = {pool.submit(download, chunk, start): chunk for start, chunk in chunks}
+                for fut in as_completed(futures):
+                    chunk = futures[fut]
+                    for ticker in chunk:
+                        unhandled.remove(ticker)
+                    if stopped.is_set():
+                        for other in futures:
+                            other.cancel()
+                        for ticker in chunk:
+                            fail(ticker, stopped_error())
+                        continue
+                    try:
+                        frames = fut.result()
+                    except Exception as e:
+                        for ticker in chunk:
+                            fail(ticker, e)
+                        continue
+                    found = {}
+                    for ticker in chunk:
+                        df = frames.get(ticker)
+                        if df is None or df.empty:
+                            fail(ticker, "No data returned")
+                            continue
+                        print(f"  Downloaded {ticker}: {len(df)} bars")
+                        instrumentation.count("bars_downloaded", len(df), ticker)
+                        found[ticker] = df
+                    if found and not put_compute(found):
+                        for ticker in found:
+                            fail(ticker, stopped_error())
+        except Exception as e:
+            for ticker in unhandled:
+                fail(ticker, e)
+        finally:
+            # Blocking: a stopped compute stage keeps draining compute_q until it sees this
+            compute_q.put(_DONE)
+
+    def enqueue_upload(ticker, records):
+        check_changed = jobs[ticker][1] is not None
+        for i in range(0, len(records), batch_size):
+            upload_q.put((ticker, records[i:i + batch_size], check_changed))
+
+    def compute_stage():
+        # spawn, as the repo's other pools: fork would copy this process while
+        # the download and upload threads hold locks
+        executor = ProcessPoolExecutor(max_workers=compute_workers, mp_context=multiprocessing.get_context("spawn")) \
+            if compute_workers > 1 else None
+        pending = deque()
+        current = []   # tickers of the chunk taken off compute_q and not yet handed on
+
+        def finish(tickers, compute):
+            try:
+                chunk_records = compute()
+            except Exception as e:
+                for ticker in tickers:
+                    fail(ticker, e)
+                return
+            for ticker, records in chunk_records.items():
+                enqueue_upload(ticker, records)
+
+        done = False
+        try:
+            while True:
+                item = compute_q.get()
+                if item is _DONE:
+                    done = True
+                    break
+                current[:] = list(item)
+                keep_from = {ticker: jobs[ticker][1] for ticker in item}
+                if executor is None:
+                    finish(list(item), lambda: prepare_records(item, keep_from))
+                    current.clear()
+                    continue
+                # Stage timings are recorded in the worker and merged back here
+                pending.append((list(item), executor.submit(instrumentation.measured, prepare_records, item, keep_from)))
+                current.clear()
+                # Bound in-flight work and hand finished chunks to the uploader in order
+                while pending and (len(pending) > 2 * compute_workers or pending[0][1].done()):
+                    tickers, fut = pending.popleft()
+                    finish(tickers, lambda: instrumentation.merged(fut.result()))
+            while pending:
+                tickers, fut = pending.popleft()
+                finish(tickers, lambda: instrumentation.merged(fut.result()))
+        except Exception as e:
+            # e.g. BrokenProcessPool when a worker is killed: fail what is left
+            # rather than leave the download stage blocked on compute_q
+            stop_reason.append(f"{type(e).__name__}: {e}")
+            stopped.set()
+            print(f"  [ERROR] compute stage failed: {stop_reason[0]}")
+            for ticker in current + [t for tickers, _ in pending for t in tickers]:
+                fail(ticker, stopped_error())
+            while not done:
+                item = compute_q.get()
+                if item is _DONE:
+                    break
+                for ticker in item:
+                    fail(ticker, stopped_error())
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=stopped.is_set())
+            for _ in range(upload_workers):
+                upload_q.put(_DONE)
+
+    def upload_stage():
+        while True:
+            item = upload_q.get()
+            if item is _DONE:
+                return
+            ticker, batch, check_changed = item
+            try:
+                if check_changed:
+                    with instrumentation.stage("filter_changed", ticker):
+                        batch = with_retry(sink.filter_changed, ticker, batch, retries=retries, backoff=backoff)
+                if batch:
+                    with instrumentation.stage("upsert", ticker):
+                        with_retry(sink.upsert, batch, retries=retries, backoff=backoff)
+                    instrumentation.count("upsert_requests", 1, ticker)
+                instrumentation.count("rows_upserted", len(batch), ticker)
+                with results_lock:
+                    results[ticker]["rows"] += len(batch)
+            except Exception as e:
+                fail(ticker, e)
+
+    threads = [threading.Thread(target=download_stage, name="ingest-download"),
+               threading.Thread(target=compute_stage, name="ingest-compute")]
+    threads += [threading.Thread(target=upload_stage, name=f"ingest-upload-{i}")
+                for i in range(upload_workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
@@ -0,0 +1,326 @@
+"""
+Per-stage timers and counters for the pipeline scripts, written as one JSON
+run report at the end of every run.
+
+Library code records into the current run without knowing which script is
+running:
+
+    with instrumentation.stage("upsert", ticker):   # wall time, summed per stage and per ticker
+        ...
+    instrumentation.count("rows_upserted", len(batch), ticker)
+    instrumentation.note("dtype", "float16", ticker)   # last value wins
+
+and a script brackets its run with start()/finish():
+
+    instrumentation.add_arguments(parser)            # --profile, --report
+    args = parser.parse_args()
+    instrumentation.start("fetch_data", args)
+    ...
+    instrumentation.finish(failed=failed)            # prints the stage table, writes the report
+
+Stage times are summed over calls, so stages that run in parallel threads
+add up to more than the run's wall time. Work done in pool processes is
+recorded in the worker with measured() and merged into the parent's run
+(merged()). Each ticker's peak_rss_mb is the process's high-water mark
+(getrusage) when its last stage ended; it is unavailable on Windows.
+
+The cost is a lock and two clock reads per stage, so it stays on in
+production. --profile cpu|memory adds cProfile or tracemalloc for the main
+thread (cProfile does not follow worker threads or processes), with the top
+functions or allocation sites in the report and the raw cProfile stats in
+<report>.prof.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import platform
+import threading
+import contextlib
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPORT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "reports", "runs")
+PROFILE_TOP = 30
+
+
+def peak_rss_mb(children: bool = False):
+    """Peak resident set size of this process (or of its largest finished child), in MB."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS, KB elsewhere
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss * scale / 2**20, 1)
+
+
+def _max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+class RunReport:
+    """Stage timings and counters, in total and per ticker. Thread-safe."""
+
+    def __init__(self, script: str, options: dict = None):
+        self.script = script
+        self.options = options or {}
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages = {}    # name -> {"seconds", "calls"}
+        self.counters = {}  # name -> total
+        self.tickers = {}   # ticker -> {"stages", "counters", "info", "peak_rss_mb"}
+        self.workers_peak_rss_mb = None
+
+    def _ticker(self, ticker):
+        entry = self.tickers.get(ticker)
+        if entry is None:
+            entry = self.tickers[ticker] = {"stages": {}, "counters": {}, "info": {}, "peak_rss_mb": None}
+        return entry
+
+    @contextlib.contextmanager
+    def stage(self, name: str, ticker: str = None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start, ticker)
+
+    def add_time(self, name: str, seconds: float, ticker: str = None, calls: int = 1):
+        rss = peak_rss_mb() if ticker is not None else None
+        with self._lock:
+            total = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            total["seconds"] += seconds
+            total["calls"] += calls
+            if ticker is not None:
+                entry = self._ticker(ticker)
+                entry["stages"][name] = entry["stages"].get(name, 0.0) + seconds
+                entry["peak_rss_mb"] = _max(entry["peak_rss_mb"], rss)
+
+    def count(self, name: str, value=1, ticker: str = None):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            if ticker is not None:
+                counters = self._ticker(ticker)["counters"]
+                counters[name] = counters.get(name, 0) + value
+
+    def note(self, name: str, value, ticker: str = None):
+        with self._lock:
+            if ticker is None:
+                self.options[name] = value
+            else:
+                self._ticker(ticker)["info"][name] = value
+
+    def snapshot(self) -> dict:
+        """Picklable copy of the stages, counters and tickers (to return from a pool worker)."""
+        with self._lock:
+            return json.loads(json.dumps({
+                "stages": self.stages, "counters": self.counters, "tickers": self.tickers,
+                "peak_rss_mb": peak_rss_mb(),
+            }, default=str))
+
+    def merge(self, snapshot: dict):
+        """Adds a worker's snapshot to this run."""
+        if not snapshot:
+            return
+        with self._lock:
+            self.workers_peak_rss_mb = _max(self.workers_peak_rss_mb, snapshot["peak_rss_mb"])
+            for name, s in snapshot["stages"].items():
+                total = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+                total["seconds"] += s["seconds"]
+                total["calls"] += s["calls"]
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for ticker, other in snapshot["tickers"].items():
+                entry = self._ticker(ticker)
+                for name, seconds in other["stages"].items():
+                    entry["stages"][name] = entry["stages"].get(name, 0.0) + seconds
+                for name, value in other["counters"].items():
+                    entry["counters"][name] = entry["counters"].get(name, 0) + value
+                entry["info"].update(other["info"])
+                entry["peak_rss_mb"] = _max(entry["peak_rss_mb"], other["peak_rss_mb"])
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "script": self.script,
+                "started_at": self.started_at.isoformat(),
+                "finished_at": datetime.now().isoformat(),
+                "seconds": round(time.perf_counter() - self._start, 3),
+                "argv": sys.argv,
+                "options": self.options,
+                "host": {"python": platform.python_version(), "platform": platform.platform(),
+                         "cpu_count": os.cpu_count()},
+                "peak_rss_mb": peak_rss_mb(),
+                "children_peak_rss_mb": peak_rss_mb(children=True),
+                "workers_peak_rss_mb": self.workers_peak_rss_mb,
+                "stages": {name: {"seconds": round(s["seconds"], 3), "calls": s["calls"]}
+                           for name, s in sorted(self.stages.items(), key=lambda kv: -kv[1]["seconds"])},
+                "counters": dict(self.counters),
+                "tickers": {ticker: {**entry, "stages": {k: round(v, 3) for k, v in entry["stages"].items()}}
+                            for ticker, entry in sorted(self.tickers.items())},
+            }
+
+
+# ─── Current Run ──────────────────────────────────────────────────────────────
+#
+# Recording always goes to a run, so library code works the same whether or
+# not the calling script called start(); without start() nothing is written.
+
+_run = RunReport(os.path.splitext(os.path.basename(sys.argv[0] or "pipeline"))[0])
+_profiler = None
+_profile_mode = None
+_report_path = None
+_finished = False
+_startup_seconds = None
+
+
+def current() -> RunReport:
+    return _run
+
+
+def stage(name: str, ticker: str = None):
+    return _run.stage(name, ticker)
+
+
+def add_time(name: str, seconds: float, ticker: str = None):
+    _run.add_time(name, seconds, ticker)
+
+
+def count(name: str, value=1, ticker: str = None):
+    _run.count(name, value, ticker)
+
+
+def note(name: str, value, ticker: str = None):
+    _run.note(name, value, ticker)
+
+
+@contextlib.contextmanager
+def collecting():
+    """Records into a fresh run for the duration of the block. Yields that run."""
+    global _run
+    previous, _run = _run, RunReport(_run.script)
+    try:
+        yield _run
+    finally:
+        _run = previous
+
+
+def measured(fn, *args, **kwargs):
+    """Calls fn with its own run and returns (result, snapshot). Submit this to a pool, then merged() the result."""
+    with collecting() as run:
+        result = fn(*args, **kwargs)
+        return result, run.snapshot()
+
+
+def merged(outcome):
+    """Merges the snapshot from measured() into the current run and returns fn's result."""
+    result, snapshot = outcome
+    _run.merge(snapshot)
+    return result
+
+
+# ─── Script Entry Points ──────────────────────────────────────────────────────
+
+def add_arguments(parser):
+    parser.add_argument("--profile", choices=["cpu", "memory"], default=None,
+                        help="Also capture a cProfile (cpu) or tracemalloc (memory) profile of the main thread")
+    parser.add_argument("--report", default=None,
+                        help=f"Where to write the JSON run report (default: {REPORT_DIR}/<script>-<time>.json)")
+
+
+def record_startup(seconds: float):
+    """Time the `pipeline` CLI spent importing the subcommand's module; added to the next run's report."""
+    global _startup_seconds
+    _startup_seconds = seconds
+
+
+def start(script: str, args=None) -> RunReport:
+    """Starts the run report for a script (and the profiler, if --profile was given)."""
+    global _run, _profiler, _profile_mode, _report_path, _finished
+    options = {k: v for k, v in vars(args).items() if k not in ("profile", "report")} if args else {}
+    _run = RunReport(script, options)
+    if _startup_seconds is not None:
+        _run.add_time("startup", _startup_seconds)
+    _report_path = getattr(args, "report", None)
+    _profile_mode = getattr(args, "profile", None)
+    _finished = False
+    if _profile_mode == "cpu":
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    elif _profile_mode == "memory":
+        import tracemalloc
+        tracemalloc.start()
+    # Still write a report if the script exits early or crashes
+    atexit.register(finish, status="incomplete")
+    return _run
+
+
+def _stop_profiler(path: str) -> dict:
+    global _profiler
+    if _profile_mode == "cpu" and _profiler is not None:
+        import pstats
+        _profiler.disable()
+        _profiler.dump_stats(os.path.splitext(path)[0] + ".prof")
+        stats = pstats.Stats(_profiler)
+        _profiler = None
+        rows = sorted(stats.stats.items(), key=lambda kv: -kv[1][3])[:PROFILE_TOP]
+        return {
+            "mode": "cpu",
+            "stats_file": os.path.splitext(path)[0] + ".prof",
+            "top_cumulative": [
+                {"function": f"{file}:{line}({name})", "calls": nc, "own_s": round(tt, 4), "cumulative_s": round(ct, 4)}
+                for (file, line, name), (_, nc, tt, ct, _) in rows
+            ],
+        }
+    if _profile_mode == "memory":
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            return None
+        current_bytes, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics("lineno")[:PROFILE_TOP]
+        tracemalloc.stop()
+        return {
+            "mode": "memory",
+            "traced_current_mb": round(current_bytes / 2**20, 2),
+            "traced_peak_mb": round(peak / 2**20, 2),
+            "top_allocations": [{"site": str(s.traceback[0]), "mb": round(s.size / 2**20, 3), "blocks": s.count}
+                                for s in top],
+        }
+    return None
+
+
+def finish(failed=None, status: str = None, path: str = None) -> str:
+    """Stops profiling, prints the stage table and writes the run report once. Returns its path."""
+    global _finished
+    if _finished:
+        return None
+    _finished = True
+    path = path or _report_path or os.path.join(
+        REPORT_DIR, f"{_run.script}-{_run.started_at.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    report = _run.to_dict()
+    report["status"] = status or ("failed" if failed else "ok")
+    report["failed"] = list(failed or [])
+    profile = _stop_profiler(path)
+    if profile:
+        report["profile"] = profile
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    rss = f", peak RSS {report['peak_rss_mb']} MB" if report["peak_rss_mb"] is not None else ""
+    print(f"\n  Run report: {path} ({report['seconds']:.1f}s{rss})")
+    if report["stages"]:
+        print(f"  {'Stage':<20} {'Total (s)':>10} {'Calls':>7}")
+        for name, s in report["stages"].items():
+            print(f"  {name:<20} {s['seconds']:>10.3f} {s['calls']:>7}")
+    if report["counters"]:
+        print("  " + " | ".join(f"{name} {value:,}" for name, value in report["counters"].items()))
+    return path
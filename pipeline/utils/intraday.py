@@ -0,0 +1,233 @@
+"""
+Append-only columnar store for intraday bars, one directory per ticker.
+
+Every column is a raw little-endian file that only ever grows at the end:
+int64 bar timestamps (UTC epoch seconds) and float32 open/high/low/close/
+volume. Reads memory-map the files, so rolling up a session touches only that
+session's slice (found by binary search on the timestamps) however much
+history is kept. ~28 bytes a bar: 30-minute bars for 600 tickers over
+RETENTION_DAYS take under 10 MB.
+
+Layout (under pipeline/ by default):
+
+    cache/intraday/<interval>/<ticker>/meta.json         {"interval", "generation", "compacted_at"}
+    cache/intraday/<interval>/<ticker>/g<N>/timestamp.i64
+    cache/intraday/<interval>/<ticker>/g<N>/open.f32 ... volume.f32
+
+The timestamp file is the commit record: columns are appended before it and
+readers and writers trim every column to its length, so a bar interrupted
+mid-append is simply absent. append() re-downloaded bars from the first new
+timestamp on replace the stored tail (the last bar of a running session is
+revised until it closes).
+
+compact() drops bars older than a cutoff (they are rolled up into daily_prices
+by then) by writing the kept rows into generation N+1 and switching
+meta.json to it in one rename; the old generation is deleted afterwards.
+"""
+import os
+import json
+import shutil
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "intraday")
+INTERVAL = "30m"
+RETENTION_DAYS = 30       # raw bars kept; older sessions only live on as daily_prices rows
+COMPACT_SLACK_DAYS = 7    # compact once the oldest bar is this far past the cutoff (~weekly rewrites)
+COLUMNS = ["open", "high", "low", "close", "volume"]
+_TIMESTAMP = "timestamp"
+_DTYPES = {_TIMESTAMP: np.dtype("<i8"), **{c: np.dtype("<f4") for c in COLUMNS}}
+_SUFFIX = {_TIMESTAMP: ".i64", **{c: ".f32" for c in COLUMNS}}
+
+
+def to_timestamps(index) -> np.ndarray:
+    """UTC epoch seconds (int64) for a DatetimeIndex; naive times are taken as UTC."""
+    # .values of a tz-aware index is already UTC
+    return pd.DatetimeIndex(index).values.astype("datetime64[s]").astype(np.int64)
+
+
+def day_bounds(day: date):
+    """[start, end) of a UTC calendar day in epoch seconds. European sessions fall inside one UTC day."""
+    start = int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+    return start, start + 86400
+
+
+def timestamp_day(ts: int) -> date:
+    return datetime.fromtimestamp(int(ts), tz=timezone.utc).date()
+
+
+class IntradayStore:
+    """Intraday bars for many tickers at one `interval` (see module docstring)."""
+
+    def __init__(self, root: str = STORE_DIR, interval: str = INTERVAL):
+        self.interval = interval
+        self.root = os.path.join(root, interval)
+        self._metas = {}   # one writer per ticker (a scheduler shard), so meta.json is read once
+
+    # ─── Files ────────────────────────────────────────────────────────────────
+
+    def ticker_dir(self, ticker: str) -> str:
+        return os.path.join(self.root, ticker)
+
+    def _meta_path(self, ticker: str) -> str:
+        return os.path.join(self.ticker_dir(ticker), "meta.json")
+
+    def _meta(self, ticker: str) -> dict:
+        if ticker in self._metas:
+            return self._metas[ticker]
+        path = self._meta_path(ticker)
+        if not os.path.exists(path):
+            return {"interval": self.interval, "generation": 0, "compacted_at": None}
+        with open(path) as f:
+            meta = json.load(f)
+        if meta.get("interval") != self.interval:
+            raise ValueError(f"{path}: stored interval {meta.get('interval')} != {self.interval}")
+        self._metas[ticker] = meta
+        return meta
+
+    def _write_meta(self, ticker: str, meta: dict):
+        path = self._meta_path(ticker)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(path + ".tmp", path)
+        self._metas[ticker] = meta
+
+    def _segment(self, ticker: str, generation: int) -> str:
+        return os.path.join(self.ticker_dir(ticker), f"g{generation}")
+
+    def _column_path(self, segment: str, column: str) -> str:
+        return os.path.join(segment, column + _SUFFIX[column])
+
+    def _rows(self, segment: str) -> int:
+        path = self._column_path(segment, _TIMESTAMP)
+        return os.path.getsize(path) // 8 if os.path.exists(path) else 0
+
+    def _trim(self, segment: str, rows: int):
+        """Cuts every column to `rows` bars (drops a torn append, or the tail being replaced)."""
+        for column, dtype in _DTYPES.items():
+            path = self._column_path(segment, column)
+            if os.path.exists(path) and os.path.getsize(path) > rows * dtype.itemsize:
+                with open(path, "r+b") as f:
+                    f.truncate(rows * dtype.itemsize)
+
+    def _map(self, segment: str, column: str, rows: int) -> np.ndarray:
+        if rows == 0:
+            return np.empty(0, dtype=_DTYPES[column])
+        return np.memmap(self._column_path(segment, column), dtype=_DTYPES[column], mode="r", shape=(rows,))
+
+    # ─── Public ───────────────────────────────────────────────────────────────
+
+    def tickers(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(t for t in os.listdir(self.root) if os.path.exists(self._meta_path(t)))
+
+    def read(self, ticker: str, start: int = None, end: int = None):
+        """(timestamps, {column: values}) for start <= timestamp < end, memory-mapped."""
+        segment = self._segment(ticker, self._meta(ticker)["generation"])
+        rows = self._rows(segment)
+        ts = self._map(segment, _TIMESTAMP, rows)
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+        hi = rows if end is None else int(np.searchsorted(ts, end, side="left"))
+        return ts[lo:hi], {c: self._map(segment, c, rows)[lo:hi] for c in COLUMNS}
+
+    def last_timestamp(self, ticker: str):
+        segment = self._segment(ticker, self._meta(ticker)["generation"])
+        rows = self._rows(segment)
+        return int(self._map(segment, _TIMESTAMP, rows)[-1]) if rows else None
+
+    def first_timestamp(self, ticker: str):
+        segment = self._segment(ticker, self._meta(ticker)["generation"])
+        rows = self._rows(segment)
+        return int(self._map(segment, _TIMESTAMP, rows)[0]) if rows else None
+
+    def append(self, ticker: str, frame: pd.DataFrame) -> int:
+        """
+        Stores an OHLCV frame (yfinance columns, DatetimeIndex) for a ticker.
+        Bars from the frame's first timestamp on replace stored ones. Returns
+        the number of bars written.
+        """
+        # NumPy rather than DataFrame ops: this runs for every ticker on every run
+        names = list(frame.columns)
+        matrix = frame.to_numpy(dtype=np.float32)
+        values = {c: matrix[:, names.index(c.capitalize())] for c in COLUMNS}
+        ts = to_timestamps(frame.index)
+        order = np.argsort(ts, kind="stable")
+        order = order[~np.isnan(values["close"][order])]
+        if len(order) == 0:
+            return 0
+        ts = ts[order]
+        keep = np.append(ts[1:] != ts[:-1], True)   # last of duplicate timestamps wins
+        ts = ts[keep]
+        values = {c: v[order][keep] for c, v in values.items()}
+
+        meta = self._meta(ticker)
+        if ticker not in self._metas:
+            self._write_meta(ticker, meta)
+        segment = self._segment(ticker, meta["generation"])
+        os.makedirs(segment, exist_ok=True)
+        rows = self._rows(segment)
+        stored = self._map(segment, _TIMESTAMP, rows)
+        keep_rows = int(np.searchsorted(stored, ts[0], side="left"))
+        del stored
+        self._trim(segment, keep_rows)
+        for column in COLUMNS + [_TIMESTAMP]:   # timestamps last: they commit the bars
+            data = ts if column == _TIMESTAMP else values[column]
+            with open(self._column_path(segment, column), "ab") as f:
+                f.write(np.ascontiguousarray(data, dtype=_DTYPES[column]).tobytes())
+        return len(ts)
+
+    def rollup(self, ticker: str, day: date):
+        """The day's bars as one daily OHLCV bar {"Open", "High", "Low", "Close", "Volume", "bars"}, or None."""
+        ts, values = self.read(ticker, *day_bounds(day))
+        if len(ts) == 0:
+            return None
+        return {
+            "Open": float(values["open"][0]),
+            "High": float(np.nanmax(values["high"])),
+            "Low": float(np.nanmin(values["low"])),
+            "Close": float(values["close"][-1]),
+            "Volume": float(np.nansum(values["volume"])),
+            "bars": len(ts),
+        }
+
+    def compact(self, ticker: str, cutoff: int) -> int:
+        """Drops bars with timestamp < cutoff into a new generation. Returns the number dropped."""
+        meta = self._meta(ticker)
+        old = self._segment(ticker, meta["generation"])
+        rows = self._rows(old)
+        ts = self._map(old, _TIMESTAMP, rows)
+        start = int(np.searchsorted(ts, cutoff, side="left"))
+        if start == 0:
+            return 0
+        new = self._segment(ticker, meta["generation"] + 1)
+        shutil.rmtree(new, ignore_errors=True)   # left over from an interrupted compaction
+        os.makedirs(new)
+        for column in _DTYPES:
+            kept = self._map(old, column, rows)[start:]
+            with open(self._column_path(new, column), "wb") as f:
+                f.write(np.ascontiguousarray(kept).tobytes())
+            del kept
+        del ts
+        self._write_meta(ticker, {**meta, "generation": meta["generation"] + 1,
+                                  "compacted_at": datetime.now(timezone.utc).isoformat()})
+        shutil.rmtree(old, ignore_errors=True)
+        return start
+
+    def compact_due(self, ticker: str, now: datetime, retention_days: int = RETENTION_DAYS,
+                    slack_days: int = COMPACT_SLACK_DAYS):
+        """The retention cutoff if the ticker's oldest bar is more than slack_days past it, else None."""
+        cutoff = int((now - timedelta(days=retention_days)).timestamp())
+        first = self.first_timestamp(ticker)
+        if first is None or first >= cutoff - slack_days * 86400:
+            return None
+        return cutoff
+
+    def disk_bytes(self) -> int:
+        total = 0
+        for dirpath, _, files in os.walk(self.root):
+            total += sum(os.path.getsize(os.path.join(dirpath, f)) for f in files)
+        return total
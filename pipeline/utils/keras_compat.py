@@ -0,0 +1,89 @@
+"""
+Loading .h5 models saved by Keras 3 under the pinned Keras 2.15.
+
+Keras 3 writes config keys Keras 2 rejects ("Unrecognized keyword arguments",
+DTypePolicy) and a different format for the functional graph's node links.
+The config is translated in memory and the model rebuilt from it with the
+weights read from the untouched file — the artifact itself is never rewritten.
+"""
+import json
+
+import h5py
+import tensorflow as tf
+
+KERAS3_KEYS = [
+    "optional", "dtype_policy", "DTypePolicy",
+    "trainable", "dtype", "ragged", "sparse",
+    "quantization_config"
+]
+
+
+def strip_keras3_keys(obj):
+    """
+    Recursively removes Keras 3 specific parameters not recognized by Keras 2
+    and renames batch_shape to batch_input_shape (legacy).
+    """
+    if isinstance(obj, dict):
+        if "batch_shape" in obj:
+            obj["batch_input_shape"] = obj.pop("batch_shape")
+        for key in KERAS3_KEYS:
+            obj.pop(key, None)
+        for value in obj.values():
+            strip_keras3_keys(value)
+    elif isinstance(obj, list):
+        for item in obj:
+            strip_keras3_keys(item)
+
+
+def _legacy_history(tensor):
+    return tensor["config"]["keras_history"]
+
+
+def legacy_inbound_nodes(config: dict):
+    """
+    Rewrites a Keras 3 functional config's node references in the Keras 2
+    format: {"args": [keras_tensor, ...], "kwargs": {...}} becomes
+    [[layer, node_index, tensor_index, kwargs], ...].
+    """
+    inner = config.get("config", {})
+    for layer in inner.get("layers", []):
+        nodes = []
+        for node in layer.get("inbound_nodes", []):
+            if not isinstance(node, dict):
+                nodes.append(node)
+                continue
+            kwargs = {k: v for k, v in node.get("kwargs", {}).items() if k not in ("training", "mask")}
+            tensors = []
+            for arg in node.get("args", []):
+                for t in (arg if isinstance(arg, list) else [arg]):
+                    if isinstance(t, dict) and t.get("class_name") == "__keras_tensor__":
+                        tensors.append(t)
+            nodes.append([[*_legacy_history(t), kwargs] for t in tensors])
+        layer["inbound_nodes"] = nodes
+    for key in ("input_layers", "output_layers"):
+        refs = inner.get(key)
+        if refs and isinstance(refs[0], str):
+            inner[key] = [refs]
+
+
+def keras_version(path: str) -> str:
+    with h5py.File(path, "r") as f:
+        version = f.attrs.get("keras_version", "")
+    return version.decode("utf-8") if hasattr(version, "decode") else str(version)
+
+
+def load_h5_model(path: str):
+    """tf.keras.models.load_model(path, compile=False), tolerating Keras 3 metadata."""
+    try:
+        return tf.keras.models.load_model(path, compile=False)
+    except Exception as e:
+        if "Unrecognized keyword arguments" not in str(e) and "DTypePolicy" not in str(e):
+            raise
+    with h5py.File(path, "r") as f:
+        config = f.attrs["model_config"]
+    config = json.loads(config.decode("utf-8") if hasattr(config, "decode") else config)
+    strip_keras3_keys(config)
+    legacy_inbound_nodes(config)
+    model = tf.keras.models.model_from_json(json.dumps(config))
+    model.load_weights(path)
+    return model
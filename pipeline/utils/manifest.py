@@ -0,0 +1,105 @@
+"""
+Per-ticker pipeline manifest: content hashes of each stage's inputs.
+
+Each stage (train, convert, scalers, ...) records a digest of what it consumed
+— the training data slice and hyperparameters, the .h5, the scaler — and skips
+a ticker on the next run if the digest is unchanged. Stored next to the
+artifacts as models/<ticker>/manifest.json:
+
+    {
+      "train":   {"digest": "...", "recorded_at": "...", ...},
+      "convert": {"digest": "...", "recorded_at": "...", ...}
+    }
+
+Stages that run on ephemeral CI runners (convert, scalers) also keep a copy in
+the storage bucket at <ticker>/manifest.json, so "already converted" survives
+between runs; pass `bucket` (a utils.storage bucket) to sync with it.
+"""
+import os
+import json
+import hashlib
+from datetime import datetime, timezone
+
+import numpy as np
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+CHUNK_BYTES = 1 << 20
+
+
+def hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_array(arr) -> str:
+    arr = np.ascontiguousarray(arr)
+    h = hashlib.sha256()
+    h.update(str((arr.dtype.str, arr.shape)).encode())
+    h.update(arr.tobytes())
+    return h.hexdigest()
+
+
+def hash_json(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def combine(*digests) -> str:
+    return hashlib.sha256("|".join(digests).encode()).hexdigest()
+
+
+def model_version(model_dir: str) -> str:
+    """Short content hash of a ticker's model.h5 and scaler.pkl — what a forecast or bundle was made with."""
+    return combine(hash_file(os.path.join(model_dir, "model.h5")),
+                   hash_file(os.path.join(model_dir, "scaler.pkl")))[:16]
+
+
+class Manifest:
+    """Stage digests for one ticker, read from and written to models/<ticker>/manifest.json."""
+
+    def __init__(self, ticker: str, models_dir: str = MODELS_DIR, bucket=None):
+        self.ticker = ticker
+        self.path = os.path.join(models_dir, ticker, "manifest.json")
+        self.bucket = bucket
+        self.stages = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.stages = json.load(f)
+        if bucket is not None:
+            self._merge_remote()
+
+    @property
+    def remote_path(self) -> str:
+        return f"{self.ticker}/manifest.json"
+
+    def _merge_remote(self):
+        try:
+            remote = json.loads(self.bucket.get(self.remote_path))
+        except Exception:
+            return  # nothing uploaded yet
+        for stage, entry in remote.items():
+            local = self.stages.get(stage)
+            if local is None or entry.get("recorded_at", "") > local.get("recorded_at", ""):
+                self.stages[stage] = entry
+
+    def is_current(self, stage: str, digest: str) -> bool:
+        return self.stages.get(stage, {}).get("digest") == digest
+
+    def record(self, stage: str, digest: str, **info):
+        """Stores the digest for a completed stage and saves the manifest."""
+        self.stages[stage] = {
+            "digest": digest,
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            **info,
+        }
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(self.stages, f, indent=2, sort_keys=True)
+        if self.bucket is not None:
+            with open(self.path, "rb") as f:
+                self.bucket.put(self.remote_path, f.read(), "application/json")
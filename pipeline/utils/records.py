@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+# Columns written to daily_prices besides (ticker, date), in payload order.
+# Values are the source column in the indicator frame.
+RECORD_SOURCES = {
+    "open": "Open",
+    "high": "High",
+    "low": "Low",
+    "close": "Close",
+    "volume": "Volume",
+    "returns": "returns",
+    "ma20": "ma20",
+    "sma_50": "sma_50",
+    "rsi14": "rsi14",
+    "macd": "macd",
+    "bb_upper": "bb_upper",
+    "bb_lower": "bb_lower",
+    "volume_ma5": "volume_ma5",
+}
+RECORD_COLUMNS = list(RECORD_SOURCES)
+INT_COLUMNS = {"volume"}
+
+
+def _float_column(series: pd.Series) -> list:
+    """Whole-column float conversion; NaN and ±inf become None."""
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    out = values.tolist()
+    for i in np.flatnonzero(~np.isfinite(values)):
+        out[i] = None
+    return out
+
+
+def _int_column(series: pd.Series) -> list:
+    """Whole-column int conversion (truncating like int()); NaN and ±inf become None."""
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return series.to_numpy().tolist()
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    bad = ~np.isfinite(values)
+    out = np.where(bad, 0, values).astype(np.int64).tolist()
+    for i in np.flatnonzero(bad):
+        out[i] = None
+    return out
+
+
+def frame_to_records(df: pd.DataFrame, ticker: str) -> list:
+    """
+    Serializes an indicator frame (with a 'Date' column) into daily_prices
+    upsert payloads. Works column-at-a-time instead of per row, and produces
+    the same dicts (key order, Python float/int/None values) as the old
+    iterrows() loop.
+    """
+    n = len(df)
+    columns = {
+        "ticker": [ticker] * n,
+        "date": df['Date'].dt.strftime('%Y-%m-%d').tolist(),
+    }
+    for field, source in RECORD_SOURCES.items():
+        convert = _int_column if field in INT_COLUMNS else _float_column
+        columns[field] = convert(df[source])
+
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
@@ -0,0 +1,35 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def create_sequences(data: np.ndarray, window_size: int, forecast_days: int, dtype=np.float32):
+    """
+    Converts a scaled time-series array into (X, y) training pairs.
+    
+    X shape: (samples, window_size, n_features)
+    y shape: (samples, forecast_days)   ← only the close price (index 0) as target
+    
+    Why 3-day multi-output instead of recursive single-step:
+    - Multi-output forces the model to learn the dependency between future days
+    - Recursive predictions compound errors (each step uses a prediction as input)
+    - Loss weights [1.0, 0.8, 0.6] let the model focus on near-term accuracy
+
+    X and y are read-only strided views over one `dtype` copy of `data`:
+    consecutive windows share memory instead of each being copied, so
+    building them takes O(len(data)) memory whatever the window size. That
+    bound is this function's only: model.fit() and tf.constant copy X into a
+    dense (samples, window_size, n_features) array, as np.array(X) does. To
+    train on the windows, use train_models.window_dataset, which gathers
+    them batch by batch from the rows instead.
+    """
+    data = np.ascontiguousarray(data, dtype=dtype)
+    n_samples = len(data) - window_size - forecast_days + 1
+    if n_samples <= 0:
+        n_features = data.shape[1] if data.ndim == 2 else 0
+        return (np.empty((0, window_size, n_features), dtype=dtype),
+                np.empty((0, forecast_days), dtype=dtype))
+
+    # (windows, features, window_size) -> (windows, window_size, features), both views
+    X = sliding_window_view(data, window_size, axis=0)[:n_samples].transpose(0, 2, 1)
+    y = sliding_window_view(data[window_size:, 0], forecast_days)[:n_samples]  # close price only
+    return X, y
@@ -0,0 +1,204 @@
+"""
+Concurrent uploader for model artifacts with checksum dedupe.
+
+Every script that publishes artifacts (train_models, convert_models,
+fix_scalers) goes through one Uploader:
+
+- one `list` call per remote folder fetches the stored objects' eTags (the
+  MD5 of the content for single-part uploads); files whose local MD5 matches
+  are skipped;
+- the remaining files are uploaded from a bounded thread pool over the
+  client's shared, connection-pooled HTTP session;
+- each request is retried with exponential backoff (utils.ingest.with_retry).
+
+Buckets are plain objects, so the Supabase bucket can be swapped for a local
+directory (LocalBucket) — set MODELS_LOCAL_DIR to publish there instead:
+
+    bucket.checksums(folder)               -> {name: md5}
+    bucket.get(path)                       -> bytes
+    bucket.put(path, data, content_type)
+"""
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import instrumentation
+from utils.ingest import with_retry, RETRIES, BACKOFF_SECONDS
+
+UPLOAD_WORKERS = 8   # concurrent uploads
+LIST_LIMIT = 1000    # objects per folder listing (storage defaults to 100)
+
+
+def md5_file(path: str) -> str:
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def content_type(name: str) -> str:
+    return "application/json" if name.endswith(".json") else "application/octet-stream"
+
+
+# ─── Buckets ──────────────────────────────────────────────────────────────────
+
+class SupabaseBucket:
+    """A Supabase Storage bucket. All requests share the client's HTTP connection pool."""
+
+    def __init__(self, client, name="models"):
+        self.name = name
+        self.client = client
+        self._bucket = None
+
+    @property
+    def bucket(self):
+        # Resolved on first request, so module-level buckets don't create the client at import
+        if self._bucket is None:
+            self._bucket = self.client.storage.from_(self.name)
+        return self._bucket
+
+    def checksums(self, folder: str) -> dict:
+        checksums = {}
+        for obj in self.bucket.list(folder, {"limit": LIST_LIMIT}) or []:
+            etag = (obj.get("metadata") or {}).get("eTag")
+            if etag:
+                checksums[obj["name"]] = etag.strip('"')
+        return checksums
+
+    def get(self, path: str) -> bytes:
+        return self.bucket.download(path)
+
+    def put(self, path: str, data: bytes, content_type: str):
+        try:
+            # Upsert="true" is required as a string by the Supabase Python client
+            self.bucket.upload(path=path, file=data,
+                               file_options={"upsert": "true", "content-type": content_type})
+        except Exception as e:
+            # Fallback to update if upload fails (e.g. if upsert has issues)
+            if "already exists" in str(e).lower() or "409" in str(e):
+                self.bucket.update(path=path, file=data, file_options={"content-type": content_type})
+            else:
+                raise
+
+
+class LocalBucket:
+    """Directory stand-in for a storage bucket (offline runs, benchmarks)."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.name = root
+
+    def checksums(self, folder: str) -> dict:
+        base = os.path.join(self.root, folder)
+        if not os.path.isdir(base):
+            return {}
+        return {name: md5_file(os.path.join(base, name))
+                for name in os.listdir(base) if os.path.isfile(os.path.join(base, name))}
+
+    def get(self, path: str) -> bytes:
+        with open(os.path.join(self.root, path), "rb") as f:
+            return f.read()
+
+    def put(self, path: str, data: bytes, content_type: str):
+        target = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(target + ".tmp", target)
+
+
+def models_bucket(client, name="models"):
+    """The bucket artifacts are published to: MODELS_LOCAL_DIR if set, else Supabase Storage."""
+    local_dir = os.getenv("MODELS_LOCAL_DIR")
+    if local_dir:
+        return LocalBucket(local_dir)
+    return SupabaseBucket(client, name)
+
+
+# ─── Uploader ─────────────────────────────────────────────────────────────────
+
+class Uploader:
+    """Uploads (local_path, remote_path) pairs concurrently, skipping unchanged files."""
+
+    def __init__(self, bucket, workers=UPLOAD_WORKERS, retries=RETRIES, backoff=BACKOFF_SECONDS):
+        self.bucket = bucket
+        self.workers = max(1, workers)
+        self.retries = retries
+        self.backoff = backoff
+
+    def _put(self, local_path, remote_path):
+        with open(local_path, "rb") as f:
+            data = f.read()
+        self.bucket.put(remote_path, data, content_type(remote_path))
+        return len(data)
+
+    def upload(self, files, force=False):
+        """
+        files: iterable of (local_path, remote_path).
+        Returns {remote_path: {"uploaded": bool, "error": message or None}};
+        uploaded is False for files skipped because the remote copy matches.
+        """
+        files = list(files)
+        results = {remote: {"uploaded": False, "error": None} for _, remote in files}
+        lock = threading.Lock()
+
+        def folder(remote):
+            return remote.rsplit("/", 1)[0] if "/" in remote else ""
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            remote_sums = {}
+            if not force:
+                folders = sorted({folder(remote) for _, remote in files})
+
+                def list_folder(name):
+                    try:
+                        with instrumentation.stage("list_remote"):
+                            return with_retry(self.bucket.checksums, name, retries=self.retries, backoff=self.backoff)
+                    except Exception as e:
+                        print(f"  [WARNING] Could not list {name or '/'}: {e} — uploading all its files")
+                        return {}
+
+                remote_sums = dict(zip(folders, pool.map(list_folder, folders)))
+
+            def upload_one(local, remote):
+                # Artifacts live under <ticker>/
+                ticker = remote.split("/", 1)[0] if "/" in remote else None
+                try:
+                    stored = remote_sums.get(folder(remote), {}).get(remote.rsplit("/", 1)[-1])
+                    if stored is not None and stored == md5_file(local):
+                        instrumentation.count("files_unchanged", 1, ticker)
+                        return
+                    with instrumentation.stage("upload", ticker):
+                        size = with_retry(self._put, local, remote, retries=self.retries, backoff=self.backoff)
+                    instrumentation.count("files_uploaded", 1, ticker)
+                    instrumentation.count("bytes_uploaded", size, ticker)
+                    with lock:
+                        results[remote]["uploaded"] = True
+                except Exception as e:
+                    with lock:
+                        results[remote]["error"] = str(e)
+
+            for fut in [pool.submit(upload_one, local, remote) for local, remote in files]:
+                fut.result()
+        return results
+
+    def upload_dir(self, local_dir, prefix, names=None, force=False):
+        """Uploads `names` (default: every file) from local_dir to <prefix>/<name>."""
+        names = names if names is not None else sorted(
+            n for n in os.listdir(local_dir) if os.path.isfile(os.path.join(local_dir, n)))
+        return self.upload([(os.path.join(local_dir, n), f"{prefix}/{n}") for n in names], force=force)
+
+
+def summarize(results) -> str:
+    uploaded = sum(r["uploaded"] for r in results.values())
+    failed = sum(r["error"] is not None for r in results.values())
+    return f"{uploaded} uploaded, {len(results) - uploaded - failed} unchanged, {failed} failed"
+
+
+def raise_for_errors(results):
+    errors = {path: r["error"] for path, r in results.items() if r["error"] is not None}
+    if errors:
+        path, error = next(iter(errors.items()))
+        raise RuntimeError(f"{len(errors)} upload(s) failed, e.g. {path}: {error}")
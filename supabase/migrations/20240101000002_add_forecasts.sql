@@ -0,0 +1,34 @@
+-- Precomputed forecasts written by pipeline/forecast.py after each data update.
+-- One row per (ticker, as_of, model_version): the web app reads the latest row
+-- instead of running the model in the browser.
+
+create table if not exists public.forecasts (
+  id bigint generated always as identity primary key,
+  ticker text not null,
+  as_of date not null,
+  model_version text not null,
+  forecast_dates date[] not null,
+  predicted_close numeric[] not null,
+  created_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+alter table public.forecasts add constraint forecasts_ticker_as_of_model_version_key unique (ticker, as_of, model_version);
+
+create index if not exists idx_forecasts_ticker_as_of on public.forecasts(ticker, as_of desc);
+
+alter table public.forecasts enable row level security;
+
+create policy "Allow public read access to forecasts" 
+  on public.forecasts for select 
+  to public 
+  using (true);
+
+create policy "Allow service role insert access to forecasts" 
+  on public.forecasts for insert 
+  to service_role 
+  with check (true);
+
+create policy "Allow service role update access to forecasts" 
+  on public.forecasts for update 
+  to service_role 
+  using (true);
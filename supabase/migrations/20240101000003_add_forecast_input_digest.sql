@@ -0,0 +1,8 @@
+-- Digest of the input window a forecast was made from (pipeline/forecast.py).
+-- Intraday runs revise the latest daily_prices row every 30 minutes, so a
+-- stored (ticker, as_of, model_version) forecast is recomputed and upserted in
+-- place whenever its window no longer matches. Rows written before this column
+-- existed have no digest and are refreshed on the next run.
+
+alter table public.forecasts
+add column if not exists input_digest text;
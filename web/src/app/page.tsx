@@ -10,6 +10,7 @@ import ForecastCard from "../components/ForecastCard";
 import { TICKERS } from "../lib/constants";
 import { fetchPrices } from "../lib/fetchPrices";
 import { runInference } from "../lib/runInference";
+import { fetchForecast } from "../lib/fetchForecast";
 import { fetchLivePrice } from "../lib/fetchLivePrice";
 import { DailyPrice, ForecastResult } from "../lib/types";
 
@@ -105,7 +106,7 @@ export default function Home() {
     return prices;
   })();
 
-  // 2. Run TF.js inference once prices are loaded
+  // 2. Load the precomputed forecast once prices are loaded; run TF.js inference if none is stored
   useEffect(() => {
     if (prices.length === 0 || loadingPrices) return;
 
@@ -115,7 +116,8 @@ export default function Home() {
 
     // Minor delay to ensure UI threads rendering main chart priority
     const timer = setTimeout(() => {
-      runInference(selectedTicker, augmentedPrices)
+      fetchForecast(selectedTicker, prices[prices.length - 1].date)
+        .then((stored) => stored ?? runInference(selectedTicker, augmentedPrices))
         .then((res) => {
           if (!active) return;
           setForecasts(res);
@@ -0,0 +1,30 @@
+import { supabase } from "./supabase";
+import { ForecastResult } from "./types";
+
+/**
+ * Fetches the precomputed forecast for a ticker (written by pipeline/forecast.py).
+ * Returns null if none is stored for `asOf` (the latest daily bar), so the caller
+ * can fall back to running the model in the browser.
+ */
+export async function fetchForecast(ticker: string, asOf: string): Promise<ForecastResult[] | null> {
+    const { data, error } = await supabase
+        .from("forecasts")
+        .select("as_of, forecast_dates, predicted_close")
+        .eq("ticker", ticker)
+        .order("as_of", { ascending: false })
+        .order("created_at", { ascending: false })
+        .limit(1);
+
+    if (error) {
+        console.error("Error fetching forecast:", error);
+        return null;
+    }
+
+    const row = data?.[0];
+    if (!row || row.as_of < asOf) return null;
+
+    return row.forecast_dates.map((date: string, i: number) => ({
+        date,
+        predictedClose: parseFloat(Number(row.predicted_close[i]).toFixed(2))
+    }));
+}
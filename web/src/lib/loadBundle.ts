@@ -0,0 +1,54 @@
+import * as tf from "@tensorflow/tfjs";
+import { supabase } from "./supabase";
+
+const BUNDLE_MAGIC = "TFBUNDLE";
+const BUNDLE_VERSION = 1;
+
+export interface ModelBundle {
+    model: tf.LayersModel;
+    features: string[];
+    minValues: number[];
+    maxValues: number[];
+    modelVersion: string | null;
+}
+
+/**
+ * Loads `${ticker}/model.bundle` (written by pipeline/utils/bundle.py) in a single request:
+ * an 8-byte magic, uint32 version, uint32 header length, JSON header, then the weight data.
+ * Returns null if the ticker has no bundle yet, so the caller can use the separate files.
+ */
+export async function loadBundle(ticker: string): Promise<ModelBundle | null> {
+    const { data: publicUrlData } = supabase.storage.from("models").getPublicUrl(`${ticker}/model.bundle`);
+
+    const response = await fetch(publicUrlData.publicUrl);
+    if (!response.ok) return null;
+    const buffer = await response.arrayBuffer();
+
+    const view = new DataView(buffer);
+    const magic = new TextDecoder().decode(new Uint8Array(buffer, 0, 8));
+    const version = view.getUint32(8, true);
+    if (magic !== BUNDLE_MAGIC || version > BUNDLE_VERSION) {
+        console.warn(`[Inference] Ignoring unsupported model bundle for ${ticker}`);
+        return null;
+    }
+
+    const headerLength = view.getUint32(12, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 16, headerLength)));
+    const weightStart = 16 + headerLength;
+    const weightData = buffer.slice(weightStart, weightStart + header.weight_data_bytes);
+
+    const model = await tf.loadLayersModel(tf.io.fromMemory({
+        modelTopology: header.modelTopology,
+        weightSpecs: header.weightSpecs,
+        weightData,
+        format: header.format
+    }));
+
+    return {
+        model,
+        features: header.features,
+        minValues: header.scaler.data_min_,
+        maxValues: header.scaler.data_max_,
+        modelVersion: header.model_version
+    };
+}
@@ -1,6 +1,7 @@
 import * as tf from "@tensorflow/tfjs";
 import { DailyPrice, ForecastResult } from "./types";
 import { supabase } from "./supabase";
+import { loadBundle } from "./loadBundle";
 
 /**
  * Scales a 2D array of features using min/max values.
@@ -18,17 +19,10 @@ function minMaxScaler(data: number[][], minValues: number[], maxValues: number[]
 }
 
 /**
- * Runs client-side inference using the pre-trained model for the specific ticker.
+ * Loads the model and scaler from the separate scaler.json and model.json files
+ * (tickers converted before model.bundle was published).
  */
-export async function runInference(ticker: string, recentData: DailyPrice[]): Promise<ForecastResult[]> {
-    // 1. We need exactly 7 days of data for the sequence (as trained in python)
-    if (recentData.length < 7) {
-        throw new Error("Not enough data to run inference. Need at least 7 days.");
-    }
-
-    const last7Days = recentData.slice(-7);
-
-    // 2. Fetch the scaler min/max values for this specific ticker from Supabase storage
+async function loadLegacyModel(ticker: string) {
     const { data: scalerBlob, error: scalerError } = await supabase
         .storage
         .from("models")
@@ -39,8 +33,40 @@ export async function runInference(ticker: string, recentData: DailyPrice[]): Pr
     }
 
     const scalerJson = JSON.parse(await scalerBlob.text());
-    const minValues = scalerJson.data_min_;
-    const maxValues = scalerJson.data_max_;
+
+    // The bucket is public, so we use the Public URL.
+    // This allows TF.js to automatically fetch the matching .bin weight files.
+    const { data: publicUrlData } = supabase.storage.from("models").getPublicUrl(`${ticker}/model.json`);
+    const modelUrl = publicUrlData.publicUrl;
+
+    console.log(`[Inference] Loading model for ${ticker} from: ${modelUrl}`);
+
+    // We already verified in the dashboard (by the user) that this file exists.
+    // If this still gives a 400, it's likely a CORS issue or a path mismatch.
+    const model = await tf.loadLayersModel(modelUrl);
+
+    return {
+        model,
+        minValues: scalerJson.data_min_ as number[],
+        maxValues: scalerJson.data_max_ as number[]
+    };
+}
+
+/**
+ * Runs client-side inference using the pre-trained model for the specific ticker.
+ */
+export async function runInference(ticker: string, recentData: DailyPrice[]): Promise<ForecastResult[]> {
+    // 1. We need exactly 7 days of data for the sequence (as trained in python)
+    if (recentData.length < 7) {
+        throw new Error("Not enough data to run inference. Need at least 7 days.");
+    }
+
+    const last7Days = recentData.slice(-7);
+
+    // 2. Fetch the model and scaler min/max for this ticker: one model.bundle request if the
+    // pipeline has published one, otherwise scaler.json + model.json + weight shards
+    const bundle = await loadBundle(ticker);
+    const { model, minValues, maxValues } = bundle ?? await loadLegacyModel(ticker);
 
     // 3. Extract the 10 features exactly as they were used in Python training
     // Features: ['close', 'returns', 'ma5', 'ma20', 'rsi14', 'macd', 'bb_upper', 'bb_lower', 'volatility', 'volume_ma5']
@@ -60,19 +86,7 @@ export async function runInference(ticker: string, recentData: DailyPrice[]): Pr
     // 4. Scale the features
     const scaledFeatures = minMaxScaler(rawFeatures, minValues, maxValues);
 
-    // 5. Load the model from Supabase Storage
-    // The bucket is public, so we use the Public URL. 
-    // This allows TF.js to automatically fetch the matching .bin weight files.
-    const { data: publicUrlData } = supabase.storage.from("models").getPublicUrl(`${ticker}/model.json`);
-    const modelUrl = publicUrlData.publicUrl;
-
-    console.log(`[Inference] Loading model for ${ticker} from: ${modelUrl}`);
-
-    // We already verified in the dashboard (by the user) that this file exists.
-    // If this still gives a 400, it's likely a CORS issue or a path mismatch.
-    const model = await tf.loadLayersModel(modelUrl);
-
-    // 6. Predict
+    // 5. Predict
     // Shape must be [batch_size, time_steps, features] -> [1, 7, 10]
     const inputTensor = tf.tensor3d([scaledFeatures]);
     const predictionTensor = model.predict(inputTensor) as tf.Tensor;
@@ -85,7 +99,7 @@ export async function runInference(ticker: string, recentData: DailyPrice[]): Pr
     inputTensor.dispose();
     predictionTensor.dispose();
 
-    // 7. Inverse transform the predicted close prices
+    // 6. Inverse transform the predicted close prices
     // The 'close' feature was the first column (index 0) in the scaler
     const closeMin = minValues[0];
     const closeMax = maxValues[0];
@@ -94,7 +108,7 @@ export async function runInference(ticker: string, recentData: DailyPrice[]): Pr
         scaledVal * (closeMax - closeMin) + closeMin
     );
 
-    // 8. Generate future dates for the forecast (ignoring weekends simply for this demo context, or just adding 1 day)
+    // 7. Generate future dates for the forecast (ignoring weekends simply for this demo context, or just adding 1 day)
     const lastDate = new Date(recentData[recentData.length - 1].date);
     const forecastResults: ForecastResult[] = [];
 